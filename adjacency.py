@@ -0,0 +1,284 @@
+"""
+This module keeps the friendships and romantic partners of the user network in one adjacency structure.
+
+Each user attached to an Adjacency is a node numbered in the order it was attached. Friendships are
+undirected edges, kept in a per-node insertion-ordered set (a dict with None values) so that membership
+tests and new edges are O(1) during mutation, and exported as CSR arrays (indptr, indices) for bulk
+analytics. Partners are kept in one array indexed by node, with -1 for no partner.
+
+Attached users read and write their social_current and romantic_current through the adjacency, so the
+existing User accessors keep working as views over it.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from itertools import chain, islice
+from typing import Any, Iterator, Optional
+
+
+class Adjacency:
+    """
+    The friendship edges and partner links between the users of a network.
+
+    Instance Attributes:
+    - users: the attached users, indexed by node.
+    - version: the number of changes made to the edges and partners so far.
+
+    Representation Invariants:
+    - all(self.users[node].network is self for node in range(len(self.users)))
+    - all(a in self._friends[b] for a in range(len(self.users)) for b in self._friends[a])
+
+    >>> from user_network import Characteristics, User
+    >>> def make(name):
+    ...     c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                         "English", True, True, True)
+    ...     return User(name, 20, "F", "She/Her", "Meeting new friends", c, [], [], social_current=[])
+    >>> a, b, c = make("A"), make("B"), make("C")
+    >>> a.social_current.append(b)
+    >>> network = Adjacency([a, b, c])
+    >>> b.socialize(c)
+    >>> [u.name for u in b.social_current]
+    ['A', 'C']
+    >>> a in b.social_current, a in c.social_current
+    (True, False)
+    >>> [array.tolist() for array in network.to_csr()]
+    [[0, 1, 3, 4], [1, 0, 2, 1]]
+    """
+    users: list
+    version: int
+    _nodes: dict[int, int]
+    _friends: list[dict[int, None]]
+    _partners: list[int]
+    _csr: Optional[tuple[Any, Any]]
+    _csr_version: int
+
+    def __init__(self, users: Optional[list] = None) -> None:
+        self.users = []
+        self.version = 0
+        self._nodes = {}
+        self._friends = []
+        self._partners = []
+        self._csr = None
+        self._csr_version = -1
+        for user in users or []:
+            self.add_user(user)
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def __contains__(self, user: object) -> bool:
+        return id(user) in self._nodes
+
+    def node(self, user: object) -> int:
+        """Return the node of user, attaching user (and the users it refers to) first if necessary."""
+        node = self._nodes.get(id(user))
+        return node if node is not None else self.add_user(user)
+
+    def add_user(self, user: object) -> int:
+        """
+        Attach user to this adjacency and return its node.
+
+        The friends and partner user already had are added as edges, and any of them that are not attached
+        yet are attached too.
+        """
+        if id(user) in self._nodes:
+            return self._nodes[id(user)]
+        if getattr(user, "network", None) is not None:
+            raise ValueError(f"{user} already belongs to another network.")
+
+        # Give every user reachable through the plain friend and partner references a node first
+        attached = []
+        pending = [user]
+        while pending:
+            current = pending.pop()
+            if id(current) in self._nodes:
+                continue
+            if getattr(current, "network", None) not in (None, self):
+                raise ValueError(f"{current} already belongs to another network.")
+            self._nodes[id(current)] = len(self.users)
+            self.users.append(current)
+            self._friends.append({})
+            self._partners.append(-1)
+            attached.append(current)
+            pending.extend(friend for friend in (current._social_current or []) if friend.network is None)
+            if current._romantic_current is not None and current._romantic_current.network is None:
+                pending.append(current._romantic_current)
+
+        # Then move their references into the adjacency
+        for current in attached:
+            friends, partner = current._social_current or [], current._romantic_current
+            current.network, current.node = self, self._nodes[id(current)]
+            current._social_current, current._romantic_current = None, None
+            for friend in friends:
+                if friend is not current:
+                    self.add_friendship(current, friend)
+            if partner is not None:
+                self.set_partner(current, partner)
+
+        return self._nodes[id(user)]
+
+    def add_friendship(self, user1: object, user2: object) -> bool:
+        """
+        Add a friendship between user1 and user2, and return whether they were not friends already.
+
+        Raise ValueError if user1 and user2 are the same user, since a user cannot be their own friend.
+        """
+        if user1 is user2:
+            raise ValueError(f"{user1} cannot be friends with themselves.")
+        node1, node2 = self.node(user1), self.node(user2)
+        if node2 in self._friends[node1]:
+            return False
+        self._friends[node1][node2] = None
+        self._friends[node2][node1] = None
+        self.version += 1
+        return True
+
+    def remove_friendships(self, user: object) -> None:
+        """Remove every friendship of user."""
+        node = self.node(user)
+        for friend in self._friends[node]:
+            del self._friends[friend][node]
+        self._friends[node] = {}
+        self.version += 1
+
+    def set_friends(self, user: object, friends: list) -> None:
+        """
+        Replace the friendships of user with friendships with each user in friends.
+
+        user's friends are then in the order of friends; friendships that user already had keep their
+        place in the other user's order.
+        """
+        node = self.node(user)
+        new = {}
+        for friend in friends:
+            if friend is not user:
+                new[self.node(friend)] = None
+
+        for friend in self._friends[node]:
+            if friend not in new:
+                del self._friends[friend][node]
+        for friend in new:
+            self._friends[friend].setdefault(node, None)
+        self._friends[node] = new
+        self.version += 1
+
+    def are_friends(self, user1: object, user2: object) -> bool:
+        """Return whether user1 and user2 are friends."""
+        node1, node2 = self._nodes.get(id(user1)), self._nodes.get(id(user2))
+        return node1 is not None and node2 is not None and node2 in self._friends[node1]
+
+    def friends(self, node: int) -> FriendView:
+        """Return a live view of the friends of the user at node."""
+        return FriendView(self, node)
+
+    def degree(self, node: int) -> int:
+        """Return the number of friends of the user at node."""
+        return len(self._friends[node])
+
+    def mutual_friend_counts(self, node: int, max_friends: Optional[int] = None) -> Counter:
+        """
+        Return the number of mutual friends node has with each friend of its friends, by node.
+
+        Only the first max_friends friends of node are expanded (all of them if None), which bounds the
+        two-hop traversal by max_friends times the largest degree. node and its friends are left out.
+        """
+        friends = self._friends[node]
+        counts = Counter(chain.from_iterable(self._friends[friend] for friend in islice(friends, max_friends)))
+        del counts[node]
+        for friend in friends:
+            del counts[friend]
+        return counts
+
+    def partner(self, node: int) -> Optional[object]:
+        """Return the partner of the user at node, or None."""
+        partner = self._partners[node]
+        return self.users[partner] if partner >= 0 else None
+
+    def set_partner(self, user: object, partner: Optional[object]) -> None:
+        """Set the partner of user (only; partners are set on both users separately, as in User.match)."""
+        self._partners[self.node(user)] = self.node(partner) if partner is not None else -1
+        self.version += 1
+
+    def to_csr(self) -> tuple[Any, Any]:
+        """
+        Return the friendships as CSR arrays (indptr, indices): the friends of node i are
+        indices[indptr[i]:indptr[i + 1]], in the order they were added.
+
+        The arrays are cached until the next change, and must not be modified.
+        """
+        import numpy as np
+
+        if self._csr_version != self.version or self._csr is None:
+            degrees = np.fromiter((len(friends) for friends in self._friends), dtype=np.int64,
+                                  count=len(self._friends))
+            indptr = np.zeros(len(self._friends) + 1, dtype=np.int64)
+            np.cumsum(degrees, out=indptr[1:])
+            indices = np.fromiter(chain.from_iterable(self._friends), dtype=np.int64, count=int(indptr[-1]))
+            self._csr = (indptr, indices)
+            self._csr_version = self.version
+        return self._csr
+
+    def partner_array(self) -> Any:
+        """Return the node of every node's partner as a NumPy array, with -1 for no partner."""
+        import numpy as np
+
+        return np.array(self._partners, dtype=np.int64)
+
+
+class FriendView:
+    """
+    A live, list-like view of the friends of one node of an Adjacency.
+
+    Membership tests and append are O(1); append adds an undirected friendship. Indexing and slicing
+    return users (or lists of users) in the order the friendships were added.
+    """
+    _network: Adjacency
+    _node: int
+
+    def __init__(self, network: Adjacency, node: int) -> None:
+        self._network = network
+        self._node = node
+
+    def __len__(self) -> int:
+        return len(self._network._friends[self._node])
+
+    def __iter__(self) -> Iterator:
+        users = self._network.users
+        return (users[friend] for friend in list(self._network._friends[self._node]))
+
+    def __contains__(self, user: object) -> bool:
+        node = self._network._nodes.get(id(user))
+        return node is not None and node in self._network._friends[self._node]
+
+    def __getitem__(self, item: Any) -> Any:
+        users = self._network.users
+        friends = list(self._network._friends[self._node])
+        if isinstance(item, slice):
+            return [users[friend] for friend in friends[item]]
+        return users[friends[item]]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FriendView):
+            other = list(other)
+        return isinstance(other, list) and list(self) == other
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, user: object) -> None:
+        """Add a friendship between this node's user and user."""
+        self._network.add_friendship(self._network.users[self._node], user)
+
+    def index(self, user: object) -> int:
+        """Return the position of user among the friends."""
+        return list(self).index(user)
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['collections', 'itertools', 'numpy'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970', 'C0415', 'W0212']
+    })
@@ -0,0 +1,155 @@
+"""
+Network health statistics computed on the friendship adjacency with sparse matrix operations.
+
+graph.update_graphs only reports the friend and partner counts of one user at a time. The functions here
+compute whole-network statistics (degree distribution, connected components, triangles, clustering
+coefficients and k-core decomposition) from the CSR arrays of an adjacency.Adjacency or of a snapshot,
+without building a networkx graph. Run it as a batch job to store the results in a snapshot, where the
+dashboard footer picks them up:
+
+    python analytics.py network_snapshot.pkl
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Any, Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+# The number of rows of the adjacency matrix multiplied at a time when counting triangles
+TRIANGLE_BLOCK_ROWS = 8192
+
+
+def adjacency_matrix(indptr: np.ndarray, indices: np.ndarray) -> sparse.csr_matrix:
+    """Return the symmetric 0/1 adjacency matrix with the given CSR arrays."""
+    num_nodes = len(indptr) - 1
+    data = np.ones(len(indices), dtype=np.int64)
+    return sparse.csr_matrix((data, indices, indptr), shape=(num_nodes, num_nodes))
+
+
+def degree_distribution(matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    Return the number of nodes with each degree: entry d is the number of nodes with d neighbours.
+
+    >>> matrix = adjacency_matrix(np.array([0, 1, 3, 4]), np.array([1, 0, 2, 1]))
+    >>> degree_distribution(matrix).tolist()
+    [0, 2, 1]
+    """
+    return np.bincount(np.diff(matrix.indptr))
+
+
+def connected_components(matrix: sparse.csr_matrix) -> tuple[int, np.ndarray]:
+    """Return the number of connected components and the component label of every node."""
+    return csgraph.connected_components(matrix, directed=False)
+
+
+def triangle_counts(matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    Return the number of triangles through every node.
+
+    The triangles through node i are half the number of paths i - j - k - i, i.e. half the entries of
+    row i of (A @ A) * A. The product is computed TRIANGLE_BLOCK_ROWS rows at a time to bound its memory.
+
+    >>> matrix = adjacency_matrix(np.array([0, 2, 4, 7, 8]), np.array([1, 2, 0, 2, 0, 1, 3, 2]))
+    >>> triangle_counts(matrix).tolist()
+    [1, 1, 1, 0]
+    """
+    counts = np.zeros(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], TRIANGLE_BLOCK_ROWS):
+        rows = matrix[start:start + TRIANGLE_BLOCK_ROWS]
+        counts[start:start + rows.shape[0]] = np.asarray((rows @ matrix).multiply(rows).sum(axis=1)).ravel()
+    return counts // 2
+
+
+def clustering_coefficients(matrix: sparse.csr_matrix, triangles: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Return the local clustering coefficient of every node: the fraction of pairs of its neighbours that are
+    neighbours themselves, or 0 for nodes with fewer than two neighbours.
+    """
+    if triangles is None:
+        triangles = triangle_counts(matrix)
+    degrees = np.diff(matrix.indptr)
+    pairs = degrees * (degrees - 1) / 2
+    return np.divide(triangles, pairs, out=np.zeros(len(degrees)), where=pairs > 0)
+
+
+def core_numbers(matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    Return the core number of every node: the largest k such that the node is in the k-core, the largest
+    subgraph in which every node has at least k neighbours.
+
+    Nodes are peeled in rounds: every remaining node with at most k remaining neighbours is removed at
+    once, and the degrees of their neighbours are updated with one sparse matrix-vector product.
+
+    >>> matrix = adjacency_matrix(np.array([0, 2, 4, 7, 8]), np.array([1, 2, 0, 2, 0, 1, 3, 2]))
+    >>> core_numbers(matrix).tolist()
+    [2, 2, 2, 1]
+    """
+    degrees = np.diff(matrix.indptr).astype(np.int64)
+    alive = np.ones(len(degrees), dtype=bool)
+    cores = np.zeros(len(degrees), dtype=np.int64)
+    k = 0
+
+    while alive.any():
+        k = max(k, int(degrees[alive].min()))
+        removed = alive & (degrees <= k)
+        while removed.any():
+            cores[removed] = k
+            alive &= ~removed
+            degrees -= matrix @ removed.astype(np.int64)
+            removed = alive & (degrees <= k)
+
+    return cores
+
+
+def network_health(indptr: np.ndarray, indices: np.ndarray, partners: Optional[np.ndarray] = None) -> dict[str, Any]:
+    """
+    Return a summary of the network with the given friendship CSR arrays and partner array, using only
+    plain Python values so it can be stored in a snapshot and shown on the dashboard.
+    """
+    matrix = adjacency_matrix(indptr, indices)
+    degrees = np.diff(indptr)
+    num_components, labels = connected_components(matrix)
+    triangles = triangle_counts(matrix)
+    cores = core_numbers(matrix)
+
+    health = {
+        "users": int(matrix.shape[0]),
+        "friendships": int(len(indices) // 2),
+        "mean_degree": float(degrees.mean()) if len(degrees) else 0.0,
+        "max_degree": int(degrees.max()) if len(degrees) else 0,
+        "isolated_users": int(np.count_nonzero(degrees == 0)),
+        "degree_distribution": degree_distribution(matrix).tolist(),
+        "components": int(num_components),
+        "largest_component": int(np.bincount(labels).max()) if len(labels) else 0,
+        "triangles": int(triangles.sum() // 3),
+        "average_clustering": float(clustering_coefficients(matrix, triangles).mean()) if len(degrees) else 0.0,
+        "max_core": int(cores.max()) if len(cores) else 0,
+        "core_distribution": np.bincount(cores).tolist()
+    }
+    if partners is not None:
+        nodes = np.arange(len(partners))
+        mutual = (partners >= 0) & (partners[np.maximum(partners, 0)] == nodes)
+        health["couples"] = int(np.count_nonzero(mutual) // 2)
+    return health
+
+
+def run_snapshot(path: str) -> dict[str, Any]:
+    """Compute the network health of the snapshot at path, store it in its extras as "analytics" and return it."""
+    from snapshot import load_connections, update_snapshot_extras
+
+    health = network_health(*load_connections(path))
+    update_snapshot_extras(path, analytics=health)
+    return health
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute network health statistics and store them in a snapshot.")
+    parser.add_argument("snapshot", help="path of the network snapshot")
+    args = parser.parse_args()
+
+    for key, value in run_snapshot(args.snapshot).items():
+        if not isinstance(value, list):
+            print(f"{key}: {value}")
@@ -0,0 +1,522 @@
+"""
+Benchmarks for the Destiny app.
+
+Run a benchmark by name, e.g.:
+
+    python benchmarks.py import
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import subprocess
+import sys
+import time
+
+# Third-party packages that should only be loaded when their features are used
+HEAVY_MODULES = ["dash", "plotly", "networkx", "pandas", "numpy", "scipy", "PIL", "faker", "python_ta"]
+
+
+def bench_import_time(module: str = "main", runs: int = 5) -> dict[str, object]:
+    """
+    Measure the cold import time of module with python -X importtime; for main, this is the part of
+    start-up before DestinyApp is constructed. Constructing it then loads faker (to generate users) and
+    PIL (for the home page image), which is not measured here.
+
+    Return the best cumulative import time over runs, in milliseconds, and the heavy
+    third-party packages that the import loaded.
+    """
+    pattern = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)")
+    best = None
+    loaded = set()
+
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            match = pattern.match(line)
+            if match is None:
+                continue
+            cumulative, indent, name = int(match.group(1)), match.group(2), match.group(3)
+            if name.split(".")[0] in HEAVY_MODULES:
+                loaded.add(name.split(".")[0])
+            if name == module and len(indent) == 1:
+                best = cumulative if best is None else min(best, cumulative)
+
+    return {"module": module, "import_ms": best / 1000, "heavy_modules_loaded": sorted(loaded)}
+
+
+def _population(size: int, seed: int = 1234) -> list:
+    """Return size generated users, the same way the app generates them."""
+    import user_network
+
+    return user_network.generate_users_with_class(size, seed)
+
+
+def bench_batch_ranking(size: int = 2000, k: int = 10) -> dict[str, object]:
+    """
+    Compare ranking the top k matches of every user with one preference tree per user against
+    ranking.Recommender.recommend_many, which ranks all users of a candidate pool in one vectorized pass.
+    A new Recommender is used for each mode, so nothing is served from its cache of earlier rankings.
+    """
+    import common
+    import ranking
+    from user_network import DEFAULT_CHARACTERISTICS_RANK
+
+    users = _population(size)
+
+    start = time.perf_counter()
+    per_user = [common.rank_candidates(u, DEFAULT_CHARACTERISTICS_RANK, users)[:k] for u in users]
+    tree_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = ranking.Recommender(users).recommend_many(users, DEFAULT_CHARACTERISTICS_RANK, k)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranking.Recommender(users).recommend_many(users, DEFAULT_CHARACTERISTICS_RANK, k, mode="weighted")
+    weighted_seconds = time.perf_counter() - start
+
+    same = all([u.name for u in b] == names for b, names in zip(batch, per_user))
+    return {"users": size, "tree_seconds": tree_seconds, "batch_seconds": batch_seconds,
+            "weighted_seconds": weighted_seconds, "speedup": tree_seconds / batch_seconds, "same_names": same}
+
+
+def bench_packed_vectors(size: int = 2000) -> dict[str, object]:
+    """
+    Compare the memory used by one user's match vectors as the pandas frame written by common.data_wrangling
+    (and as CSV text) against the same vectors packed into one integer per candidate.
+    """
+    import io
+    import pandas as pd
+    import ranking
+    from tree import filter_user_by_dating_goal
+    from user_network import DEFAULT_CHARACTERISTICS_RANK
+
+    users = _population(size)
+    user = users[0]
+    candidates = filter_user_by_dating_goal(users, user)
+
+    codes = ranking.encode_characteristics([user] + candidates, DEFAULT_CHARACTERISTICS_RANK)
+    packed = ranking.pack_codes(codes[:1], codes[1:])[0]
+    frame = pd.DataFrame({attribute: ((packed >> (len(DEFAULT_CHARACTERISTICS_RANK) - 1 - i)) & 1).astype(int)
+                          for i, attribute in enumerate(DEFAULT_CHARACTERISTICS_RANK)})
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False)
+
+    frame_bytes = int(frame.memory_usage(deep=True).sum())
+    return {"candidates": len(candidates), "pandas_bytes": frame_bytes, "csv_bytes": len(buffer.getvalue()),
+            "packed_bytes": packed.nbytes, "reduction": frame_bytes / packed.nbytes}
+
+
+def bench_attribute_index(size: int = 100000, queries: int = 200, k: int = 10) -> dict[str, object]:
+    """
+    Compare ranking single users against the whole pool with ranking users through an AttributeIndex,
+    with religion and major as the most important attributes.
+    """
+    import numpy as np
+    import ranking
+    from user_network import DEFAULT_CHARACTERISTICS_RANK
+
+    users = _population(size)
+    attributes = ["religion", "major"] + [a for a in DEFAULT_CHARACTERISTICS_RANK if a not in ("religion", "major")]
+
+    start = time.perf_counter()
+    index = ranking.AttributeIndex(users, attributes)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = [ranking.rank_codes(index.codes[i:i + 1], index.codes, k, np.array([i]))[0] for i in range(queries)]
+    scan_ms = (time.perf_counter() - start) * 1000 / queries
+
+    start = time.perf_counter()
+    pruned = [index.top_k(users[i], k, i) for i in range(queries)]
+    index_ms = (time.perf_counter() - start) * 1000 / queries
+
+    same = all(a.tolist() == b.tolist() for a, b in zip(scanned, pruned))
+    return {"users": size, "build_seconds": build_seconds, "full_scan_ms_per_user": scan_ms,
+            "index_ms_per_user": index_ms, "same_results": same}
+
+
+def bench_match_files(size: int = 100000, runs: int = 3) -> dict[str, object]:
+    """
+    Compare writing and reading one user's match file against a pool of size candidates as pandas CSV
+    and as a NumPy .npy record array, both in memory as data_wrangling does by default.
+    """
+    import common
+    import ranking
+    from user_network import DEFAULT_CHARACTERISTICS_RANK
+
+    users = _population(size)
+    codes = ranking.encode_characteristics(users, DEFAULT_CHARACTERISTICS_RANK)
+    packed = ranking.pack_codes(codes[:1], codes[1:])[0]
+    shifts = range(len(DEFAULT_CHARACTERISTICS_RANK) - 1, -1, -1)
+    matrix = [[(value >> shift) & 1 for shift in shifts] for value in packed.tolist()]
+    names = [u.name for u in users[1:]]
+
+    result = {"rows": len(names)}
+    for fmt in common.MATCH_FILE_FORMATS:
+        write_seconds = read_seconds = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            buffer = common.write_match_file(names, DEFAULT_CHARACTERISTICS_RANK, matrix, fmt=fmt)
+            write_seconds = min(write_seconds, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            common.read_match_file(buffer)
+            read_seconds = min(read_seconds, time.perf_counter() - start)
+
+        result[f"{fmt}_write_seconds"] = write_seconds
+        result[f"{fmt}_read_seconds"] = read_seconds
+        result[f"{fmt}_bytes"] = len(buffer.getvalue())
+
+    result["write_speedup"] = result["csv_write_seconds"] / result["npy_write_seconds"]
+    result["read_speedup"] = result["csv_read_seconds"] / result["npy_read_seconds"]
+    return result
+
+
+def bench_ingestion(rows: int = 1000000, num_attributes: int = 12) -> dict[str, object]:
+    """
+    Compare the throughput, in rows per second, of reading a match file row by row with csv.reader
+    (as build_preference_tree used to) against common.read_match_file on the CSV and .npy formats.
+    """
+    import csv
+    import os
+    import tempfile
+    import numpy as np
+    import common
+
+    rng = np.random.default_rng(1234)
+    names = [f"User {i}" for i in range(rows)]
+    heading = [f"attribute_{i}" for i in range(num_attributes)]
+    matrix = rng.integers(0, 2, size=(rows, num_attributes), dtype=np.uint8)
+
+    result = {"rows": rows}
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = common.write_match_file(names, heading, matrix, os.path.join(directory, "match.csv"))
+        npy_path = common.write_match_file(names, heading, matrix, os.path.join(directory, "match.npy"), "npy")
+
+        start = time.perf_counter()
+        with open(csv_path) as csv_file:
+            reader = csv.reader(csv_file)
+            next(reader)
+            parsed = [(row[0], [int(item) for item in row[1:]]) for row in reader]
+        result["csv_reader_rows_per_second"] = len(parsed) / (time.perf_counter() - start)
+        del parsed
+
+        for fmt, path in (("csv", csv_path), ("npy", npy_path)):
+            start = time.perf_counter()
+            _, _, loaded = common.read_match_file(path)
+            result[f"{fmt}_rows_per_second"] = len(loaded) / (time.perf_counter() - start)
+            result[f"{fmt}_same_matrix"] = bool(np.array_equal(loaded, matrix))
+            del loaded
+
+    return result
+
+
+def bench_tree_build(rows: int = 100000, num_attributes: int = 12) -> dict[str, object]:
+    """
+    Compare building a preference tree by calling insert_sequence for every candidate against
+    BinaryTree.from_matrix, for a random rows x num_attributes match matrix.
+    """
+    import numpy as np
+    from tree import BinaryTree
+
+    rng = np.random.default_rng(1234)
+    names = [f"User {i}" for i in range(rows)]
+    matrix = rng.integers(0, 2, size=(rows, num_attributes), dtype=np.uint8)
+
+    start = time.perf_counter()
+    inserted = BinaryTree("")
+    for name, match in zip(names, matrix.tolist()):
+        match.append(name)
+        inserted.insert_sequence(match)
+    insert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = BinaryTree.from_matrix(matrix, names)
+    bulk_seconds = time.perf_counter() - start
+
+    return {"rows": rows, "attributes": num_attributes, "insert_sequence_seconds": insert_seconds,
+            "from_matrix_seconds": bulk_seconds, "speedup": insert_seconds / bulk_seconds,
+            "same_tree": inserted.to_nested_list() == bulk.to_nested_list()}
+
+
+def bench_tree_serialization(rows: int = 100000, num_attributes: int = 12) -> dict[str, object]:
+    """
+    Compare the JSON output of BinaryTree.__str__ with BinaryTree.to_bytes for a preference tree over
+    a random rows x num_attributes match matrix: size, time to write, and time to read back. Reading
+    the binary file rebuilds the BinaryTree, while reading the JSON only parses it into nested lists.
+    """
+    import json
+    import os
+    import tempfile
+    import numpy as np
+    from tree import BinaryTree
+
+    rng = np.random.default_rng(1234)
+    names = [f"User {i}" for i in range(rows)]
+    tree = BinaryTree.from_matrix(rng.integers(0, 2, size=(rows, num_attributes), dtype=np.uint8), names)
+
+    start = time.perf_counter()
+    text = str(tree)
+    json_write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    json.loads(text)
+    json_read_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.bin")
+        start = time.perf_counter()
+        tree.save(path)
+        binary_write_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = BinaryTree.load(path)
+        binary_read_seconds = time.perf_counter() - start
+        binary_bytes = os.path.getsize(path)
+
+    return {"rows": rows, "json_bytes": len(text.encode("utf-8")), "binary_bytes": binary_bytes,
+            "json_write_seconds": json_write_seconds, "binary_write_seconds": binary_write_seconds,
+            "json_read_seconds": json_read_seconds, "binary_read_seconds": binary_read_seconds,
+            "size_reduction": len(text.encode("utf-8")) / binary_bytes,
+            "round_trip": loaded.to_nested_list() == tree.to_nested_list()}
+
+
+def bench_network_health(size: int = 100000, degree: int = 50) -> dict[str, object]:
+    """
+    Time analytics.network_health on a random friendship network of size users with about degree
+    friends each, as the analytics batch job runs it on a snapshot.
+    """
+    import numpy as np
+    from scipy import sparse
+    import analytics
+
+    rng = np.random.default_rng(1234)
+    edges = size * degree // 2
+    rows, cols = rng.integers(0, size, edges), rng.integers(0, size, edges)
+    matrix = sparse.coo_matrix((np.ones(edges, dtype=np.int64), (rows, cols)), shape=(size, size))
+    matrix = ((matrix + matrix.T) > 0).astype(np.int64).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    partners = rng.permutation(size).astype(np.int64)
+
+    start = time.perf_counter()
+    health = analytics.network_health(matrix.indptr.astype(np.int64), matrix.indices.astype(np.int64), partners)
+    seconds = time.perf_counter() - start
+
+    return {"users": size, "friendships": health["friendships"], "seconds": seconds,
+            "components": health["components"], "triangles": health["triangles"], "max_core": health["max_core"]}
+
+
+def bench_friends_of_friends(size: int = 1000000, degree: int = 50, queries: int = 1000) -> dict[str, object]:
+    """
+    Time finding the top 20 friends of friends of queries users in a random friendship network of size
+    users with about degree friends each, one user at a time and with sparse products.
+    """
+    import numpy as np
+    import social
+    from adjacency import Adjacency
+
+    rng = np.random.default_rng(1234)
+    network = Adjacency()
+    for _ in range(size):
+        network.add_user(type("Node", (), {"network": None, "_social_current": [], "_romantic_current": None})())
+    for user1, user2 in zip(rng.integers(0, size, size * degree // 2).tolist(),
+                            rng.integers(0, size, size * degree // 2).tolist()):
+        if user1 != user2:
+            network.add_friendship(network.users[user1], network.users[user2])
+
+    start = time.perf_counter()
+    single = [social.top_mutual_friends(network, node, 20) for node in range(queries)]
+    single_ms = (time.perf_counter() - start) * 1000 / queries
+
+    indptr, indices = network.to_csr()
+    start = time.perf_counter()
+    batch = social.mutual_friends_many(indptr, indices, np.arange(queries), 20)
+    batch_ms = (time.perf_counter() - start) * 1000 / queries
+
+    same = all([(int(n), int(c)) for n, c in b] == s for b, s in zip(batch, single))
+    return {"users": size, "friendships": int(indptr[-1]) // 2, "single_ms_per_user": single_ms,
+            "batch_ms_per_user": batch_ms, "same_results": same}
+
+
+def bench_event_store(writes: int = 100000) -> dict[str, object]:
+    """
+    Measure how long recording an event in a store.EventStore blocks the caller, and how many events per
+    second the background writer commits to the database.
+    """
+    import os
+    import tempfile
+    from events import Event
+    from store import EventStore
+
+    events = [Event(version, "socialize", {"user1": version % 2000, "user2": (version * 7) % 2000})
+              for version in range(1, writes + 1)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = EventStore(os.path.join(directory, "events.db"))
+
+        start = time.perf_counter()
+        worst = 0.0
+        for event in events:
+            before = time.perf_counter()
+            store.append(event)
+            worst = max(worst, time.perf_counter() - before)
+        append_seconds = time.perf_counter() - start
+
+        store.flush()
+        written_seconds = time.perf_counter() - start
+        store.close()
+        stored = len(EventStore(os.path.join(directory, "events.db")).events())
+
+    return {"writes": writes, "mean_append_us": append_seconds / writes * 1e6, "max_append_ms": worst * 1000,
+            "writes_per_second": writes / written_seconds, "syncs": store.syncs, "all_stored": stored == writes}
+
+
+def bench_repository(size: int = 200000, queries: int = 20) -> dict[str, object]:
+    """
+    Compare looking up a user by name, counting their candidates and taking the first page of 20 of them
+    with list comprehensions over User objects (as tree.filter_user_by_dating_goal and ui.py do) against
+    indexed queries on a repository.UserRepository, and time inserting the population.
+    """
+    import os
+    import tempfile
+    from repository import UserRepository
+    from tree import filter_user_by_dating_goal
+
+    users = _population(size)
+    users[0].match(next(u for u in users[1:] if u.gender != users[0].gender))
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = UserRepository(os.path.join(directory, "users.db"))
+        start = time.perf_counter()
+        repository.add_users(users)
+        insert_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        listed = []
+        for i in range(queries):
+            user = [u for u in users if u.name == users[i].name][0]
+            candidates = filter_user_by_dating_goal(users, user)
+            listed.append((len(candidates), [u.name for u in candidates[:20]]))
+        list_ms = (time.perf_counter() - start) * 1000 / queries
+
+        start = time.perf_counter()
+        indexed = []
+        for i in range(queries):
+            row = repository.find_by_name(users[i].name)[0]
+            page = [r["name"] for r in repository.candidates(row, limit=20)]
+            indexed.append((repository.count_candidates(row), page))
+        query_ms = (time.perf_counter() - start) * 1000 / queries
+        repository.close()
+
+    return {"users": size, "insert_seconds": insert_seconds, "list_ms_per_user": list_ms,
+            "repository_ms_per_user": query_ms, "same_results": listed == indexed}
+
+
+def bench_export(size: int = 200000) -> dict[str, object]:
+    """
+    Measure how long export.export_users takes to write size users, the longest time between two progress
+    reports (how stale the admin page's progress can get), and the most memory the export allocates.
+    """
+    import os
+    import tempfile
+    import tracemalloc
+    from export import export_users, read_export
+    from user_network import UserDirectory
+
+    users = _population(size)
+    UserDirectory(users)
+    reports = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.jsonl.gz")
+        start = time.perf_counter()
+        written = export_users(users, path, lambda done, total: reports.append(time.perf_counter()))
+        seconds = time.perf_counter() - start
+
+        # Tracing slows the export down several times, so the memory is measured on a second run
+        tracemalloc.start()
+        export_users(users, path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        file_mb = os.path.getsize(path) / 2 ** 20
+        read = sum(1 for _ in read_export(path))
+
+    gaps = [later - earlier for earlier, later in zip([start] + reports, reports)]
+    return {"users": size, "seconds": seconds, "users_per_second": written / seconds,
+            "max_progress_gap_ms": max(gaps) * 1000, "peak_mb": peak / 2 ** 20, "file_mb": file_mb,
+            "all_read_back": read == size}
+
+
+def bench_network_counters(size: int = 20000, lookups: int = 200) -> dict[str, object]:
+    """
+    Compare looking up the romantic partner count of users by scanning the users looking for love (as
+    graph.get_romantic_count did) against reading an events.NetworkCounters, and time building the social
+    figure with the friend counts counted from the users against read from the counters.
+    """
+    import graph
+    import user_network
+    from events import EventLog, NetworkCounters
+
+    users = _population(size)
+    user_network.UserDirectory(users)
+    friends, love = user_network.simulate_connections(users)
+    log = EventLog(users)
+    counters = NetworkCounters(log)
+    singles = [user for user in love if user.romantic_current is None][:lookups]
+
+    start = time.perf_counter()
+    scanned = [graph.get_romantic_count(user, love) for user in singles]
+    scan_ms = (time.perf_counter() - start) * 1000 / len(singles)
+
+    start = time.perf_counter()
+    counted = [graph.get_romantic_count(user, love, counters, log) for user in singles]
+    counter_ms = (time.perf_counter() - start) * 1000 / len(singles)
+
+    # graph.create_app keeps the positions of the listed users in the log between figures
+    _, positions = graph.plot_social_connections(friends)
+    index = log.positions(friends)
+    users_figure_ms = counters_figure_ms = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        graph.plot_social_connections(friends, positions=positions)
+        users_figure_ms = min(users_figure_ms, (time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        graph.plot_social_connections(friends, positions=positions, friend_counts=counters.friend_counts[index])
+        counters_figure_ms = min(counters_figure_ms, (time.perf_counter() - start) * 1000)
+
+    return {"users": size, "scan_ms_per_lookup": scan_ms, "counter_ms_per_lookup": counter_ms,
+            "same_counts": scanned == counted, "figure_ms_counting_users": users_figure_ms,
+            "figure_ms_with_counters": counters_figure_ms}
+
+
+BENCHMARKS = {
+    "import": bench_import_time,
+    "batch-ranking": bench_batch_ranking,
+    "packed-vectors": bench_packed_vectors,
+    "attribute-index": bench_attribute_index,
+    "match-files": bench_match_files,
+    "ingestion": bench_ingestion,
+    "tree-build": bench_tree_build,
+    "tree-serialization": bench_tree_serialization,
+    "network-health": bench_network_health,
+    "friends-of-friends": bench_friends_of_friends,
+    "event-store": bench_event_store,
+    "repository": bench_repository,
+    "export": bench_export,
+    "network-counters": bench_network_counters
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a Destiny benchmark.")
+    parser.add_argument("name", choices=sorted(BENCHMARKS), help="the benchmark to run")
+    args = parser.parse_args()
+
+    for key, value in BENCHMARKS[args.name]().items():
+        print(f"{key}: {value}")
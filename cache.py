@@ -0,0 +1,116 @@
+"""
+This module provides a least-recently-used cache with size-based eviction and hit/miss counters.
+It is shared by the network graph figures and other precomputed results.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    A least-recently-used cache bounded by the total size of its values.
+
+    The size of each value is measured with sizeof (e.g. len for bytes values). When the total size
+    exceeds max_size, the least recently used entries are evicted first.
+
+    Instance Attributes:
+    - max_size: the maximum total size of all values kept in the cache.
+    - hits: the number of lookups that found a value.
+    - misses: the number of lookups that found nothing.
+    - evictions: the number of entries removed to make room for new ones.
+
+    Representation Invariants:
+    - self.max_size > 0
+    - self._total_size <= self.max_size
+
+    >>> c = LRUCache(max_size=6, sizeof=len)
+    >>> c.put("a", b"123")
+    >>> c.put("b", b"456")
+    >>> c.get("a")
+    b'123'
+    >>> c.put("c", b"789")
+    >>> c.get("b") is None
+    True
+    >>> c.stats()["evictions"]
+    1
+    """
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    _sizeof: Callable[[Any], int]
+    _entries: OrderedDict
+    _total_size: int
+
+    def __init__(self, max_size: int, sizeof: Optional[Callable[[Any], int]] = None) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sizeof = sizeof if sizeof is not None else (lambda _: 1)
+        self._entries = OrderedDict()
+        self._total_size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value stored under key and mark it as recently used, or None if it is not cached."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries if the cache grows too large.
+
+        A value larger than max_size on its own is not stored.
+        """
+        size = self._sizeof(value)
+        if key in self._entries:
+            self._total_size -= self._entries.pop(key)[1]
+        if size > self.max_size:
+            return
+
+        self._entries[key] = (value, size)
+        self._total_size += size
+
+        while self._total_size > self.max_size:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self._total_size -= old_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry from the cache. The counters are kept."""
+        self._entries.clear()
+        self._total_size = 0
+
+    def stats(self) -> dict[str, float]:
+        """Return the cache counters, including the hit rate over all lookups so far."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self._total_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['collections'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
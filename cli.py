@@ -0,0 +1,142 @@
+"""
+Headless command-line entry point for batch matching runs.
+
+Unlike main.py, this module never imports tkinter, PIL or dash, so it can run in cron jobs and on
+benchmark machines without a display. For example:
+
+    python cli.py --size 2000 --seed 1234 --workers 4 --k 10 --output matches.csv
+    python cli.py --load network_snapshot.pkl --priority religion,major,interests --output matches.json
+    python cli.py --size 100000 --database users.db
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import time
+from typing import Optional
+
+import user_network
+from user_network import User, DEFAULT_CHARACTERISTICS_RANK
+
+
+def parse_priority(priority: Optional[str]) -> list[str]:
+    """
+    Return the attribute ranking given as a comma-separated string, or the default ranking if priority is None.
+
+    >>> parse_priority("religion, major")
+    ['religion', 'major']
+    """
+    if priority is None:
+        return list(DEFAULT_CHARACTERISTICS_RANK)
+
+    attributes = [attribute.strip() for attribute in priority.split(",") if attribute.strip()]
+    unknown = [attribute for attribute in attributes if attribute not in DEFAULT_CHARACTERISTICS_RANK]
+    if unknown:
+        raise ValueError(f"Unknown attributes: {', '.join(unknown)}. "
+                         f"Choose from: {', '.join(DEFAULT_CHARACTERISTICS_RANK)}")
+    if len(set(attributes)) != len(attributes):
+        raise ValueError("Each attribute can only be ranked once.")
+    return attributes
+
+
+def load_population(size: int, seed: int, snapshot_path: Optional[str] = None) -> list[User]:
+    """
+    Return the users to match: the user list of a saved snapshot, or size newly generated users.
+    """
+    if snapshot_path is not None:
+        from snapshot import load_snapshot
+        return load_snapshot(snapshot_path)["user_list"]
+
+    users = user_network.generate_users_with_class(size, seed)
+    user_network.add_fixed_users(users)
+    user_network.make_names_unique(users)
+    return users
+
+
+def write_results(users: list[User], output: str) -> None:
+    """
+    Write each user's recommendations, friends and partner to output.
+
+    The format is JSON if output ends with .json, and CSV otherwise.
+    """
+    rows = [{
+        "name": user.name,
+        "dating_goal": user.dating_goal,
+        "recommendations": [u.name for u in (user.interested_friend if user.dating_goal == "Meeting new friends"
+                                             else user.interested_romantic)],
+        "friends": [u.name for u in user.social_current],
+        "partner": user.romantic_current.name if user.romantic_current is not None else None
+    } for user in users]
+
+    with open(output, "w", newline="") as file:
+        if output.endswith(".json"):
+            json.dump(rows, file, indent=2)
+        else:
+            writer = csv.writer(file)
+            writer.writerow(["name", "dating_goal", "recommendations", "friends", "partner"])
+            for row in rows:
+                writer.writerow([row["name"], row["dating_goal"], "; ".join(row["recommendations"]),
+                                 "; ".join(row["friends"]), row["partner"] or ""])
+
+
+def run(size: int = 2000, seed: int = 1234, workers: int = 1, k: int = 10, priority: Optional[list[str]] = None,
+        output: str = "matches.csv", snapshot_path: Optional[str] = None,
+        mode: str = "lexicographic", database: Optional[str] = None) -> dict[str, float]:
+    """
+    Run the matching pipeline and write the results to output, and to a repository.UserRepository at
+    database if given, replacing the users stored there by an earlier run.
+
+    Return the number of users, the time taken by each step, in seconds, and the hit rate of the
+    recommendation cache.
+    """
+    from ranking import Recommender
+
+    start = time.perf_counter()
+    users = load_population(size, seed, snapshot_path)
+    loaded = time.perf_counter()
+
+    recommender = Recommender(users)
+    user_network.simulate_connections(users, priority, k, workers, mode, recommender)
+    matched = time.perf_counter()
+
+    write_results(users, output)
+    if database is not None:
+        from repository import UserRepository
+        repository = UserRepository(database)
+        repository.add_users(users, replace=True)
+        repository.close()
+    written = time.perf_counter()
+
+    return {"users": len(users), "load_seconds": loaded - start, "match_seconds": matched - loaded,
+            "write_seconds": written - matched, "cache_hit_rate": recommender.stats()["hit_rate"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Destiny matching pipeline without the GUI.")
+    parser.add_argument("--size", type=int, default=2000, help="number of users to generate")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for the generated users")
+    parser.add_argument("--load", dest="snapshot", default=None,
+                        help="match the users of a saved network snapshot instead of generating them")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes used for ranking")
+    parser.add_argument("--k", type=int, default=10, help="number of recommendations kept per user")
+    parser.add_argument("--priority", default=None,
+                        help="comma-separated attributes from most to least important "
+                             f"(default: {','.join(DEFAULT_CHARACTERISTICS_RANK)})")
+    parser.add_argument("--mode", choices=["lexicographic", "popcount", "weighted"], default="lexicographic",
+                        help="rank by strict priority order, number of matching attributes or a weighted score")
+    parser.add_argument("--output", default="matches.csv", help="results file (.csv or .json)")
+    parser.add_argument("--database", default=None,
+                        help="also store the matched users in this SQLite database, replacing the users already in it")
+    args = parser.parse_args()
+
+    try:
+        attribute_rank = parse_priority(args.priority)
+    except ValueError as e:
+        parser.error(str(e))
+
+    summary = run(args.size, args.seed, args.workers, args.k, attribute_rank, args.output, args.snapshot, args.mode,
+                  args.database)
+    print(f"Matched {summary['users']} users in {summary['match_seconds']:.2f}s "
+          f"(load {summary['load_seconds']:.2f}s, write {summary['write_seconds']:.2f}s, "
+          f"cache hit rate {summary['cache_hit_rate']:.1%}) -> {args.output}")
@@ -2,26 +2,34 @@
 This module provides functions for processing and analyzing user data.
 """
 from __future__ import annotations
-from typing import Optional
+from collections import defaultdict
+from itertools import islice
+from typing import IO, Iterable, Optional, Union
 
-import csv
-import pandas as pd
-import python_ta
+import io
 from tree import add_priority, BinaryTree, filter_user_by_dating_goal
 
+# The formats a match file can be written in: pandas CSV text, or a binary NumPy .npy record array
+MATCH_FILE_FORMATS = ("csv", "npy")
+
 
 def data_wrangling(current_user, user_characteristics, users_list,
-                   file_name: Optional[str] = "data.csv") -> None:
+                   file_name: Optional[Union[str, IO]] = None,
+                   fmt: str = "csv") -> Union[str, IO]:
     """
-    Creates a CSV file containing user data, including their characteristics and potential matches.
+    Creates a match file containing user data, including their characteristics and potential
+    matches.
 
-    The CSV file structure:
+    The file structure:
     - The first row contains characteristics ordered according to users' ranking.
     - The first column contains user names.
     - Each row represents a potential match, with a ranking value of 0 or 1.
       - A value of 1 indicates a match in characteristics with the current user.
       - A value of 0 indicates no match.
 
+    The file is written to file_name (a path or an open file) in the given format (see
+    write_match_file). If file_name is None, it is written to a new in-memory buffer instead, so
+    that concurrent sessions never share a file. Return file_name, or the buffer.
     """
     if isinstance(user_characteristics, list):
         heading = user_characteristics
@@ -31,14 +39,10 @@ def data_wrangling(current_user, user_characteristics, users_list,
 
     potential_users = filter_user_by_dating_goal(users_list, current_user)
 
-    data = {"name": []}
-
+    matrix = []
     for person in potential_users:
-        data["name"].append(person.name)
-
-    for attribute in heading:
         answer = []
-        for person in potential_users:
+        for attribute in heading:
             current_user_value = getattr(current_user.characteristics, attribute)
             potential_user_value = getattr(person.characteristics, attribute)
 
@@ -46,55 +50,152 @@ def data_wrangling(current_user, user_characteristics, users_list,
                 answer.append(1)
             else:
                 answer.append(0)
-        data[attribute] = answer
+        matrix.append(answer)
+
+    names = [person.name for person in potential_users]
+    return write_match_file(names, heading, matrix, file_name, fmt)
+
+
+def write_match_file(names: list[str], heading: list[str], matrix: list[list[int]],
+                     file: Optional[Union[str, IO]] = None, fmt: str = "csv") -> Union[str, IO]:
+    """
+    Write a match file with one row per name, holding that row of the 0/1 matrix under heading.
+
+    fmt is "csv" (written with pandas) or "npy" (a NumPy record array with a name field and one
+    uint8 field per attribute, which is much faster to write and read). If file is None, the file is
+    written to a new io.StringIO ("csv") or io.BytesIO ("npy") buffer, which is returned rewound.
 
-    df = pd.DataFrame(data)
-    csv_file_path = file_name
+    >>> buffer = write_match_file(["A", "B"], ["religion", "major"], [[1, 0], [0, 1]], fmt="npy")
+    >>> names, columns, values = read_match_file(buffer)
+    >>> names, columns, values.tolist()
+    (['A', 'B'], ['religion', 'major'], [[1, 0], [0, 1]])
+    """
+    import numpy as np
+
+    if fmt not in MATCH_FILE_FORMATS:
+        raise ValueError(f"Unknown match file format: {fmt}")
+    matrix = np.asarray(matrix, dtype=np.uint8).reshape(len(names), len(heading))
+
+    if file is None:
+        file = io.StringIO() if fmt == "csv" else io.BytesIO()
+        buffer = file
+    else:
+        buffer = None
 
-    df.to_csv(csv_file_path, index=False)
+    if fmt == "csv":
+        import pandas as pd
 
+        df = pd.DataFrame(matrix, columns=heading)
+        df.insert(0, "name", names)
+        df.to_csv(file, index=False)
+    else:
+        records = np.empty(len(names), dtype=[("name", np.str_, max(map(len, names), default=1))]
+                           + [(attribute, np.uint8) for attribute in heading])
+        records["name"] = names
+        for column, attribute in enumerate(heading):
+            records[attribute] = matrix[:, column]
+        np.save(file, records)
+
+    if buffer is not None:
+        buffer.seek(0)
+    return file
 
-def generate_10_people_list(full_list: list) -> list:
+
+def read_match_file(file: Union[str, IO]) -> tuple[list[str], list[str], object]:
+    """
+    Return the names, heading and N x D uint8 match matrix of a match file written by
+    write_match_file.
+
+    The format is "npy" for paths ending in .npy and binary buffers, and "csv" otherwise. The
+    whole file is loaded at once: CSV files are parsed by pandas straight into uint8 columns, and
+    .npy files are memory-mapped, with the matrix a view of the mapped records instead of a copy.
+    """
+    import numpy as np
+
+    if match_file_format(file) == "npy":
+        records = np.load(file, mmap_mode="r" if isinstance(file, str) else None)
+        heading = list(records.dtype.names[1:])
+        # The uint8 fields follow the name field in every record, so they form a strided N x D view
+        offset = records.dtype.fields[heading[0]][1] if heading else records.dtype.itemsize
+        raw = records.view(np.uint8).reshape(len(records), records.dtype.itemsize)
+        return records["name"].tolist(), heading, raw[:, offset:offset + len(heading)]
+
+    import pandas as pd
+
+    df = pd.read_csv(file, dtype=defaultdict(lambda: np.uint8, name=str), na_filter=False)
+    return df["name"].tolist(), list(df.columns[1:]), df.iloc[:, 1:].to_numpy(dtype=np.uint8)
+
+
+def match_file_format(file: Union[str, IO]) -> str:
+    """Return the format of a match file: "npy" for .npy paths and binary buffers, else "csv"."""
+    if isinstance(file, str):
+        return "npy" if file.endswith(".npy") else "csv"
+    return "csv" if isinstance(file, io.TextIOBase) else "npy"
+
+
+def generate_10_people_list(full_list: Union[list, Iterable]) -> list:
     """
     Generates a list of 10 people by sequentially removing the first element
     from the provided full_list.
 
+    full_list can also be an iterator, such as BinaryTree.iter_preferences(), in which case only
+    the first 10 people are taken from it (or all of them, if there are fewer).
+
     >>> people = ["Person1", "Person2", "Person3", "Person4", "Person5",
     ...           "Person6", "Person7", "Person8", "Person9", "Person10", "Person11"]
     >>> generate_10_people_list(people)
-    ['Person1', 'Person2', 'Person3', 'Person4', 'Person5',
-    ...           "Person6", "Person7", "Person8", "Person9", "Person10"]
+    ['Person1', 'Person2', 'Person3', 'Person4', 'Person5', \
+'Person6', 'Person7', 'Person8', 'Person9', 'Person10']
+    >>> generate_10_people_list(iter(["Person1", "Person2"]))
+    ['Person1', 'Person2']
     """
+    if not isinstance(full_list, list):
+        return list(islice(full_list, 10))
+
     new_list = []
     while len(new_list) < 10:
         new_list.append(full_list.pop(0))
     return new_list
 
 
-def build_preference_tree(file: str) -> BinaryTree():
+def build_preference_tree(file: Union[str, IO]) -> BinaryTree():
     """
-    Builds a preference tree from a CSV file.
+    Builds a preference tree from a match file written by data_wrangling: a path, or an open file or
+    buffer, in either match file format.
 
+    The file is loaded in one pass by read_match_file instead of row by row, and the tree is
+    built from the whole match matrix at once with BinaryTree.from_matrix.
     """
+    names, _, matrix = read_match_file(file)
+    return BinaryTree.from_matrix(matrix, names)
+
 
+def rank_candidates(current_user, user_characteristics: list[str], users_list: list) -> list[str]:
+    """
+    Return the names of current_user's potential matches, ranked by the preference tree.
+
+    This gives the same ranking as data_wrangling followed by build_preference_tree and
+    run_preference_tree, but builds the tree in memory instead of going through a CSV file.
+    """
     tree = BinaryTree("")
+    current_characteristics = current_user.characteristics
 
-    with open(file) as csv_file:
-        reader = csv.reader(csv_file)
-        next(reader)
+    for person in filter_user_by_dating_goal(users_list, current_user):
+        match = [1 if getattr(current_characteristics, attribute)
+                 == getattr(person.characteristics, attribute) else 0
+                 for attribute in user_characteristics]
+        match.append(person.name)
+        tree.insert_sequence(match)
 
-        for row in reader:
-            name = str(row[0])
-            match = [int(item) for item in row[1:]]
-            match.append(name)
-            tree.insert_sequence(match)
-    return tree
+    return tree.run_preference_tree()
 
 
 if __name__ == "__main__":
+    import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['pandas', 'user_network', 'tree', 'csv'],
+        'extra-imports': ['pandas', 'numpy', 'user_network', 'tree', 'io', 'collections',
+                          'itertools'],
         'allowed-io': ['data_wrangling', 'build_preference_tree'],
         'max-line-length': 100,
-        'disable': ['R1705', 'C0200', 'E9970']
+        'disable': ['R1705', 'C0200', 'E9970', 'C0415']
     })
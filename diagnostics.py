@@ -0,0 +1,216 @@
+"""
+Memory diagnostics for the whole application state.
+
+collect_report takes a tracemalloc snapshot and attributes every traced allocation to a subsystem (the
+users and their connections, preference trees, the ranking arrays, pandas frames, plotly figures, ...)
+by the innermost frame of its traceback that belongs to one, and counts the live objects by type. Reports
+are plain dictionaries, saved as JSON so they can be compared between runs with compare_reports:
+
+    start_tracing()
+    ...
+    report = collect_report("after matching")
+    save_report(report, "memory.json")
+    print(format_report(report, load_report("memory_baseline.json")))
+
+Only allocations made after start_tracing are traced, so it should be called as early as possible; set
+the DESTINY_TRACE_MEMORY environment variable to have DestinyApp start tracing when it starts.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import os
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Optional
+
+# Set this environment variable to trace allocations from the start of the app
+TRACE_ENVIRONMENT_VARIABLE = "DESTINY_TRACE_MEMORY"
+
+# The number of frames kept per traced allocation; enough to see past library internals to a subsystem
+TRACE_FRAMES = 25
+
+# The directory of the app's own modules
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The subsystems allocations are attributed to, each with the path fragments of its modules: a .py fragment is
+# the name of a module in PROJECT_DIR, and any other fragment can appear anywhere in the path. The innermost
+# frame that matches any fragment decides the subsystem, so library internals win over the app code calling them.
+SUBSYSTEMS = {
+    "pandas frames": ["/pandas/"],
+    "plotly figures": ["/plotly/", "/_plotly_utils/", "graph.py"],
+    "networkx graphs": ["/networkx/"],
+    "dash": ["/dash/", "/flask/", "/werkzeug/"],
+    "preference trees": ["tree.py", "common.py"],
+    "ranking": ["ranking.py", "social.py", "analytics.py", "cache.py"],
+    "users and connections": ["user_network.py", "adjacency.py", "events.py", "snapshot.py", "/faker/"],
+    "storage": ["store.py", "repository.py", "/sqlite3/"],
+    "interface": ["ui.py", "/tkinter/", "/PIL/"],
+    "imported modules": ["<frozen importlib"]
+}
+
+# The number of object types listed in a report
+TOP_OBJECT_TYPES = 25
+
+
+def start_tracing() -> None:
+    """Start tracing memory allocations, if they are not traced already."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+
+
+def subsystem_of(filenames: list[str]) -> str:
+    """
+    Return the subsystem of an allocation whose traceback has the given filenames, innermost first.
+
+    >>> subsystem_of(["/venv/lib/pandas/core/frame.py", os.path.join(PROJECT_DIR, "common.py")])
+    'pandas frames'
+    >>> subsystem_of([os.path.join(PROJECT_DIR, "graph.py")])
+    'plotly figures'
+    >>> subsystem_of(["/venv/lib/networkx/classes/graph.py"])
+    'networkx graphs'
+    >>> subsystem_of(["/venv/lib/sympy/printing/tree.py", "/usr/lib/python3/json/decoder.py"])
+    'other'
+    """
+    return _subsystem_of(filenames, {})
+
+
+def _subsystem_of(filenames: list[str], known: dict[str, Optional[str]]) -> str:
+    """
+    Return subsystem_of(filenames), where known maps the filenames already matched to their subsystem (or
+    None), and is updated with the new ones. A snapshot has thousands of tracebacks over a few hundred files.
+    """
+    for filename in filenames:
+        if filename not in known:
+            known[filename] = _file_subsystem(filename)
+        if known[filename] is not None:
+            return known[filename]
+    return "other"
+
+
+def _file_subsystem(filename: str) -> Optional[str]:
+    """Return the subsystem of the module at filename, or None if it does not belong to one."""
+    project_dir = PROJECT_DIR.replace("\\", "/")
+    normalized = filename.replace("\\", "/")
+    directory, basename = normalized.rsplit("/", 1) if "/" in normalized else ("", normalized)
+    for subsystem, fragments in SUBSYSTEMS.items():
+        if any(directory == project_dir and basename == fragment if fragment.endswith(".py")
+               else fragment in normalized for fragment in fragments):
+            return subsystem
+    return None
+
+
+def memory_by_subsystem(snapshot: tracemalloc.Snapshot) -> dict[str, dict[str, int]]:
+    """Return the traced bytes and allocation count of every subsystem in snapshot, largest first."""
+    totals = {}
+    known = {}
+    for statistic in snapshot.statistics("traceback"):
+        # tracemalloc lists the most recent frame last
+        subsystem = _subsystem_of([frame.filename for frame in reversed(statistic.traceback)], known)
+        entry = totals.setdefault(subsystem, {"bytes": 0, "allocations": 0})
+        entry["bytes"] += statistic.size
+        entry["allocations"] += statistic.count
+    return dict(sorted(totals.items(), key=lambda item: -item[1]["bytes"]))
+
+
+def object_counts(limit: Optional[int] = TOP_OBJECT_TYPES) -> dict[str, int]:
+    """Return the number of live objects tracked by the garbage collector, by type, most common first."""
+    # While allocations are traced, every allocation records a traceback. Incrementing a count past the cached
+    # small ints and type.__qualname__ both allocate, so the objects are grouped in one list per type (which only
+    # allocates when a list grows) and each type is named once.
+    by_type = {}
+    for obj in gc.get_objects():
+        kind = type(obj)
+        group = by_type.get(kind)
+        if group is None:
+            by_type[kind] = group = []
+        group.append(obj)
+
+    counts = Counter()
+    for kind, group in by_type.items():
+        counts[kind.__qualname__] += len(group)
+    return dict(counts.most_common(limit))
+
+
+def collect_report(label: str = "") -> dict[str, Any]:
+    """
+    Return a memory report of the current process: the traced memory by subsystem (empty if tracing has
+    not been started) and the live objects by type.
+    """
+    report = {"label": label, "time": time.time(), "tracing": tracemalloc.is_tracing(),
+              "traced_bytes": 0, "peak_bytes": 0, "subsystems": {}, "objects": object_counts()}
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        report["traced_bytes"], report["peak_bytes"] = tracemalloc.get_traced_memory()
+        report["subsystems"] = memory_by_subsystem(snapshot)
+    return report
+
+
+def compare_reports(report: dict[str, Any], baseline: dict[str, Any]) -> dict[str, dict[str, int]]:
+    """
+    Return the change in bytes of every subsystem and in count of every object type from baseline to report.
+
+    >>> old = {"subsystems": {"ranking": {"bytes": 10, "allocations": 1}}, "objects": {"User": 2}}
+    >>> new = {"subsystems": {"ranking": {"bytes": 25, "allocations": 2}}, "objects": {"User": 3, "dict": 4}}
+    >>> compare_reports(new, old)
+    {'subsystems': {'ranking': 15}, 'objects': {'dict': 4, 'User': 1}}
+    """
+    def deltas(current: dict[str, int], previous: dict[str, int]) -> dict[str, int]:
+        changes = {key: current.get(key, 0) - previous.get(key, 0) for key in {**previous, **current}}
+        return dict(sorted(((key, value) for key, value in changes.items() if value),
+                           key=lambda item: -abs(item[1])))
+
+    return {
+        "subsystems": deltas({key: value["bytes"] for key, value in report["subsystems"].items()},
+                             {key: value["bytes"] for key, value in baseline["subsystems"].items()}),
+        "objects": deltas(report["objects"], baseline["objects"])
+    }
+
+
+def format_report(report: dict[str, Any], baseline: Optional[dict[str, Any]] = None) -> str:
+    """Return report as text, with the changes since baseline if given."""
+    changes = compare_reports(report, baseline) if baseline is not None else {"subsystems": {}, "objects": {}}
+    lines = [f"MEMORY REPORT {report['label']}".rstrip()]
+
+    if report["tracing"]:
+        lines.append(f"  Traced: {report['traced_bytes'] / 2 ** 20:.1f} MiB "
+                     f"(peak {report['peak_bytes'] / 2 ** 20:.1f} MiB)")
+        for subsystem, entry in report["subsystems"].items():
+            change = changes["subsystems"].get(subsystem)
+            suffix = f" ({change / 2 ** 20:+.1f} MiB)" if change else ""
+            lines.append(f"  {subsystem}: {entry['bytes'] / 2 ** 20:.1f} MiB in {entry['allocations']} blocks{suffix}")
+    else:
+        lines.append(f"  Allocations are not traced; set {TRACE_ENVIRONMENT_VARIABLE}=1 to trace them from start-up")
+
+    lines.append("  Live objects by type:")
+    for name, count in report["objects"].items():
+        change = changes["objects"].get(name)
+        lines.append(f"    {name}: {count}" + (f" ({change:+d})" if change else ""))
+    return "\n".join(lines)
+
+
+def save_report(report: dict[str, Any], path: str) -> None:
+    """Save report to path as JSON, through a temporary file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_report(path: str) -> Optional[dict[str, Any]]:
+    """Return the report saved at path, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['gc', 'json', 'os', 'time', 'tracemalloc', 'collections'],
+        'allowed-io': ['save_report', 'load_report'],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
@@ -0,0 +1,359 @@
+"""
+An append-only log of the changes made to a live user network.
+
+Every profile added and every friendship or match made through an EventLog is applied to the users in
+place (through User.socialize and User.match, as before) and recorded as an Event with the next version
+number. Structures derived from the network subscribe to the log and update themselves from each event
+instead of rescanning the users: NetworkCounters keeps friend counts and partners in arrays, and LayoutCache places
+new and newly connected users in existing graph layouts.
+
+Events refer to users by their position in the log's user list, which matches the user_list of a
+snapshot. store.EventStore keeps them between runs and replays them over the population on the next start.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Callable, Optional
+
+from user_network import User, Characteristics
+
+EVENT_KINDS = ("profile-add", "socialize", "match")
+
+
+class Event:
+    """
+    One change to the network.
+
+    Instance Attributes:
+    - version: the position of the event in its log, starting at 1.
+    - kind: one of EVENT_KINDS.
+    - payload: the data of the event, as plain values: the new user's profile for "profile-add", and
+        the positions of the two users for "socialize" and "match".
+
+    Representation Invariants:
+    - self.version >= 1
+    - self.kind in EVENT_KINDS
+    """
+    version: int
+    kind: str
+    payload: dict[str, Any]
+
+    def __init__(self, version: int, kind: str, payload: dict[str, Any]) -> None:
+        self.version = version
+        self.kind = kind
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return f"Event({self.version}, {self.kind!r}, {self.payload!r})"
+
+
+def profile_record(user: User) -> dict[str, Any]:
+    """Return the profile of user (without their connections) as plain values."""
+    return {
+        "name": user.name,
+        "age": user.age,
+        "gender": user.gender,
+        "pronouns": user.pronouns,
+        "dating_goal": user.dating_goal,
+        "characteristics": dict(vars(user.characteristics))
+    }
+
+
+def user_from_profile(record: dict[str, Any]) -> User:
+    """Return a new user without connections from a profile returned by profile_record."""
+    return User(name=record["name"], age=record["age"], gender=record["gender"], pronouns=record["pronouns"],
+                dating_goal=record["dating_goal"], characteristics=Characteristics(**record["characteristics"]),
+                interested_friend=[], interested_romantic=[], social_current=[])
+
+
+class EventLog:
+    """
+    The users of a network and the log of the changes made to them.
+
+    Instance Attributes:
+    - users: the users of the network; events refer to users by their position in this list.
+    - events: the events recorded since the log was created, oldest first.
+    - version: the version of the latest event, or the version the log started from if there is none.
+
+    Representation Invariants:
+    - all(event.version == self.version - len(self.events) + 1 + i for i, event in enumerate(self.events))
+
+    >>> c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                     "English", True, True, True)
+    >>> users = [User(name, 20, "F", "She/Her", "Meeting new friends", c, [], [], social_current=[])
+    ...          for name in ["A", "B"]]
+    >>> log = EventLog(users)
+    >>> counters = NetworkCounters(log)
+    >>> log.add_profile(User("C", 21, "M", "He/Him", "Meeting new friends", c, [], [], social_current=[])).kind
+    'profile-add'
+    >>> log.socialize(users[0], users[2])
+    Event(2, 'socialize', {'user1': 0, 'user2': 2})
+    >>> counters.friend_counts.tolist()
+    [1, 0, 1]
+    >>> [event.kind for event in log.since(1)]
+    ['socialize']
+    """
+    users: list[User]
+    events: list[Event]
+    version: int
+    _positions: dict[int, int]
+    _subscribers: list[Callable[[Event], None]]
+    _network: Optional[Any]
+
+    def __init__(self, users: list[User], version: int = 0, network: Optional[Any] = None) -> None:
+        self.users = users
+        self.events = []
+        self.version = version
+        self._positions = {id(user): i for i, user in enumerate(users)}
+        self._subscribers = []
+        self._network = network if network is not None or not users else users[0].network
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def position(self, user: User) -> int:
+        """Return the position of user in self.users."""
+        position = self._positions.get(id(user))
+        if position is None:
+            raise ValueError(f"{user} is not in this network.")
+        return position
+
+    def positions(self, users: list[User]) -> Any:
+        """Return the positions of users in self.users, as a NumPy array."""
+        import numpy as np
+
+        return np.fromiter((self.position(user) for user in users), dtype=np.int64, count=len(users))
+
+    def subscribe(self, callback: Callable[[Event], None]) -> None:
+        """Call callback with every event recorded from now on, after it has been applied to the users."""
+        self._subscribers.append(callback)
+
+    def since(self, version: int) -> list[Event]:
+        """Return the events recorded after version, oldest first."""
+        start = max(0, len(self.events) - (self.version - version))
+        return self.events[start:]
+
+    def add_profile(self, user: User) -> Event:
+        """Add user to the network and record it."""
+        self._add_user(user)
+        return self._record("profile-add", {"user": self._positions[id(user)], "profile": profile_record(user)})
+
+    def socialize(self, user1: User, user2: User) -> Optional[Event]:
+        """Make user1 and user2 friends and record it, or return None if they already were."""
+        position1, position2 = self.position(user1), self.position(user2)
+        before = user1.social_degree
+        user1.socialize(user2)
+        if user1.social_degree == before:
+            return None
+        return self._record("socialize", {"user1": position1, "user2": position2})
+
+    def match(self, user1: User, user2: User) -> Optional[Event]:
+        """Make user1 and user2 partners and record it, or return None if they already were."""
+        position1, position2 = self.position(user1), self.position(user2)
+        before = user1.romantic_degree
+        user1.match(user2)
+        if user1.romantic_degree == before:
+            return None
+        return self._record("match", {"user1": position1, "user2": position2})
+
+    def apply(self, event: Event) -> Optional[Event]:
+        """Apply an event recorded by another log (e.g. one read from a store.EventStore) and record it in this log."""
+        if event.kind == "profile-add":
+            return self.add_profile(user_from_profile(event.payload["profile"]))
+        if event.kind == "socialize":
+            return self.socialize(self.users[event.payload["user1"]], self.users[event.payload["user2"]])
+        if event.kind == "match":
+            return self.match(self.users[event.payload["user1"]], self.users[event.payload["user2"]])
+        raise ValueError(f"Unknown event kind: {event.kind}")
+
+    def _add_user(self, user: User) -> None:
+        """Append user to self.users, attaching them to the network's adjacency if there is one."""
+        if id(user) in self._positions:
+            raise ValueError(f"{user} is already in this network.")
+        self._positions[id(user)] = len(self.users)
+        self.users.append(user)
+        if self._network is not None and user.network is None:
+            self._network.add_user(user)
+
+    def _record(self, kind: str, payload: dict[str, Any]) -> Event:
+        """Append a new event to the log and pass it to the subscribers."""
+        self.version += 1
+        event = Event(self.version, kind, payload)
+        self.events.append(event)
+        for callback in self._subscribers:
+            callback(event)
+        return event
+
+
+class NetworkCounters:
+    """
+    The friend count and partner of every user of an EventLog, kept in NumPy arrays indexed by position
+    and updated from its events.
+
+    Reading the counts of one user is an array lookup, and reading them for many users (e.g. every node of
+    a graph) is one indexed read of the arrays, instead of a scan over the users and their friends. The
+    arrays grow by doubling, so adding a user is amortised O(1).
+
+    Instance Attributes:
+    - friend_counts: the number of friends of each user, by position.
+    - partners: the position of each user's partner, or -1, by position. A user without a partner of their
+        own that another user still points to (e.g. after that user matched someone else) is counted as
+        having that user as partner.
+
+    >>> c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                     "English", True, True, True)
+    >>> users = [User(name, 20, "F", "She/Her", "Long-term relationship", c, [], [], social_current=[])
+    ...          for name in ["A", "B", "C"]]
+    >>> log = EventLog(users)
+    >>> counters = NetworkCounters(log)
+    >>> _ = log.match(users[0], users[2])
+    >>> counters.partners.tolist(), counters.partner_counts([2, 1, 0]).tolist()
+    ([2, -1, 0], [1, 0, 1])
+    """
+    _friend_counts: Any
+    _partners: Any
+    _size: int
+
+    def __init__(self, log: EventLog) -> None:
+        import numpy as np
+
+        self._size = len(log.users)
+        self._friend_counts = np.fromiter((len(user.social_current or []) for user in log.users), dtype=np.int64,
+                                          count=self._size)
+        self._partners = np.fromiter((-1 if user.romantic_current is None else log.position(user.romantic_current)
+                                      for user in log.users), dtype=np.int64, count=self._size)
+
+        # Give users pointed to by a partner who is not theirs that partner, as well
+        pointing = np.flatnonzero(self._partners >= 0)
+        alone = pointing[self._partners[self._partners[pointing]] < 0]
+        self._partners[self._partners[alone]] = alone
+        log.subscribe(self.update)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def friend_counts(self) -> Any:
+        """The number of friends of each user, by position (a view of the counters, not a copy)."""
+        return self._friend_counts[:self._size]
+
+    @property
+    def partners(self) -> Any:
+        """The position of each user's partner, or -1, by position (a view of the counters, not a copy)."""
+        return self._partners[:self._size]
+
+    def has_partner(self, position: int) -> bool:
+        """Return whether the user at position has a partner."""
+        return bool(self._partners[position] >= 0)
+
+    def friend_count(self, position: int) -> int:
+        """Return the number of friends of the user at position."""
+        return int(self._friend_counts[position])
+
+    def partner_counts(self, positions: Any) -> Any:
+        """Return the number of partners (0 or 1) of the users at positions, as an array."""
+        return (self.partners[positions] >= 0).astype(self._friend_counts.dtype)
+
+    def update(self, event: Event) -> None:
+        """Update the counters from event."""
+        if event.kind == "profile-add":
+            if self._size == len(self._friend_counts):
+                self._grow()
+            self._friend_counts[self._size] = 0
+            self._partners[self._size] = -1
+            self._size += 1
+        elif event.kind == "socialize":
+            self._friend_counts[event.payload["user1"]] += 1
+            self._friend_counts[event.payload["user2"]] += 1
+        elif event.kind == "match":
+            self._partners[event.payload["user1"]] = event.payload["user2"]
+            self._partners[event.payload["user2"]] = event.payload["user1"]
+
+    def _grow(self) -> None:
+        """Double the capacity of the arrays."""
+        import numpy as np
+
+        capacity = max(16, 2 * len(self._friend_counts))
+        self._friend_counts = np.concatenate([self._friend_counts,
+                                              np.zeros(capacity - len(self._friend_counts), dtype=np.int64)])
+        self._partners = np.concatenate([self._partners, np.full(capacity - len(self._partners), -1, dtype=np.int64)])
+
+
+class LayoutCache:
+    """
+    Graph layouts (node positions by name) kept up to date from the events of an EventLog without
+    recomputing them.
+
+    A new user is placed on a circle just outside the existing layout, and a user making their first
+    connection in a layout is moved next to the user they connected with. The layouts are updated on the
+    thread that records the events, so other threads read them through snapshot.
+
+    Instance Attributes:
+    - social_positions: the positions of the users in the social connections graph.
+    - romantic_positions: the positions of the users in the romantic connections graph.
+    """
+    social_positions: dict[str, tuple[float, float]]
+    romantic_positions: dict[str, tuple[float, float]]
+    _lock: threading.Lock
+    _log: EventLog
+    _new: set[str]
+
+    def __init__(self, log: EventLog, social_positions: dict[str, tuple[float, float]],
+                 romantic_positions: dict[str, tuple[float, float]]) -> None:
+        self.social_positions = social_positions
+        self.romantic_positions = romantic_positions
+        self._lock = threading.Lock()
+        self._log = log
+        self._new = set()
+        log.subscribe(self.update)
+
+    def snapshot(self) -> tuple[dict[str, tuple[float, float]], dict[str, tuple[float, float]]]:
+        """Return copies of the social and romantic layouts, taken between two updates."""
+        with self._lock:
+            return dict(self.social_positions), dict(self.romantic_positions)
+
+    def update(self, event: Event) -> None:
+        """Update the layouts from event."""
+        with self._lock:
+            self._update(event)
+
+    def _update(self, event: Event) -> None:
+        """Update the layouts from event, with the lock held."""
+        if event.kind == "profile-add":
+            user = self._log.users[event.payload["user"]]
+            positions = self.social_positions if user.dating_goal == "Meeting new friends" else self.romantic_positions
+            positions[user.name] = _outer_position(event.version)
+            self._new.add(user.name)
+            return
+
+        positions = self.social_positions if event.kind == "socialize" else self.romantic_positions
+        user1, user2 = self._log.users[event.payload["user1"]], self._log.users[event.payload["user2"]]
+        for user, other in ((user1, user2), (user2, user1)):
+            if (user.name not in positions or user.name in self._new) and other.name in positions:
+                x, y = (float(value) for value in positions[other.name])
+                angle = event.version * _GOLDEN_ANGLE
+                positions[user.name] = (x + 0.05 * math.cos(angle), y + 0.05 * math.sin(angle))
+                self._new.discard(user.name)
+        for user in (user1, user2):
+            positions.setdefault(user.name, _outer_position(event.version))
+
+
+# The angle between consecutive new positions, which spreads them evenly around a circle
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+def _outer_position(version: int) -> tuple[float, float]:
+    """Return a position for a user added at version, on a circle around the existing layout."""
+    angle = version * _GOLDEN_ANGLE
+    return 1.1 * math.cos(angle), 1.1 * math.sin(angle)
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['math', 'threading', 'user_network'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
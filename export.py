@@ -0,0 +1,103 @@
+"""
+Export the whole user population to a gzip-compressed JSON lines file.
+
+export_users writes one line per user (their profile, friend count and partner) straight to the
+compressed file as it goes, so the memory used does not grow with the population; a million users never
+become one string. It reports its progress through a callback every EXPORT_PROGRESS_EVERY users, and is
+meant to run on a worker thread:
+
+    export_users(user_list, "destiny_users.jsonl.gz", progress=lambda done, total: ...)
+
+Users are identified by their uid (see user_network.UserDirectory), which is also how a partner is given.
+The file is written to a temporary path and renamed when complete, so a partial export is never left at path.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from typing import Any, Callable, Iterator, Optional
+
+from events import profile_record
+from user_network import User
+
+# How often export_users reports its progress, in users
+EXPORT_PROGRESS_EVERY = 10000
+
+# The gzip compression level; low levels are several times faster and compress JSON nearly as well
+EXPORT_COMPRESSION_LEVEL = 3
+
+
+def export_record(user: User) -> dict[str, Any]:
+    """
+    Return the line of user in an export, as plain values.
+
+    >>> from user_network import Characteristics
+    >>> c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                     "English", True, True, True)
+    >>> a = User("A", 20, "F", "She/Her", "Long-term relationship", c, [], [], social_current=[])
+    >>> b = User("B", 21, "M", "He/Him", "Long-term relationship", c, [], [], social_current=[])
+    >>> a.uid, b.uid = 0, 1
+    >>> a.match(b)
+    >>> record = export_record(a)
+    >>> record["id"], record["friend_count"], record["partner"]
+    (0, 0, 1)
+    """
+    partner = user.romantic_current
+    record = {"id": user.uid}
+    record.update(profile_record(user))
+    record["friend_count"] = len(user.social_current or [])
+    record["partner"] = partner.uid if partner is not None else None
+    return record
+
+
+def export_lines(users: list[User]) -> Iterator[str]:
+    """Return an iterator over the lines of an export of users, one user at a time."""
+    for user in users:
+        yield json.dumps(export_record(user)) + "\n"
+
+
+def export_users(users: list[User], path: str, progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Write every user in users to the gzip-compressed JSON lines file at path and return the number written.
+
+    progress, if given, is called with the number of users written so far and the total every
+    EXPORT_PROGRESS_EVERY users and once at the end. users is copied first, so users added while the
+    export runs are left for the next one.
+    """
+    users = list(users)
+    tmp_path = f"{path}.tmp"
+    written = 0
+
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=EXPORT_COMPRESSION_LEVEL) as file:
+            for line in export_lines(users):
+                file.write(line)
+                written += 1
+                if progress is not None and written % EXPORT_PROGRESS_EVERY == 0:
+                    progress(written, len(users))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if progress is not None:
+        progress(written, len(users))
+    return written
+
+
+def read_export(path: str) -> Iterator[dict[str, Any]]:
+    """Return an iterator over the records of the export at path, read one line at a time."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['gzip', 'json', 'os', 'events', 'user_network'],  # the names (strs) of imported modules
+        'allowed-io': ['export_users', 'read_export'],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
@@ -3,20 +3,35 @@ This program handles the generation of graphs for all users in the network.
 Generative AI was used for generating sample templates of implementing visual elements in the web interface.
 We modified the generated templates to complete this program.
 """
+import json
 import socket
+import threading
+from typing import Optional
 
 import networkx as nx
+import numpy as np
 import plotly.graph_objects as go
-import python_ta
 from dash import Dash, html, dcc, Input, Output, State, callback_context
 
-from user_network import User, generate_users_with_class, add_fixed_users
+from cache import LRUCache
+from events import EventLog, LayoutCache, NetworkCounters
+from user_network import User, UserDirectory, generate_users_with_class, add_fixed_users
 
+# The default memory budget for serialized figures kept by each Dash app, in bytes
+FIGURE_CACHE_SIZE = 64 * 1024 * 1024
 
-def get_romantic_count(user: User, user_looking_for_love: list[User]) -> int:
+
+def get_romantic_count(user: User, user_looking_for_love: list[User], counters: NetworkCounters = None,
+                       events: EventLog = None) -> int:
     """
     Get the number of romantic connections for a user in the network.
+
+    With the events.NetworkCounters of the network's events.EventLog, this is an array lookup; otherwise
+    user_looking_for_love is scanned for users pointing to user.
     """
+    if counters is not None:
+        return int(counters.has_partner(events.position(user)))
+
     if hasattr(user, 'romantic_current') and user.romantic_current is not None:
         return 1
 
@@ -30,29 +45,33 @@ def get_romantic_count(user: User, user_looking_for_love: list[User]) -> int:
 
 
 def plot_social_connections(users_social: list, search_name: str = None,
-                            positions: dict[str, tuple[float, float]] = None) -> tuple:
+                            positions: dict[str, tuple[float, float]] = None,
+                            friend_counts: np.ndarray = None) -> tuple:
     """
     Create a graph visualization showing social connections between users.
+
+    friend_counts is the number of friends of each user in users_social, e.g. read from an
+    events.NetworkCounters; it is counted from the users if not given. Node sizes and colours are
+    computed from it for the whole graph at once.
+
+    Preconditions:
+    - the names of the users in users_social are unique (see user_network.UserDirectory)
     """
     graph = nx.Graph()
 
-    user_dict = {user_object.name: user_object for user_object in users_social}
-
-    # Add all users from user_looking_for_friends as nodes
+    # Add all users from user_looking_for_friends as nodes, before the friends outside the list that their
+    # edges add, so the first len(users_social) nodes line up with friend_counts
+    graph.add_nodes_from(user.name for user in users_social)
     for user in users_social:
-        # Get size based on social connections
-        if hasattr(user, 'social_current') and user.social_current:
-            valid_friends = [f for f in user.social_current
-                             if hasattr(f, 'name') and f.name in user_dict]
-            size = max(1, len(valid_friends))
-        else:
-            size = 1
-
-        graph.add_node(user.name, size=size, type="user")
-
         for friend in user.social_current:
             graph.add_edge(user.name, friend.name)
 
+    if friend_counts is None:
+        friend_counts = np.fromiter((len(user.social_current or []) for user in users_social), dtype=np.int64,
+                                    count=len(users_social))
+    sizes = np.ones(len(graph), dtype=np.int64)
+    sizes[:len(users_social)] = np.maximum(friend_counts, 1)
+
     # Get positions for the nodes in the graph
     if positions is None:
         pos = nx.spring_layout(graph, k=0.3, seed=1234)
@@ -100,39 +119,15 @@ def plot_social_connections(users_social: list, search_name: str = None,
         mode='lines')
 
     # Create node traces
-    node_x = []
-    node_y = []
-    node_size = []
-    node_text = []
-    hover_text = []
-    node_color = []
-
-    # Add nodes to traces
-    for node in graph.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-
-        try:
-            size_value = graph.nodes[node].get('size', 1)
-            node_size.append(size_value * 3 + 5)  # Scale size
-        except:
-            node_size.append(8)  # Default size
-
-        # Node text and color
-        node_text.append(node)
-        hover_text.append(node)
-
-        # Highlight the searched node
-        if node == actual_search_name:
-            node_color.append('#E74C3C')
-        else:
-            # Color gradient based on connections
-            try:
-                size_value = graph.nodes[node].get('size', 1)
-                node_color.append(size_value)
-            except:
-                node_color.append(1)  # Default color value
+    node_text = list(graph.nodes())
+    hover_text = node_text
+    node_x, node_y = np.array([pos[node] for node in node_text], dtype=float).reshape(-1, 2).T
+    node_size = sizes * 3 + 5  # Scale size
+
+    # Color gradient based on connections, with the searched node highlighted
+    node_color = sizes.tolist()
+    if actual_search_name:
+        node_color[node_text.index(actual_search_name)] = '#E74C3C'
 
     # Create the node trace
     node_trace = go.Scatter(
@@ -201,22 +196,31 @@ def plot_social_connections(users_social: list, search_name: str = None,
 
 
 def plot_romantic_connections(users_love: list, search_name: str = None,
-                              positions: dict[str, tuple[float, float]] = None) -> tuple:
+                              positions: dict[str, tuple[float, float]] = None, partners: np.ndarray = None) -> tuple:
     """
     Create a graph visualization showing romantic connections between users.
+
+    partners is the index in users_love of each user's partner, or -1 if they have none there, e.g. read
+    from an events.NetworkCounters; it is found from the users if not given. Node colours are computed
+    from it for the whole graph at once.
+
+    Preconditions:
+    - the names of the users in users_love are unique (see user_network.UserDirectory)
     """
     graph_romantic = nx.Graph()
 
-    # Add all users as nodes with default size
-    for user in users_love:
-        graph_romantic.add_node(user.name, gender=user.gender if hasattr(user, 'gender') else 'Unknown', size=10)
+    if partners is None:
+        index = {id(user): i for i, user in enumerate(users_love)}
+        partners = np.fromiter((index.get(id(user.romantic_current), -1) for user in users_love), dtype=np.int64,
+                               count=len(users_love))
 
-        try:
-            if hasattr(user, 'romantic_current') and user.romantic_current is not None:
-                if user.romantic_current.name in graph_romantic.nodes:
-                    graph_romantic.add_edge(user.name, user.romantic_current.name)
-        except:
-            pass
+    # Add all users as nodes, and an edge from every user to their partner: once for a couple, and also for a
+    # user whose partner has since matched with someone else
+    graph_romantic.add_nodes_from(user.name for user in users_love)
+    with_partner = np.flatnonzero(partners >= 0)
+    their_partners = partners[with_partner]
+    linked = with_partner[(partners[their_partners] != with_partner) | (their_partners > with_partner)]
+    graph_romantic.add_edges_from((users_love[i].name, users_love[partners[i]].name) for i in linked)
 
     if positions is None:
         pos = nx.spring_layout(graph_romantic, k=0.3, seed=1234)
@@ -252,31 +256,21 @@ def plot_romantic_connections(users_love: list, search_name: str = None,
             edge_y.extend([y0, y1, None])
 
     # Create node traces
-    node_x = []
-    node_y = []
-    node_size = []
-    node_text = []
-    hover_text = []
-    node_color = []
-
-    # Add nodes to traces
-    for node in graph_romantic.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-        node_text.append(node)
-        hover_text.append(f"{node}")
-        node_size.append(15)
-
-        if actual_search_name:
-            if node == actual_search_name:
-                node_color.append("#E74C3C")
-            elif node in graph_romantic.neighbors(actual_search_name):
-                node_color.append("#FF85A2")
-            else:
-                node_color.append("rgba(200,200,200,0.5)")
-        else:
-            node_color.append("#F5A9BC")
+    node_text = list(graph_romantic.nodes())
+    hover_text = node_text
+    node_x, node_y = np.array([pos[node] for node in node_text], dtype=float).reshape(-1, 2).T
+    node_size = np.full(len(node_text), 15)
+
+    # Grey out everyone but the searched node and the users linked to them
+    if actual_search_name:
+        node_color = np.full(len(node_text), "rgba(200,200,200,0.5)", dtype=object)
+        searched = node_text.index(actual_search_name)
+        node_color[partners == searched] = "#FF85A2"
+        if partners[searched] >= 0:
+            node_color[partners[searched]] = "#FF85A2"
+        node_color[searched] = "#E74C3C"
+    else:
+        node_color = np.full(len(node_text), "#F5A9BC", dtype=object)
 
     # Create traces
     edge_trace = go.Scatter(
@@ -344,27 +338,163 @@ def plot_romantic_connections(users_love: list, search_name: str = None,
     return fig, pos
 
 
+def network_health_text(analytics: dict) -> str:
+    """Return a one-line summary of a network health dictionary from analytics.network_health."""
+    return (f"Friendships: {analytics['friendships']} · Mean degree: {analytics['mean_degree']:.1f} · "
+            f"Components: {analytics['components']} (largest {analytics['largest_component']}) · "
+            f"Triangles: {analytics['triangles']} · Average clustering: {analytics['average_clustering']:.3f} · "
+            f"Max k-core: {analytics['max_core']}")
+
+
 def create_app(user_list: list[User] = None, user_looking_for_friends: list[User] = None,
-               user_looking_for_love: list[User] = None) -> go.Figure:
+               user_looking_for_love: list[User] = None, network_version: int = 0,
+               cache_size: int = FIGURE_CACHE_SIZE, social_positions: dict[str, tuple[float, float]] = None,
+               romantic_positions: dict[str, tuple[float, float]] = None,
+               analytics: dict = None, events: EventLog = None, counters: NetworkCounters = None,
+               directory: UserDirectory = None) -> Dash:
     """
     Create and return a Dash app instance with multiple tabs for different network views.
-    """
 
-    global initial_user_list, node_positions, initial_fig
+    The app keeps no module-level state, so several instances (e.g. one per worker process) can be built
+    from the same snapshot. Precomputed layouts can be passed in as social_positions and romantic_positions
+    to skip the spring layout.
+
+    Figures are serialized to JSON bytes once and kept in an LRU cache keyed by
+    (tab, search_name, network_version), so the initial view, the reset view and repeated searches
+    are served without rebuilding them. The cache counters are available at /debug/figure-cache.
 
+    analytics is the network health summary computed by analytics.network_health (e.g. stored in a
+    snapshot by the analytics batch job); if given, it is shown in the footer.
+
+    If events (the events.EventLog of the network) is given, its version is used as the network version,
+    so figures are rebuilt after every change, and the node positions are kept up to date from its events
+    by an events.LayoutCache instead of being recomputed. Friend counts and partners, for the node sizes and
+    colours and for the selected user, are then read from counters, the events.NetworkCounters of the log,
+    which must be given with it (without events, private ones are kept for a log of user_list). The layouts and
+    the figure cache then stay subscribed to the log for as long as it lives, so build one app per log and
+    keep serving it rather than calling create_app again for every view.
+
+    Searched and clicked users are looked up by name in directory (a user_network.UserDirectory of user_list,
+    which must also get every user added through events). If it is None, a new one is made from user_list.
+    """
     # Use provided user list or generate a new one
-    if user_list is not None:
-        initial_user_list = user_list
+    if user_list is None:
+        user_list = generate_users_with_class(200, 1234)
+        add_fixed_users(user_list)
+
+    if directory is None:
+        directory = UserDirectory(user_list)
+
+    # Friend counts and partners are read from arrays kept up to date from the event log (a private one if
+    # none is given), at the positions in the log of the listed users, which are extended as users are added
+    if events is None:
+        log = EventLog(user_list)
+        counters = NetworkCounters(log)
+    elif counters is None:
+        raise ValueError("The NetworkCounters of events must be given with it.")
     else:
-        initial_user_list = generate_users_with_class(200, 1234)
-        add_fixed_users(initial_user_list)
+        log = events
+    list_positions = {}
+
+    def positions_in_log(users: list[User]) -> np.ndarray:
+        """Return the positions of users in the log, looking up only the users added since the last call."""
+        cached = list_positions.get(id(users), np.zeros(0, dtype=np.int64))
+        if len(cached) < len(users):
+            cached = np.concatenate([cached, log.positions(users[len(cached):])])
+            list_positions[id(users)] = cached
+        return cached
+
+    def friend_counts() -> np.ndarray:
+        """Return the number of friends of every user in user_looking_for_friends."""
+        return counters.friend_counts[positions_in_log(user_looking_for_friends)]
+
+    def romantic_partners() -> np.ndarray:
+        """Return the index in user_looking_for_love of every listed user's partner, or -1."""
+        index = positions_in_log(user_looking_for_love)
+        in_list = np.full(len(counters), -1, dtype=np.int64)
+        in_list[index] = np.arange(len(index))
+        partners = counters.partners[index]
+        return np.where(partners >= 0, in_list[partners], -1)
+
+    def connection_counts(user: User) -> tuple[int, int]:
+        """Return the number of friends and of romantic partners of user."""
+        return counters.friend_count(log.position(user)), get_romantic_count(user, user_looking_for_love,
+                                                                              counters, log)
 
     # Generate the initial graph and node positions for social connections
-    initial_social_fig, social_node_positions = plot_social_connections(user_looking_for_friends)
-    initial_romantic_fig, romantic_node_positions = plot_romantic_connections(user_looking_for_love)
+    initial_social_fig, social_node_positions = plot_social_connections(user_looking_for_friends,
+                                                                        positions=social_positions,
+                                                                        friend_counts=friend_counts())
+    initial_romantic_fig, romantic_node_positions = plot_romantic_connections(user_looking_for_love,
+                                                                              positions=romantic_positions,
+                                                                              partners=romantic_partners())
+
+    def current_version() -> int:
+        """Return the version of the network that figures are built for."""
+        return events.version if events is not None else network_version
+
+    figure_cache = LRUCache(max_size=cache_size, sizeof=len)
+    figure_cache.put(("social-tab", "", current_version()), initial_social_fig.to_json().encode())
+    figure_cache.put(("romantic-tab", "", current_version()), initial_romantic_fig.to_json().encode())
+    # Events clear the cache on the thread that records them, while Dash requests use it on their own threads
+    figure_lock = threading.Lock()
+
+    layouts = None
+    if events is not None:
+        layouts = LayoutCache(events, social_node_positions, romantic_node_positions)
+
+        def clear_figures(_event: object) -> None:
+            """Drop every cached figure, since figures of older versions can never be served again."""
+            with figure_lock:
+                figure_cache.clear()
+
+        events.subscribe(clear_figures)
+
+    def cached_figure(key: tuple) -> Optional[bytes]:
+        """Return the cached JSON of the figure under key, or None."""
+        with figure_lock:
+            return figure_cache.get(key)
+
+    def cache_figure(key: tuple, figure_json: bytes) -> None:
+        """Cache figure_json under key."""
+        with figure_lock:
+            figure_cache.put(key, figure_json)
+
+    def get_figures(search_name: str = None) -> tuple[dict, dict]:
+        """Return the social and romantic figures for search_name, building them only on a cache miss."""
+        key_name = search_name.strip().lower() if search_name else ""
+        version = current_version()
+        if layouts is None:
+            social_layout, romantic_layout = social_node_positions, romantic_node_positions
+        else:
+            social_layout, romantic_layout = layouts.snapshot()
+
+        social_json = cached_figure(("social-tab", key_name, version))
+        if social_json is None:
+            fig, _ = plot_social_connections(user_looking_for_friends, search_name, social_layout, friend_counts())
+            social_json = fig.to_json().encode()
+            cache_figure(("social-tab", key_name, version), social_json)
+
+        romantic_json = cached_figure(("romantic-tab", key_name, version))
+        if romantic_json is None:
+            fig, _ = plot_romantic_connections(user_looking_for_love, search_name, romantic_layout,
+                                               romantic_partners())
+            romantic_json = fig.to_json().encode()
+            cache_figure(("romantic-tab", key_name, version), romantic_json)
+
+        return json.loads(social_json), json.loads(romantic_json)
+
+    initial_social_fig, initial_romantic_fig = get_figures()
 
     app = Dash(__name__)
 
+    @app.server.route("/debug/figure-cache")
+    def figure_cache_stats() -> object:
+        with figure_lock:
+            stats = figure_cache.stats()
+        stats["network_version"] = current_version()
+        return app.server.response_class(json.dumps(stats), mimetype="application/json")
+
     # Define the layout with tabs
     app.layout = html.Div([
         # App title
@@ -427,7 +557,9 @@ def create_app(user_list: list[User] = None, user_looking_for_friends: list[User
         # Footer with stats
         html.Div([
             html.Hr(),
-            html.P(f"Network size: {len(initial_user_list)} users",
+            html.P(f"Network size: {len(user_list)} users",
+                   style={'textAlign': 'center', 'color': '#7F8C8D'}),
+            html.P(network_health_text(analytics) if analytics else "",
                    style={'textAlign': 'center', 'color': '#7F8C8D'})
         ], style={'marginTop': '20px'})
 
@@ -450,7 +582,7 @@ def create_app(user_list: list[User] = None, user_looking_for_friends: list[User
         ctx = callback_context
 
         if not ctx.triggered:
-            return initial_social_fig, initial_romantic_fig, ""
+            return get_figures() + ("",)
 
         button_id = ctx.triggered[0]['prop_id'].split('.')[0]
         prop_type = ctx.triggered[0]['prop_id'].split('.')[1] if '.' in ctx.triggered[0]['prop_id'] else None
@@ -461,8 +593,7 @@ def create_app(user_list: list[User] = None, user_looking_for_friends: list[User
 
         # Handle reset button click
         if button_id == "reset-button":
-            social_fig, _ = plot_social_connections(user_looking_for_friends, positions=social_node_positions)
-            romantic_fig, _ = plot_romantic_connections(user_looking_for_love, positions=romantic_node_positions)
+            social_fig, romantic_fig = get_figures()
             output_text = ""
 
         # Handle search button click
@@ -470,24 +601,13 @@ def create_app(user_list: list[User] = None, user_looking_for_friends: list[User
             search_name = search_name.strip()
 
             # Generate figures with the search term
-            social_fig, _ = plot_social_connections(user_looking_for_friends, search_name, social_node_positions)
-            romantic_fig, _ = plot_romantic_connections(user_looking_for_love, search_name, romantic_node_positions)
+            social_fig, romantic_fig = get_figures(search_name)
 
             # Find user with case-insensitive search
-            selected_user = next(
-                (u for u in user_looking_for_friends if u.name.lower() == search_name.lower()),
-                next(
-                    (u for u in user_looking_for_love if u.name.lower() == search_name.lower()),
-                    None
-                )
-            )
+            selected_user = directory.find(search_name, ignore_case=True)
 
             if selected_user:
-                if hasattr(selected_user, "social_current") and selected_user.social_current:
-                    friend_count = len(selected_user.social_current)
-                else:
-                    friend_count = 0
-                romantic_count = get_romantic_count(selected_user, user_looking_for_love)
+                friend_count, romantic_count = connection_counts(selected_user)
 
                 output_text = html.Div([
                     html.Div([
@@ -514,26 +634,12 @@ def create_app(user_list: list[User] = None, user_looking_for_friends: list[User
                         clicked_node = point['customdata']
 
                     if clicked_node:
-                        social_fig, _ = plot_social_connections(user_looking_for_friends, clicked_node,
-                                                                social_node_positions)
-                        romantic_fig, _ = plot_romantic_connections(user_looking_for_love, clicked_node,
-                                                                    romantic_node_positions)
-
-                        # Find user with case-insensitive search
-                        selected_user = next(
-                            (u for u in user_looking_for_friends if u.name == clicked_node),
-                            next(
-                                (u for u in user_looking_for_love if u.name == clicked_node),
-                                None
-                            )
-                        )
+                        social_fig, romantic_fig = get_figures(clicked_node)
+
+                        selected_user = directory.find(clicked_node)
 
                         if selected_user:
-                            if hasattr(selected_user, "social_current") and selected_user.social_current:
-                                friend_count = len(selected_user.social_current)
-                            else:
-                                friend_count = 0
-                            romantic_count = get_romantic_count(selected_user, user_looking_for_love)
+                            friend_count, romantic_count = connection_counts(selected_user)
 
                             output_text = html.Div([
                                 html.Div([
@@ -575,26 +681,13 @@ def create_app(user_list: list[User] = None, user_looking_for_friends: list[User
 
                     if clicked_node:
                         # Update both graphs
-                        social_fig, _ = plot_social_connections(user_looking_for_friends, clicked_node,
-                                                                social_node_positions)
-                        romantic_fig, _ = plot_romantic_connections(user_looking_for_love, clicked_node,
-                                                                    romantic_node_positions)
+                        social_fig, romantic_fig = get_figures(clicked_node)
 
                         # Find user
-                        selected_user = next(
-                            (u for u in user_looking_for_friends if u.name == clicked_node),
-                            next(
-                                (u for u in user_looking_for_love if u.name == clicked_node),
-                                None
-                            )
-                        )
+                        selected_user = directory.find(clicked_node)
 
                         if selected_user:
-                            if hasattr(selected_user, "social_current") and selected_user.social_current:
-                                friend_count = len(selected_user.social_current)
-                            else:
-                                friend_count = 0
-                            romantic_count = get_romantic_count(selected_user, user_looking_for_love)
+                            friend_count, romantic_count = connection_counts(selected_user)
 
                             output_text = html.Div([
                                 html.Div([
@@ -632,8 +725,10 @@ def find_available_port(start: int = 8050, max_attempts: int = 10) -> int:
 
 
 if __name__ == "__main__":
+    import python_ta
     python_ta.check_all(config={
-        'extra-imports': ["user_network", "plotly.graph_objects", "dash", "networkx", "socket"],
+        'extra-imports': ["user_network", "plotly.graph_objects", "dash", "networkx", "socket", "json", "cache",
+                          "events", "numpy", "threading"],
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
         'disable': ["R0914", "R1714", "R1735", "W0702", "R0912", "R0915", "R1702", "C0415", "E9997", "E9970",
@@ -0,0 +1,650 @@
+"""
+Vectorized ranking of potential matches for many users at once.
+
+The preference tree ranks candidates lexicographically: a candidate matching on the most important
+attribute comes first, ties are broken by the next attribute, and so on, with remaining ties kept in
+candidate order. Writing the match on attribute i (0 = most important) as bit (D - 1 - i) of an integer
+key gives exactly the same order when keys are sorted in descending order. This module computes those keys
+for a whole block of users against one candidate pool at a time, instead of building one tree per user.
+
+A weighted mode is also available, in which every attribute contributes to a compatibility score according
+to its priority, so a mismatch on the most important attribute can be outweighed by matches on the others.
+The popcount mode sits in between: candidates are ranked by how many attributes match, counted directly on
+the packed match vectors, and ties are broken in preference-tree order.
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from cache import LRUCache
+
+# Block sizes for the query x candidate key matrix. A 64 x 2048 block is 256 KiB of packed uint16 match vectors
+# and 1 MiB once widened to int64 keys, so a block and its temporaries stay in a typical L2 cache.
+BLOCK_QUERIES = 64
+BLOCK_CANDIDATES = 2048
+
+# The ways candidates can be ranked: the strict preference-tree order, the number of matching attributes,
+# or a weighted compatibility score
+RANKING_MODES = ("lexicographic", "popcount", "weighted")
+
+# In the weighted mode, the largest bonus for being close in age and the age gap at which it reaches 0
+AGE_WEIGHT = 0.1
+AGE_SPAN = 12
+
+# Weighted scores are rounded to multiples of 1 / SCORE_RESOLUTION before ranking
+SCORE_RESOLUTION = 1 << 20
+
+# The largest total number of ranked candidate positions kept by a Recommender's cache
+RECOMMENDATION_CACHE_SIZE = 1_000_000
+
+
+def encode_characteristics(users: list, attributes: list[str]) -> np.ndarray:
+    """
+    Return a len(users) x len(attributes) matrix of integer codes, where two users have the same code
+    for an attribute exactly when their values for that attribute are equal.
+
+    >>> from user_network import Characteristics, User
+    >>> def make(name, religion, interests):
+    ...     c = Characteristics("Asian", interests, "INTP", "Texting", "Liberal", religion, "Music", "1",
+    ...                         "English", True, True, True)
+    ...     return User(name, 20, "F", "She/Her", "Meeting new friends", c, [], [])
+    >>> users = [make("A", "Other", ["Coding"]), make("B", "Jewish", ["Coding"]), make("C", "Other", ["Running"])]
+    >>> encode_characteristics(users, ["religion", "interests"]).tolist()
+    [[0, 0], [1, 0], [0, 1]]
+    """
+    codes = np.empty((len(users), len(attributes)), dtype=np.int32)
+    for column, attribute in enumerate(attributes):
+        mapping = {}
+        for row, user in enumerate(users):
+            value = getattr(user.characteristics, attribute)
+            if isinstance(value, list):
+                value = tuple(value)
+            codes[row, column] = mapping.setdefault(value, len(mapping))
+    return codes
+
+
+def packed_dtype(num_attributes: int) -> np.dtype:
+    """Return the smallest unsigned integer type that holds one match bit per attribute."""
+    if num_attributes <= 16:
+        return np.dtype(np.uint16)
+    if num_attributes <= 32:
+        return np.dtype(np.uint32)
+    raise ValueError("At most 32 attributes can be packed into one match vector.")
+
+
+def pack_codes(query_codes: np.ndarray, pool_codes: np.ndarray) -> np.ndarray:
+    """
+    Return a len(query_codes) x len(pool_codes) matrix of packed match vectors.
+
+    Bit (D - 1 - i) of an entry is 1 if the query and the candidate have the same code for attribute i, so the
+    most important attribute is the most significant bit and comparing entries as integers compares them
+    lexicographically.
+
+    >>> pack_codes(np.array([[0, 0, 1]]), np.array([[0, 1, 1], [1, 0, 0]])).tolist()
+    [[5, 2]]
+    """
+    num_attributes = query_codes.shape[1]
+    if pool_codes.shape[1] != num_attributes:
+        raise ValueError(f"Queries have {num_attributes} attribute codes but candidates have {pool_codes.shape[1]}.")
+    dtype = packed_dtype(num_attributes)
+    packed = np.zeros((query_codes.shape[0], pool_codes.shape[0]), dtype=dtype)
+    for column in range(num_attributes):
+        matches = query_codes[:, None, column] == pool_codes[None, :, column]
+        packed |= matches.astype(dtype) << dtype.type(num_attributes - 1 - column)
+    return packed
+
+
+# The number of set bits in every 16-bit value
+_POPCOUNT_16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def popcount(packed: np.ndarray) -> np.ndarray:
+    """
+    Return the number of matching attributes in each packed match vector.
+
+    >>> popcount(np.array([0, 5, 0xFFFF], dtype=np.uint16)).tolist()
+    [0, 2, 16]
+    """
+    if packed.dtype == np.uint16:
+        return _POPCOUNT_16[packed]
+    packed = packed.astype(np.uint32)
+    return _POPCOUNT_16[packed & 0xFFFF] + _POPCOUNT_16[packed >> 16]
+
+
+def encode_profiles(users: list, attributes: list[str]) -> dict[str, np.ndarray]:
+    """
+    Return the arrays needed to rank users on attributes: the attribute codes from encode_characteristics,
+    each user's interests as a bitmask, and each user's age.
+    """
+    interest_bits = {}
+    interests = np.zeros(len(users), dtype=np.uint32)
+    for row, user in enumerate(users):
+        for interest in user.characteristics.interests:
+            interests[row] |= np.uint32(1 << interest_bits.setdefault(interest, len(interest_bits)))
+
+    return {
+        "codes": encode_characteristics(users, attributes),
+        "interests": interests,
+        "ages": np.array([user.age for user in users], dtype=np.float64),
+        "interest_column": np.array(attributes.index("interests") if "interests" in attributes else -1)
+    }
+
+
+def _select_profiles(profiles: dict[str, np.ndarray], rows: np.ndarray) -> dict[str, np.ndarray]:
+    """Return the profiles of the users at the given rows."""
+    return {key: (value if key == "interest_column" else value[rows]) for key, value in profiles.items()}
+
+
+def priority_weights(num_attributes: int) -> np.ndarray:
+    """
+    Return the weight of each attribute in a priority list of num_attributes attributes: the i-th most
+    important attribute weighs (num_attributes - i), and the weights are scaled to sum to 1.
+
+    >>> priority_weights(3).tolist() == [3 / 6, 2 / 6, 1 / 6]
+    True
+    """
+    weights = np.arange(num_attributes, 0, -1, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def weighted_block_scores(query: dict[str, np.ndarray], pool: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Return the weighted compatibility score of every query against every candidate.
+
+    Each attribute contributes its priority_weights weight if it matches, except interests, which
+    contribute their weight times the Jaccard similarity of the two interest sets. Age proximity adds
+    up to AGE_WEIGHT, falling linearly to 0 at an age gap of AGE_SPAN years.
+    """
+    query_codes, pool_codes = query["codes"], pool["codes"]
+    weights = priority_weights(query_codes.shape[1])
+    interest_column = int(query["interest_column"])
+
+    scores = np.zeros((query_codes.shape[0], pool_codes.shape[0]), dtype=np.float64)
+    for column, weight in enumerate(weights):
+        if column == interest_column:
+            shared = popcount(query["interests"][:, None] & pool["interests"][None, :])
+            either = popcount(query["interests"][:, None] | pool["interests"][None, :])
+            scores += weight * shared / np.maximum(either, 1)
+        else:
+            scores += weight * (query_codes[:, None, column] == pool_codes[None, :, column])
+
+    age_gap = np.abs(query["ages"][:, None] - pool["ages"][None, :])
+    scores += AGE_WEIGHT * (1 - np.minimum(age_gap, AGE_SPAN) / AGE_SPAN)
+    return scores
+
+
+def _top_k(block_keys: Callable[[slice, slice], np.ndarray], num_queries: int, num_candidates: int,
+           k: Optional[int], self_positions: Optional[np.ndarray]) -> list[np.ndarray]:
+    """
+    Return, for each query, the candidate indices with the k largest non-negative keys, best first.
+
+    block_keys(query_slice, candidate_slice) returns the keys of one block. The work is done in blocks
+    of BLOCK_QUERIES queries by BLOCK_CANDIDATES candidates, keeping the best k of each query (found with
+    argpartition) as the blocks are merged. Equal keys keep candidate order, and self_positions[i] is the
+    candidate index of query i itself (excluded from its own ranking), or -1.
+    """
+    if k is None or k > num_candidates:
+        k = num_candidates
+    if k <= 0:
+        return [np.empty(0, dtype=np.int64) for _ in range(num_queries)]
+    if self_positions is None:
+        self_positions = np.full(num_queries, -1)
+
+    results = []
+    for q_start in range(0, num_queries, BLOCK_QUERIES):
+        q_end = min(q_start + BLOCK_QUERIES, num_queries)
+        rows = np.arange(q_end - q_start)
+        best = np.empty((q_end - q_start, 0), dtype=np.int64)
+
+        for p_start in range(0, num_candidates, BLOCK_CANDIDATES):
+            p_end = min(p_start + BLOCK_CANDIDATES, num_candidates)
+            keys = block_keys(slice(q_start, q_end), slice(p_start, p_end))
+
+            # Exclude each query from its own ranking
+            own = self_positions[q_start:q_end]
+            inside = (own >= p_start) & (own < p_end)
+            keys[rows[inside], own[inside] - p_start] = -1
+
+            # Make keys unique so that ties keep candidate order, as in the preference tree
+            composite = keys * num_candidates + (num_candidates - 1 - np.arange(p_start, p_end))
+
+            best = np.concatenate([best, composite], axis=1)
+            if best.shape[1] > k:
+                best = np.take_along_axis(best, np.argpartition(-best, k - 1, axis=1)[:, :k], axis=1)
+
+        best = -np.sort(-best, axis=1)
+        for row in best:
+            row = row[row >= 0]
+            results.append(num_candidates - 1 - row % num_candidates)
+
+    return results
+
+
+def rank_codes(query_codes: np.ndarray, pool_codes: np.ndarray, k: Optional[int] = None,
+               self_positions: Optional[np.ndarray] = None) -> list[np.ndarray]:
+    """
+    Return, for each query row, the pool indices of its top k candidates in preference-tree order.
+
+    self_positions[i] is the pool index of query i itself (excluded from its own ranking), or -1.
+    If k is None, every candidate is ranked.
+
+    >>> pool = np.array([[0, 0], [1, 0], [0, 1], [0, 0]])
+    >>> [r.tolist() for r in rank_codes(np.array([[0, 0]]), pool, 3, np.array([0]))]
+    [[3, 2, 1]]
+    """
+    def block_keys(queries: slice, candidates: slice) -> np.ndarray:
+        return pack_codes(query_codes[queries], pool_codes[candidates]).astype(np.int64)
+
+    return _top_k(block_keys, query_codes.shape[0], pool_codes.shape[0], k, self_positions)
+
+
+def rank_popcount(query_codes: np.ndarray, pool_codes: np.ndarray, k: Optional[int] = None,
+                  self_positions: Optional[np.ndarray] = None) -> list[np.ndarray]:
+    """
+    Return, for each query row, the pool indices of its top k candidates by number of matching attributes.
+
+    The key of a candidate is its popcount above its packed match vector, so equal counts are ordered as
+    in the preference tree. self_positions and k are as in rank_codes.
+
+    >>> pool = np.array([[0, 1, 1], [1, 0, 0], [0, 0, 1], [1, 0, 1]])
+    >>> [r.tolist() for r in rank_popcount(np.array([[0, 0, 1]]), pool)]
+    [[2, 0, 3, 1]]
+    """
+    num_attributes = query_codes.shape[1]
+
+    def block_keys(queries: slice, candidates: slice) -> np.ndarray:
+        packed = pack_codes(query_codes[queries], pool_codes[candidates])
+        return (popcount(packed).astype(np.int64) << num_attributes) | packed.astype(np.int64)
+
+    return _top_k(block_keys, query_codes.shape[0], pool_codes.shape[0], k, self_positions)
+
+
+def rank_weighted(query: dict[str, np.ndarray], pool: dict[str, np.ndarray], k: Optional[int] = None,
+                  self_positions: Optional[np.ndarray] = None) -> list[np.ndarray]:
+    """
+    Return, for each query profile, the pool indices of its top k candidates by weighted_block_scores.
+
+    Scores are rounded to multiples of 1 / SCORE_RESOLUTION, and equal scores keep candidate order.
+    """
+    def block_keys(queries: slice, candidates: slice) -> np.ndarray:
+        scores = weighted_block_scores(_select_profiles(query, np.arange(queries.start, queries.stop)),
+                                       _select_profiles(pool, np.arange(candidates.start, candidates.stop)))
+        return np.rint(scores * SCORE_RESOLUTION).astype(np.int64)
+
+    return _top_k(block_keys, query["codes"].shape[0], pool["codes"].shape[0], k, self_positions)
+
+
+def _rank_profiles(arguments: tuple) -> list[np.ndarray]:
+    """Rank one block of query profiles with the given mode, for use with ProcessPoolExecutor.map."""
+    mode, query, pool, k, self_positions = arguments
+    if mode == "weighted":
+        return rank_weighted(query, pool, k, self_positions)
+    if mode == "popcount":
+        return rank_popcount(query["codes"], pool["codes"], k, self_positions)
+    return rank_codes(query["codes"], pool["codes"], k, self_positions)
+
+
+def _rank_in_workers(mode: str, query: dict[str, np.ndarray], pool: dict[str, np.ndarray], k: Optional[int],
+                     self_positions: Optional[np.ndarray], workers: int) -> list[np.ndarray]:
+    """Rank the query profiles against the pool profiles, splitting the queries between workers processes."""
+    num_queries = query["codes"].shape[0]
+    if workers <= 1 or num_queries <= BLOCK_QUERIES:
+        return _rank_profiles((mode, query, pool, k, self_positions))
+
+    if self_positions is None:
+        self_positions = np.full(num_queries, -1)
+    chunk = -(-num_queries // workers)
+    chunk = -(-chunk // BLOCK_QUERIES) * BLOCK_QUERIES
+    tasks = [(mode, _select_profiles(query, np.arange(i, min(i + chunk, num_queries))),
+              pool, k, self_positions[i:i + chunk])
+             for i in range(0, num_queries, chunk)]
+    ranked = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(_rank_profiles, tasks):
+            ranked.extend(part)
+    return ranked
+
+
+class AttributeIndex:
+    """
+    An inverted index over a candidate pool, from each (attribute, value) pair to the sorted positions
+    of the candidates with that value.
+
+    In the preference-tree order, every candidate that matches a user on the first j attributes ranks above
+    every candidate that does not. So if at least k candidates match on the first j attributes, the top k
+    are all among them. top_k intersects the posting lists in priority order while at least k candidates
+    survive, and only ranks the survivors, so a user whose top attribute is, say, religion is compared
+    with the candidates of that religion instead of the whole pool.
+
+    Instance Attributes:
+    - pool: the candidates, in the order their positions refer to.
+    - attributes: the attributes in priority order, from most to least important.
+    - codes: the encode_characteristics codes of the pool.
+    - postings: maps each (attribute, value) pair to the sorted positions of the candidates with that value.
+
+    Representation Invariants:
+    - len(self.codes) == len(self.pool)
+    - all(len(positions) > 0 for positions in self.postings.values())
+
+    >>> from user_network import Characteristics, User
+    >>> def make(name, religion, major):
+    ...     c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", religion, major, "1",
+    ...                         "English", True, True, True)
+    ...     return User(name, 20, "F", "She/Her", "Meeting new friends", c, [], [])
+    >>> pool = [make("A", "Other", "Music"), make("B", "Jewish", "Music"), make("C", "Other", "History"),
+    ...         make("D", "Other", "Music")]
+    >>> index = AttributeIndex(pool, ["religion", "major"])
+    >>> index.postings[("religion", "Other")].tolist()
+    [0, 2, 3]
+    >>> [pool[i].name for i in index.top_k(pool[0], 2, exclude_position=0)]
+    ['D', 'C']
+    """
+    pool: list
+    attributes: list[str]
+    codes: np.ndarray
+    postings: dict[tuple, np.ndarray]
+    _value_codes: list[dict]
+
+    def __init__(self, pool: list, attributes: list[str]) -> None:
+        self.pool = pool
+        self.attributes = attributes
+        self.codes = np.empty((len(pool), len(attributes)), dtype=np.int32)
+        self.postings = {}
+        self._value_codes = []
+
+        for column, attribute in enumerate(attributes):
+            value_codes = {}
+            for row, user in enumerate(pool):
+                self.codes[row, column] = value_codes.setdefault(_attribute_value(user, attribute), len(value_codes))
+            self._value_codes.append(value_codes)
+
+            order = np.argsort(self.codes[:, column], kind="stable")
+            boundaries = np.flatnonzero(np.diff(self.codes[order, column])) + 1
+            for positions in np.split(order, boundaries):
+                if len(positions) > 0:
+                    value = _attribute_value(pool[positions[0]], attribute)
+                    self.postings[(attribute, value)] = positions
+
+    def encode(self, user: object) -> np.ndarray:
+        """Return the codes of user's values, with -1 for values that no candidate has."""
+        return np.array([[self._value_codes[column].get(_attribute_value(user, attribute), -1)
+                          for column, attribute in enumerate(self.attributes)]], dtype=np.int32)
+
+    def candidates(self, user: object, k: int, exclude_position: int = -1) -> Optional[np.ndarray]:
+        """
+        Return the sorted positions of the candidates matching user on the longest prefix of the attributes
+        that still leaves at least k candidates (not counting exclude_position), or None if even the most
+        important attribute leaves fewer than k and the whole pool has to be ranked.
+        """
+        survivors = None
+        for attribute in self.attributes:
+            positions = self.postings.get((attribute, _attribute_value(user, attribute)))
+            if positions is None:
+                break
+            narrowed = positions if survivors is None else np.intersect1d(survivors, positions, assume_unique=True)
+            count = len(narrowed) - int(exclude_position >= 0 and _contains(narrowed, exclude_position))
+            if count < k:
+                break
+            survivors = narrowed
+        return survivors
+
+    def top_k(self, user: object, k: int, exclude_position: int = -1) -> np.ndarray:
+        """
+        Return the positions of user's top k candidates in preference-tree order, excluding exclude_position
+        (e.g. the user's own position in the pool).
+        """
+        survivors = self.candidates(user, k, exclude_position)
+        if survivors is None:
+            survivors = np.arange(len(self.pool))
+
+        own = np.searchsorted(survivors, exclude_position) if exclude_position >= 0 else -1
+        if own >= len(survivors) or (own >= 0 and survivors[own] != exclude_position):
+            own = -1
+
+        ranked = rank_codes(self.encode(user), self.codes[survivors], k, np.array([own]))[0]
+        return survivors[ranked]
+
+
+class CandidatePool:
+    """
+    The candidates shown to one group of users: users with a given dating goal and, unless the goal is
+    "Meeting new friends", of a different gender than the group (as in tree.filter_user_by_dating_goal).
+
+    The version changes whenever a candidate joins the pool, so rankings computed for an older version
+    are never reused.
+
+    Instance Attributes:
+    - pool_id: the (dating goal, gender) of the users the pool is for, with gender None for friendships.
+    - users: the candidates, in the order rankings refer to them.
+    - version: the number of candidates added since the pool was created.
+
+    Representation Invariants:
+    - all(self.accepts(user) for user in self.users)
+    """
+    pool_id: tuple[str, Optional[str]]
+    users: list
+    version: int
+    _indexes: dict[tuple[str, ...], AttributeIndex]
+
+    def __init__(self, pool_id: tuple[str, Optional[str]], users: list) -> None:
+        self.pool_id = pool_id
+        self.users = [user for user in users if self.accepts(user)]
+        self.version = 0
+        self._indexes = {}
+
+    def accepts(self, user: object) -> bool:
+        """Return whether user is a candidate of this pool."""
+        dating_goal, gender = self.pool_id
+        return user.dating_goal == dating_goal and (gender is None or user.gender != gender)
+
+    def add(self, user: object) -> None:
+        """Add user to the end of the pool.
+
+        Preconditions:
+        - self.accepts(user)
+        """
+        self.users.append(user)
+        self.version += 1
+        self._indexes.clear()
+
+    def cached_index(self, attributes: list[str]) -> Optional[AttributeIndex]:
+        """Return the AttributeIndex over the pool for attributes, or None if it has not been built."""
+        return self._indexes.get(tuple(attributes))
+
+    def keep_index(self, index: AttributeIndex, version: int) -> None:
+        """Keep index, built over the candidates of the given version, if no candidate has joined since."""
+        if version == self.version:
+            self._indexes.setdefault(tuple(index.attributes), index)
+
+
+class Recommender:
+    """
+    Ranked recommendations for a network of users, memoized by attribute profile.
+
+    Two users of the same candidate pool whose values agree on every ranked attribute (and on age, in the
+    weighted mode) get the same ranking, apart from each other. Rankings are therefore cached under
+    (pool id, pool version, priority order, mode, profile signature, length) and each requester only has
+    themselves filtered out of the cached ranking. The cache is an LRUCache bounded by the total number of
+    cached positions. A Recommender can be shared between threads, e.g. the Tk main thread and a ranking
+    worker thread. Its lock is only held to read and update the pools and the cache, not while ranking.
+
+    Instance Attributes:
+    - users: every user in the network.
+    - pools: the candidate pools created so far, by pool id.
+    - cache: the cached rankings, as arrays of positions in the pool.
+    - requests: the number of users recommendations were asked for.
+    - rankings: the number of profile rankings that had to be computed.
+
+    >>> from user_network import Characteristics, User
+    >>> def make(name, religion):
+    ...     c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", religion, "Music", "1",
+    ...                         "English", True, True, True)
+    ...     return User(name, 20, "F", "She/Her", "Meeting new friends", c, [], [])
+    >>> users = [make("A", "Other"), make("B", "Jewish"), make("C", "Other"), make("D", "Other")]
+    >>> recommender = Recommender(users)
+    >>> [u.name for u in recommender.recommend(users[0], ["religion"], 2)]
+    ['C', 'D']
+    >>> [u.name for u in recommender.recommend(users[2], ["religion"], 2)]
+    ['A', 'D']
+    >>> recommender.stats()["hit_rate"]
+    0.5
+    """
+    users: list
+    pools: dict[tuple[str, Optional[str]], CandidatePool]
+    cache: LRUCache
+    requests: int
+    rankings: int
+    _lock: threading.RLock
+
+    def __init__(self, users: list, max_size: int = RECOMMENDATION_CACHE_SIZE) -> None:
+        self.users = list(users)
+        self.pools = {}
+        self.cache = LRUCache(max_size, sizeof=len)
+        self.requests = 0
+        self.rankings = 0
+        self._lock = threading.RLock()
+
+    def pool(self, user: object) -> CandidatePool:
+        """Return the candidate pool that user is matched against, creating it under the lock if needed."""
+        pool_id = (user.dating_goal, None if user.dating_goal == "Meeting new friends" else user.gender)
+        with self._lock:
+            if pool_id not in self.pools:
+                self.pools[pool_id] = CandidatePool(pool_id, self.users)
+            return self.pools[pool_id]
+
+    def add_user(self, user: object) -> None:
+        """Add a new user to the network and to every existing candidate pool they belong to."""
+        with self._lock:
+            self.users.append(user)
+            for pool in self.pools.values():
+                if pool.accepts(user):
+                    pool.add(user)
+
+    def recommend(self, user: object, attributes: list[str], k: Optional[int] = None,
+                  mode: str = "lexicographic") -> list:
+        """Return user's top k recommendations (all of them if k is None), ranked by attributes."""
+        return self.recommend_many([user], attributes, k, mode)[0]
+
+    def recommend_many(self, users: list, attributes: list[str], k: Optional[int] = 10,
+                       mode: str = "lexicographic", workers: int = 1) -> list[list]:
+        """
+        Return the top k recommendations of every user in users, ranked by attributes in the given mode.
+
+        Only the distinct profiles that are not cached are ranked, in one vectorized pass per pool (split
+        between workers processes if workers > 1).
+        """
+        if mode not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode: {mode}")
+
+        # One extra position, so that a ranking still has k candidates once the requester is filtered out
+        length = None if k is None else k + 1
+        with self._lock:
+            groups = {}
+            for i, user in enumerate(users):
+                groups.setdefault(self.pool(user).pool_id, []).append(i)
+
+            # The candidates, version and cached rankings of each pool, read together so they agree. Candidates
+            # are only ever appended, so a copy is needed only when something is ranked from them
+            plans = []
+            for pool_id, indices in groups.items():
+                pool = self.pools[pool_id]
+                keys = [(pool_id, pool.version, tuple(attributes), mode, _profile_signature(users[i], attributes, mode),
+                         length) for i in indices]
+
+                ranked = {}
+                missing = {}
+                for i, key in zip(indices, keys):
+                    if key in ranked or key in missing:
+                        continue
+                    positions = self.cache.get(key)
+                    if positions is None:
+                        missing[key] = users[i]
+                    else:
+                        ranked[key] = positions
+                candidates = list(pool.users) if missing else pool.users
+                plans.append((pool, pool.version, candidates, pool.cached_index(attributes), indices, keys, ranked,
+                              missing))
+            self.requests += len(users)
+
+        results = [[] for _ in users]
+        for pool, version, candidates, index, indices, keys, ranked, missing in plans:
+            if missing:
+                # Rank without the lock, so that add_user is not kept waiting; new candidates only go into
+                # a new version of the pool, which these rankings are not cached under
+                if index is None and mode != "weighted":
+                    index = AttributeIndex(candidates, list(attributes))
+                computed = self._rank(candidates, index, list(missing.values()), attributes, mode, length, workers)
+                with self._lock:
+                    self.rankings += len(missing)
+                    for key, positions in zip(missing, computed):
+                        self.cache.put(key, positions)
+                    if index is not None:
+                        pool.keep_index(index, version)
+                ranked.update(zip(missing, computed))
+
+            for i, key in zip(indices, keys):
+                matches = [candidates[j] for j in ranked[key] if candidates[j] is not users[i]]
+                results[i] = matches if k is None else matches[:k]
+
+        return results
+
+    def stats(self) -> dict[str, float]:
+        """
+        Return the cache counters, with the number of requests and of rankings computed for them.
+
+        hit_rate is the fraction of requests answered from an existing ranking, whether it was cached by
+        an earlier call or shared with a user of the same profile in the same call.
+        """
+        hit_rate = 1 - self.rankings / self.requests if self.requests else 0.0
+        return {**self.cache.stats(), "requests": self.requests, "rankings": self.rankings, "hit_rate": hit_rate}
+
+    @staticmethod
+    def _rank(candidates: list, index: Optional[AttributeIndex], users: list, attributes: list[str], mode: str,
+              length: Optional[int], workers: int) -> list[np.ndarray]:
+        """
+        Return the positions of the top length candidates for each user, without excluding anyone. index is
+        the AttributeIndex over candidates for attributes, or None in the weighted mode. Its posting lists
+        only prune candidates in the lexicographic mode; the popcount mode ranks its codes in full.
+        """
+        if mode == "weighted":
+            profiles = encode_profiles(candidates + users, attributes)
+            pool_profiles = _select_profiles(profiles, np.arange(len(candidates)))
+            query_profiles = _select_profiles(profiles, np.arange(len(candidates), len(candidates) + len(users)))
+            return _rank_in_workers(mode, query_profiles, pool_profiles, length, None, workers)
+
+        if mode == "lexicographic" and length is not None and len(users) < BLOCK_QUERIES:
+            return [index.top_k(user, length) for user in users]
+        query_codes = np.concatenate([index.encode(user) for user in users])
+        return _rank_in_workers(mode, {"codes": query_codes}, {"codes": index.codes}, length, None, workers)
+
+
+def _profile_signature(user: object, attributes: list[str], mode: str) -> tuple:
+    """Return the values of user that their ranking depends on in the given mode."""
+    signature = tuple(_attribute_value(user, attribute) for attribute in attributes)
+    return signature + (user.age,) if mode == "weighted" else signature
+
+
+def _attribute_value(user: object, attribute: str) -> object:
+    """Return user's value for attribute, as a hashable value."""
+    value = getattr(user.characteristics, attribute)
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _contains(sorted_positions: np.ndarray, position: int) -> bool:
+    """Return whether position is in the sorted array sorted_positions."""
+    i = np.searchsorted(sorted_positions, position)
+    return i < len(sorted_positions) and sorted_positions[i] == position
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'concurrent.futures', 'cache'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970', 'E9988']
+    })
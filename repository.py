@@ -0,0 +1,209 @@
+"""
+An optional SQLite-backed repository of users, for populations too large to filter as lists of User objects.
+
+Users are stored one row each with their profile, friend count and partner id. The indexes on name,
+(dating_goal, gender) and partner_id let the filters that tree.filter_user_by_dating_goal, graph.py and
+ui.py apply with list comprehensions run as indexed queries instead, and query streams its results from
+a cursor in pages, so only the rows being looked at are in memory:
+
+    repository = UserRepository("users.db")
+    repository.add_users(user_list)
+    for row in repository.candidates(repository.find_by_name("Bob")[0]):
+        ...
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, Iterable, Iterator, Optional
+
+from user_network import User, Characteristics
+
+# The number of rows inserted or fetched at a time
+REPOSITORY_BATCH_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    gender TEXT NOT NULL,
+    pronouns TEXT NOT NULL,
+    dating_goal TEXT NOT NULL,
+    characteristics TEXT NOT NULL,
+    friend_count INTEGER NOT NULL DEFAULT 0,
+    partner_id INTEGER REFERENCES users (id)
+);
+CREATE INDEX IF NOT EXISTS users_name ON users (name);
+CREATE INDEX IF NOT EXISTS users_dating_goal_gender ON users (dating_goal, gender);
+CREATE INDEX IF NOT EXISTS users_partner_id ON users (partner_id);
+"""
+
+
+class UserRepository:
+    """
+    A SQLite database of users.
+
+    Rows are returned as sqlite3.Row objects with the columns id, name, age, gender, pronouns,
+    dating_goal, characteristics (JSON text), friend_count and partner_id; load_user turns one into a User.
+
+    Instance Attributes:
+    - path: the path of the database file, or ":memory:".
+
+    >>> c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                     "English", True, True, True)
+    >>> a = User("A", 20, "F", "She/Her", "Long-term relationship", c, [], [])
+    >>> b = User("B", 21, "M", "He/Him", "Long-term relationship", c, [], [])
+    >>> a.match(b)
+    >>> repository = UserRepository()
+    >>> repository.add_users([a, b, User("C", 22, "M", "He/Him", "Long-term relationship", c, [], [])])
+    3
+    >>> [row["name"] for row in repository.candidates(repository.find_by_name("A")[0])]
+    ['B', 'C']
+    >>> repository.count_candidates(repository.find_by_name("B")[0])
+    1
+    >>> [row["name"] for row in repository.query(dating_goal="Long-term relationship", has_partner=False)]
+    ['C']
+    >>> repository.partner_of(repository.find_by_name("B")[0]["id"])["name"]
+    'A'
+    """
+    path: str
+    _connection: sqlite3.Connection
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(_SCHEMA)
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+    def add_users(self, users: Iterable[User], replace: bool = False) -> int:
+        """
+        Insert users in batches of REPOSITORY_BATCH_SIZE and return the number inserted. If replace is True,
+        the users already stored are deleted first, in the same transaction.
+
+        Users are given consecutive ids in order. Partners are linked once every user is inserted, so a
+        partner must be inserted in the same call to be recorded.
+        """
+        ids = {}
+        partners = []
+        batch = []
+
+        with self._connection:
+            if replace:
+                self._connection.execute("DELETE FROM users")
+            start = self._connection.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] + 1
+            for user in users:
+                ids[id(user)] = start + len(ids)
+                if user.romantic_current is not None:
+                    partners.append((ids[id(user)], user.romantic_current))
+                batch.append((ids[id(user)], user.name, user.age, user.gender, user.pronouns, user.dating_goal,
+                              json.dumps(vars(user.characteristics)), len(user.social_current or [])))
+                if len(batch) == REPOSITORY_BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+
+            self._connection.executemany("UPDATE users SET partner_id = ? WHERE id = ?",
+                                         [(ids[id(partner)], user_id) for user_id, partner in partners
+                                          if id(partner) in ids])
+        return len(ids)
+
+    def query(self, after_id: int = 0, limit: Optional[int] = None, **filters: Any) -> Iterator[sqlite3.Row]:
+        """
+        Return an iterator over the users matching every filter, in id order, fetched from the database
+        REPOSITORY_BATCH_SIZE rows at a time.
+
+        The filters are dating_goal, gender, other_gender (users of a different gender), has_partner, name
+        and exclude_id. after_id and limit select one page of results: pass the id of the last row of a
+        page as after_id to get the next one.
+        """
+        where, parameters = _where(after_id, **filters)
+        sql = f"SELECT * FROM users WHERE {where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        cursor = self._connection.execute(sql, parameters)
+        try:
+            rows = cursor.fetchmany(REPOSITORY_BATCH_SIZE)
+            while rows:
+                yield from rows
+                rows = cursor.fetchmany(REPOSITORY_BATCH_SIZE)
+        finally:
+            cursor.close()
+
+    def count(self, **filters: Any) -> int:
+        """Return the number of users matching filters, which are the filters of query."""
+        where, parameters = _where(0, **filters)
+        return self._connection.execute(f"SELECT COUNT(*) FROM users WHERE {where}", parameters).fetchone()[0]
+
+    def find_by_name(self, name: str) -> list[sqlite3.Row]:
+        """Return every user called name (names are not unique)."""
+        return list(self.query(name=name))
+
+    def partner_of(self, user_id: int) -> Optional[sqlite3.Row]:
+        """Return the partner of the user with user_id, or None."""
+        return self._connection.execute("SELECT partner.* FROM users JOIN users AS partner "
+                                        "ON partner.id = users.partner_id WHERE users.id = ?", (user_id,)).fetchone()
+
+    def candidates(self, row: sqlite3.Row, **filters: Any) -> Iterator[sqlite3.Row]:
+        """
+        Return an iterator over the candidates of the user in row, as tree.filter_user_by_dating_goal
+        chooses them: the other users with the same dating goal, of a different gender unless the goal is
+        "Meeting new friends". filters are further keyword arguments of query.
+        """
+        return self.query(**_candidate_filters(row), **filters)
+
+    def count_candidates(self, row: sqlite3.Row, **filters: Any) -> int:
+        """Return the number of candidates of the user in row, as chosen by candidates."""
+        return self.count(**_candidate_filters(row), **filters)
+
+    def _insert(self, batch: list[tuple]) -> None:
+        """Insert a batch of rows without partners."""
+        self._connection.executemany("INSERT INTO users (id, name, age, gender, pronouns, dating_goal, "
+                                     "characteristics, friend_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+
+def _candidate_filters(row: sqlite3.Row) -> dict[str, Any]:
+    """Return the query filters selecting the candidates of the user in row."""
+    other_gender = None if row["dating_goal"] == "Meeting new friends" else row["gender"]
+    return {"dating_goal": row["dating_goal"], "other_gender": other_gender, "exclude_id": row["id"]}
+
+
+def _where(after_id: int, dating_goal: Optional[str] = None, gender: Optional[str] = None,
+           other_gender: Optional[str] = None, has_partner: Optional[bool] = None, name: Optional[str] = None,
+           exclude_id: Optional[int] = None) -> tuple[str, list]:
+    """Return the WHERE clause and its parameters for the filters of UserRepository.query."""
+    conditions, parameters = ["id > ?"], [after_id]
+    for column, operator, value in (("dating_goal", "=", dating_goal), ("gender", "=", gender),
+                                    ("gender", "!=", other_gender), ("name", "=", name), ("id", "!=", exclude_id)):
+        if value is not None:
+            conditions.append(f"{column} {operator} ?")
+            parameters.append(value)
+    if has_partner is not None:
+        conditions.append("partner_id IS NOT NULL" if has_partner else "partner_id IS NULL")
+    return " AND ".join(conditions), parameters
+
+
+def load_user(row: sqlite3.Row) -> User:
+    """Return a new User, without connections, with the profile in row."""
+    return User(name=row["name"], age=row["age"], gender=row["gender"], pronouns=row["pronouns"],
+                dating_goal=row["dating_goal"], characteristics=Characteristics(**json.loads(row["characteristics"])),
+                interested_friend=[], interested_romantic=[], social_current=[])
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['json', 'sqlite3', 'user_network'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
@@ -0,0 +1,106 @@
+"""
+Production entry point for the Destiny network dashboard.
+
+ui.DestinyApp.view_network_graph runs the Dash app on Flask's single-process development server, so
+callbacks from several analysts queue behind each other. This module instead builds the dashboard as a
+WSGI application from a network snapshot, so it can be served by several worker processes:
+
+    python server.py --build --size 2000        (write the snapshot once)
+    python server.py --workers 4 --port 8050    (serve it with gunicorn)
+
+Every worker builds its own app from the same snapshot and keeps no module-level state.
+With gunicorn directly: gunicorn --workers 4 --preload "server:create_server()"
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from typing import Any, Optional
+
+import graph
+import user_network
+from snapshot import load_snapshot, save_snapshot
+
+DEFAULT_SNAPSHOT = "network_snapshot.pkl"
+
+
+def build_snapshot(path: str = DEFAULT_SNAPSHOT, size: int = 2000, seed: int = 1234) -> None:
+    """
+    Generate a network the same way DestinyApp does, compute both graph layouts and save them to path,
+    together with the network health statistics of analytics.run_snapshot.
+    """
+    user_list = user_network.generate_users_with_class(size, seed)
+    user_network.add_fixed_users(user_list)
+    user_network.make_names_unique(user_list)
+    user_list_friends, user_list_love = user_network.simulate_connections(user_list)
+
+    _, social_positions = graph.plot_social_connections(user_list_friends)
+    _, romantic_positions = graph.plot_romantic_connections(user_list_love)
+
+    save_snapshot(path, user_list, user_list_friends, user_list_love, social_positions, romantic_positions)
+
+    from analytics import run_snapshot
+    run_snapshot(path)
+
+
+def create_server(snapshot_path: Optional[str] = None) -> Any:
+    """
+    Return the WSGI application (the Flask server of the Dash app) for the network in snapshot_path.
+
+    If snapshot_path is None, the DESTINY_SNAPSHOT environment variable or DEFAULT_SNAPSHOT is used.
+    """
+    path = snapshot_path or os.environ.get("DESTINY_SNAPSHOT", DEFAULT_SNAPSHOT)
+    state = load_snapshot(path)
+
+    app = graph.create_app(user_list=state["user_list"],
+                           user_looking_for_friends=state["user_looking_for_friends"],
+                           user_looking_for_love=state["user_looking_for_love"],
+                           social_positions=state["social_positions"],
+                           romantic_positions=state["romantic_positions"],
+                           analytics=state["extras"].get("analytics"))
+    return app.server
+
+
+def run_server(snapshot_path: str = DEFAULT_SNAPSHOT, workers: int = 4, port: int = 8050,
+               host: str = "127.0.0.1") -> None:
+    """
+    Serve the dashboard for snapshot_path with gunicorn, using the given number of worker processes.
+
+    The app is preloaded in the master process so workers share the loaded network copy-on-write.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as e:
+        raise ImportError("gunicorn is required to run the dashboard with several workers "
+                          "(pip install gunicorn)") from e
+
+    class DashboardApplication(BaseApplication):
+        """A gunicorn application that serves the dashboard built by create_server."""
+
+        def load_config(self) -> None:
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("preload_app", True)
+
+        def load(self) -> Any:
+            return create_server(snapshot_path)
+
+    DashboardApplication().run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Destiny network dashboard with several workers.")
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT, help="path of the network snapshot")
+    parser.add_argument("--build", action="store_true", help="generate a new snapshot instead of serving")
+    parser.add_argument("--size", type=int, default=2000, help="number of generated users (with --build)")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed (with --build)")
+    parser.add_argument("--workers", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
+
+    if args.build:
+        build_snapshot(args.snapshot, args.size, args.seed)
+    else:
+        run_server(args.snapshot, args.workers, args.port, args.host)
+
@@ -0,0 +1,175 @@
+"""
+This module saves and loads snapshots of the user network together with its graph layouts.
+
+Users reference each other (friends, partners, interests), so a snapshot stores them as flat records
+that point at each other by index instead of pickling the object graph directly.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+from typing import Any, Optional
+
+from adjacency import Adjacency
+from user_network import User, Characteristics
+
+SNAPSHOT_VERSION = 1
+
+
+def _user_to_record(user: User, index: dict[int, int]) -> dict[str, Any]:
+    """Return a flat record of user, with every referenced user replaced by its index."""
+    return {
+        "name": user.name,
+        "age": user.age,
+        "gender": user.gender,
+        "pronouns": user.pronouns,
+        "dating_goal": user.dating_goal,
+        "characteristics": dict(vars(user.characteristics)),
+        "interested_friend": [index[id(u)] for u in user.interested_friend],
+        "interested_romantic": [index[id(u)] for u in user.interested_romantic],
+        "social_current": [index[id(u)] for u in (user.social_current or [])],
+        "romantic_current": index[id(user.romantic_current)] if user.romantic_current is not None else None,
+        "romantic_degree": user.romantic_degree,
+        "social_degree": user.social_degree
+    }
+
+
+def _collect_users(user_lists: list[list[User]]) -> list[User]:
+    """Return every distinct user object reachable from user_lists, in the order they are first seen."""
+    pending = [u for users in user_lists for u in users]
+    seen = set()
+    order = []
+    i = 0
+    while i < len(pending):
+        user = pending[i]
+        i += 1
+        if id(user) in seen:
+            continue
+        seen.add(id(user))
+        order.append(user)
+        pending.extend(user.interested_friend)
+        pending.extend(user.interested_romantic)
+        pending.extend(user.social_current or [])
+        if user.romantic_current is not None:
+            pending.append(user.romantic_current)
+    return order
+
+
+def save_snapshot(path: str, user_list: list[User], user_looking_for_friends: list[User],
+                  user_looking_for_love: list[User], social_positions: Optional[dict] = None,
+                  romantic_positions: Optional[dict] = None, extras: Optional[dict[str, Any]] = None) -> None:
+    """
+    Save the network and its layouts to path.
+
+    The file is written to a temporary name first and then moved into place, so readers
+    (e.g. dashboard workers starting up) never see a half-written snapshot.
+    """
+    users = _collect_users([user_list, user_looking_for_friends, user_looking_for_love])
+    index = {id(u): i for i, u in enumerate(users)}
+
+    def positions_to_tuples(positions: Optional[dict]) -> Optional[dict]:
+        if positions is None:
+            return None
+        return {name: (float(p[0]), float(p[1])) for name, p in positions.items()}
+
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "users": [_user_to_record(u, index) for u in users],
+        "user_list": [index[id(u)] for u in user_list],
+        "user_looking_for_friends": [index[id(u)] for u in user_looking_for_friends],
+        "user_looking_for_love": [index[id(u)] for u in user_looking_for_love],
+        "social_positions": positions_to_tuples(social_positions),
+        "romantic_positions": positions_to_tuples(romantic_positions),
+        "extras": extras or {}
+    }
+    _write_snapshot(path, data)
+
+
+def _write_snapshot(path: str, data: dict[str, Any]) -> None:
+    """Write the snapshot data to path through a temporary file, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _read_snapshot(path: str) -> dict[str, Any]:
+    """Return the raw data of the snapshot at path."""
+    with open(path, "rb") as file:
+        data = pickle.load(file)
+
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {data.get('version')}")
+    return data
+
+
+def update_snapshot_extras(path: str, **extras: Any) -> None:
+    """Add extras (e.g. precomputed statistics) to the snapshot at path, without loading its users."""
+    data = _read_snapshot(path)
+    data["extras"].update(extras)
+    _write_snapshot(path, data)
+
+
+def load_connections(path: str) -> tuple[Any, Any, Any]:
+    """
+    Return the friendships of the snapshot at path as CSR arrays (indptr, indices), and the partner
+    of every user (-1 for none), without creating the users. Users are numbered by their index in
+    the snapshot, as in the network returned by load_snapshot.
+    """
+    import numpy as np
+
+    records = _read_snapshot(path)["users"]
+    degrees = np.fromiter((len(r["social_current"]) for r in records), dtype=np.int64, count=len(records))
+    indptr = np.zeros(len(records) + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    indices = np.fromiter((i for r in records for i in r["social_current"]), dtype=np.int64, count=int(indptr[-1]))
+    partners = np.array([-1 if r["romantic_current"] is None else r["romantic_current"] for r in records],
+                        dtype=np.int64)
+    return indptr, indices, partners
+
+
+def load_snapshot(path: str) -> dict[str, Any]:
+    """
+    Load a snapshot written by save_snapshot.
+
+    Return a dictionary with the keys user_list, user_looking_for_friends, user_looking_for_love,
+    social_positions, romantic_positions and extras, and network: the adjacency.Adjacency holding the
+    loaded connections, in which each user's node is their index in the snapshot.
+    """
+    data = _read_snapshot(path)
+    records = data["users"]
+    users = [User(name=r["name"], age=r["age"], gender=r["gender"], pronouns=r["pronouns"],
+                  dating_goal=r["dating_goal"], characteristics=Characteristics(**r["characteristics"]),
+                  interested_friend=[], interested_romantic=[], social_current=[],
+                  romantic_degree=r["romantic_degree"], social_degree=r["social_degree"])
+             for r in records]
+
+    # Attach the users before linking them, so that each user's node is its index in the snapshot
+    network = Adjacency(users)
+
+    for user, record in zip(users, records):
+        user.interested_friend = [users[i] for i in record["interested_friend"]]
+        user.interested_romantic = [users[i] for i in record["interested_romantic"]]
+        user.social_current = [users[i] for i in record["social_current"]]
+        if record["romantic_current"] is not None:
+            user.romantic_current = users[record["romantic_current"]]
+
+    return {
+        "user_list": [users[i] for i in data["user_list"]],
+        "user_looking_for_friends": [users[i] for i in data["user_looking_for_friends"]],
+        "user_looking_for_love": [users[i] for i in data["user_looking_for_love"]],
+        "social_positions": data["social_positions"],
+        "romantic_positions": data["romantic_positions"],
+        "extras": data["extras"],
+        "network": network
+    }
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'pickle', 'user_network', 'adjacency', 'numpy'],  # the names (strs) of imported modules
+        'allowed-io': ['_write_snapshot', '_read_snapshot'],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
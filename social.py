@@ -0,0 +1,163 @@
+"""
+Friend-of-friend recommendations, blended with the preference ranking of ranking.Recommender.
+
+The preference ranking only compares attributes. This module adds a second source of candidates from the
+friendships in an adjacency.Adjacency: the friends of a user's friends, scored by the number of mutual
+friends. For one user they are counted with a bounded two-hop traversal (Adjacency.mutual_friend_counts);
+for many users, the counts are the rows of A @ A for the friendship matrix A, computed with sparse products
+over blocks of users. The two rankings are then merged with reciprocal rank fusion: a candidate at position
+r (from 0) of a ranking scores weight / (RANK_OFFSET + r) from it, and candidates are ordered by their
+total score.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+
+from analytics import adjacency_matrix
+from ranking import BLOCK_QUERIES, Recommender
+
+# The number of friends of a user expanded when looking for friends of friends
+MAX_EXPANDED_FRIENDS = 200
+
+# The number of users whose mutual friends are counted with one sparse product in mutual_friends_many
+MUTUAL_BLOCK_ROWS = 4096
+
+# Reciprocal rank fusion: RANK_OFFSET damps the difference between the first few positions of a ranking,
+# and SOCIAL_WEIGHT is the weight of the friend-of-friend ranking relative to the preference ranking
+RANK_OFFSET = 60
+SOCIAL_WEIGHT = 1.0
+
+
+def top_mutual_friends(network: object, node: int, k: Optional[int] = None,
+                       max_friends: Optional[int] = MAX_EXPANDED_FRIENDS) -> list[tuple[int, int]]:
+    """
+    Return up to k (node, mutual friend count) pairs for the friends of the friends of node, with the most
+    mutual friends first and ties broken by node, expanding at most max_friends friends of node.
+    """
+    counts = network.mutual_friend_counts(node, max_friends)
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return ranked if k is None else ranked[:k]
+
+
+def mutual_friends_many(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray, k: Optional[int] = None,
+                        max_friends: Optional[int] = MAX_EXPANDED_FRIENDS,
+                        allowed: Optional[np.ndarray] = None) -> list[list[tuple[int, int]]]:
+    """
+    Return top_mutual_friends for every node in nodes, from the friendship CSR arrays (indptr, indices),
+    keeping only the candidates whose entry in the boolean array allowed is True (if given).
+
+    The counts for a block of nodes are the rows of Q @ A, where A is the friendship matrix and Q holds the
+    rows of A for the block, truncated to their first max_friends entries. Each node and its friends are
+    then removed from its row.
+
+    >>> indptr, indices = np.array([0, 2, 4, 6, 8, 8]), np.array([1, 2, 0, 3, 0, 3, 1, 2])
+    >>> mutual_friends_many(indptr, indices, np.array([0, 3, 4]))
+    [[(3, 2)], [(0, 2)], []]
+    >>> mutual_friends_many(indptr, indices, np.array([0]), allowed=np.array([True, True, True, False, True]))
+    [[]]
+    """
+    matrix = adjacency_matrix(indptr, indices)
+    if allowed is not None:
+        # Multiplying by A restricted to the allowed columns only counts paths ending at allowed candidates
+        targets = matrix @ sparse.diags(allowed.astype(np.int64), dtype=np.int64)
+    else:
+        targets = matrix
+    degrees = np.diff(indptr)
+    results = []
+
+    for start in range(0, len(nodes), MUTUAL_BLOCK_ROWS):
+        block = np.asarray(nodes[start:start + MUTUAL_BLOCK_ROWS])
+        friends = matrix[block]
+        if max_friends is not None and degrees[block].max(initial=0) > max_friends:
+            rank_in_row = np.arange(friends.nnz) - np.repeat(friends.indptr[:-1], np.diff(friends.indptr))
+            friends.data[rank_in_row >= max_friends] = 0
+            friends.eliminate_zeros()
+
+        # Drop each node and its friends from its row of counts
+        counts = (friends @ targets).tocsr()
+        exclude = matrix[block] + sparse.csr_matrix((np.ones(len(block), dtype=np.int64),
+                                                     (np.arange(len(block)), block)), shape=counts.shape)
+        counts = (counts - counts.multiply(exclude > 0)).tocsr()
+        counts.eliminate_zeros()
+
+        rows = np.repeat(np.arange(len(block)), np.diff(counts.indptr))
+        order = np.lexsort((counts.indices, -counts.data, rows))
+        columns, values = counts.indices[order].tolist(), counts.data[order].tolist()
+        for row in range(len(block)):
+            begin, end = counts.indptr[row], counts.indptr[row + 1]
+            if k is not None:
+                end = min(end, begin + k)
+            results.append(list(zip(columns[begin:end], values[begin:end])))
+
+    return results
+
+
+def blend_rankings(preferred: list, social: list, k: Optional[int] = None, weight: float = SOCIAL_WEIGHT) -> list:
+    """
+    Return the top k candidates (all of them if k is None) of the preference ranking preferred and the
+    friend-of-friend ranking social, merged by reciprocal rank fusion.
+
+    >>> blend_rankings(["A", "B", "C"], ["C", "D"], 3)
+    ['C', 'A', 'B']
+    """
+    scores = {}
+    candidates = {}
+    for ranking, ranking_weight in ((preferred, 1.0), (social, weight)):
+        for position, candidate in enumerate(ranking):
+            scores[id(candidate)] = scores.get(id(candidate), 0.0) + ranking_weight / (RANK_OFFSET + position)
+            candidates[id(candidate)] = candidate
+
+    # Python's sort is stable, so ties keep the preference order
+    ranked = sorted(candidates, key=lambda key: -scores[key])
+    blended = [candidates[key] for key in ranked]
+    return blended if k is None else blended[:k]
+
+
+def recommend_with_friends(recommender: Recommender, users: list, attributes: list[str], k: Optional[int] = 10,
+                           mode: str = "lexicographic", weight: float = SOCIAL_WEIGHT,
+                           workers: int = 1) -> list[list]:
+    """
+    Return the top k recommendations of every user in users: their preference ranking from recommender,
+    blended with the k friends of their friends with the most mutual friends that are in their candidate pool.
+
+    Users that are not attached to a network get their preference ranking only. The mutual friends of
+    fewer than BLOCK_QUERIES users of a network are counted one user at a time, and with sparse products
+    over the network's CSR arrays otherwise.
+    """
+    preferred = recommender.recommend_many(users, attributes, k, mode, workers)
+
+    groups = {}
+    for i, user in enumerate(users):
+        if user.network is not None:
+            groups.setdefault((id(user.network), recommender.pool(user).pool_id), []).append(i)
+
+    social = [[] for _ in users]
+    for members in groups.values():
+        network, pool = users[members[0]].network, recommender.pool(users[members[0]])
+        if len(members) < BLOCK_QUERIES:
+            for i in members:
+                counts = top_mutual_friends(network, users[i].node)
+                candidates = (network.users[node] for node, _ in counts)
+                social[i] = [candidate for candidate in candidates if pool.accepts(candidate)][:k]
+        else:
+            indptr, indices = network.to_csr()
+            allowed = np.fromiter((pool.accepts(user) for user in network.users), dtype=bool, count=len(network))
+            nodes = np.array([users[i].node for i in members], dtype=np.int64)
+            for i, counts in zip(members, mutual_friends_many(indptr, indices, nodes, k, allowed=allowed)):
+                social[i] = [network.users[node] for node, _ in counts]
+
+    return [blend_rankings(ranking, friends_of_friends, k, weight)
+            for ranking, friends_of_friends in zip(preferred, social)]
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'scipy', 'analytics', 'ranking'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970']
+    })
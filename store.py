@@ -0,0 +1,250 @@
+"""
+Durable local storage for the events of a live network, in a SQLite database in WAL mode.
+
+EventStore.append only puts an event on a queue, so recording a profile or a match never waits for the
+disk. A background writer thread inserts the queued events in batches, one transaction per batch, and
+checkpoints the write-ahead log every STORE_SYNC_SECONDS, which is when SQLite fsyncs the database
+(with synchronous=NORMAL, commits to the WAL itself are not fsynced). An event can therefore be lost if
+the machine crashes within that window, but never half-written.
+
+On startup, attach_store replays the stored events over the generated population and then stores every
+new event of the log:
+
+    store = EventStore("destiny_events.db")
+    attach_store(log, store)
+    ...
+    store.close()
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from events import Event, EventLog
+
+# The most events inserted in one transaction
+STORE_BATCH_SIZE = 1000
+
+# How long the writer waits for more events before committing a batch, in seconds
+STORE_FLUSH_SECONDS = 0.05
+
+# How often the write-ahead log is checkpointed (and the database fsynced), in seconds
+STORE_SYNC_SECONDS = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (version INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class EventStore:
+    """
+    A SQLite database of network events, written by a background thread.
+
+    Instance Attributes:
+    - path: the path of the database file.
+    - written: the number of events written to the database so far.
+    - syncs: the number of checkpoints made so far.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "events.db")
+    >>> store = EventStore(path)
+    >>> store.append(Event(1, "socialize", {"user1": 0, "user2": 1}))
+    >>> store.close()
+    >>> EventStore(path).events()
+    [Event(1, 'socialize', {'user1': 0, 'user2': 1})]
+    """
+    path: str
+    written: int
+    syncs: int
+    _queue: queue.Queue
+    _thread: threading.Thread
+    _error: Optional[BaseException]
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.written = 0
+        self.syncs = 0
+        self._error = None
+
+        connection = self._connect()
+        connection.executescript(_SCHEMA)
+        connection.close()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_events, daemon=True)
+        self._thread.start()
+
+    def events(self, after: int = 0) -> list[Event]:
+        """Return the stored events with a version greater than after, oldest first."""
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT version, kind, payload FROM events WHERE version > ? ORDER BY version",
+                                      (after,)).fetchall()
+        finally:
+            connection.close()
+        return [Event(version, kind, json.loads(payload)) for version, kind, payload in rows]
+
+    def meta(self, key: str) -> Optional[str]:
+        """Return the metadata value stored under key, or None."""
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        finally:
+            connection.close()
+        return row[0] if row is not None else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Store value under key in the metadata, right away."""
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        finally:
+            connection.close()
+
+    def append(self, event: Event) -> None:
+        """Queue event to be written by the background thread, without waiting for it."""
+        self._check()
+        self._queue.put(event)
+
+    def flush(self) -> None:
+        """Wait until every queued event has been written and committed, and raise if any write failed."""
+        self._queue.join()
+        self._check()
+
+    def close(self) -> None:
+        """
+        Write every queued event, checkpoint the database and stop the background thread, and raise if any
+        write failed. Closing a store that is already closed does nothing.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._check()
+
+    def _check(self) -> None:
+        """Raise a RuntimeError if the background thread failed to write a batch of events."""
+        if self._error is not None:
+            raise RuntimeError(f"The event store at {self.path} failed.") from self._error
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return a new connection to the database, in WAL mode."""
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write_events(self) -> None:
+        """Write queued events in batches until close is called. Runs on the background thread."""
+        connection = self._connect()
+        last_sync = time.monotonic()
+        unsynced = 0
+        closing = False
+
+        while not closing:
+            # Wait for the next event, but no longer than the next checkpoint is due
+            timeout = max(0.0, STORE_SYNC_SECONDS - (time.monotonic() - last_sync)) if unsynced else None
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+
+            # Collect more events for the same transaction until the batch is full or the queue stays empty
+            deadline = time.monotonic() + STORE_FLUSH_SECONDS
+            while batch and batch[-1] is not None and len(batch) < STORE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            closing = bool(batch) and batch[-1] is None
+            rows = [(event.version, event.kind, json.dumps(event.payload)) for event in batch if event is not None]
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany("INSERT OR REPLACE INTO events (version, kind, payload) "
+                                               "VALUES (?, ?, ?)", rows)
+                    self.written += len(rows)
+                    unsynced += len(rows)
+                if unsynced and (closing or time.monotonic() - last_sync >= STORE_SYNC_SECONDS):
+                    connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                    self.syncs += 1
+                    unsynced = 0
+                    last_sync = time.monotonic()
+            except sqlite3.Error as e:
+                self._error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        connection.close()
+
+
+def population_fingerprint(users: list) -> str:
+    """
+    Return a digest of the profiles of users, in order, to recognise the same population.
+
+    Names are left out, since user_network.UserDirectory renames users whose name is taken.
+    """
+    digest = hashlib.sha1()
+    for user in users:
+        characteristics = json.dumps(vars(user.characteristics), sort_keys=True)
+        digest.update(f"{user.age}|{user.gender}|{user.dating_goal}|{characteristics}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def move_store_aside(path: str) -> str:
+    """
+    Rename the closed database at path, with its write-ahead log files, to the first free path of the form
+    path.old1, path.old2, ..., and return that path.
+    """
+    number = 1
+    while os.path.exists(f"{path}.old{number}"):
+        number += 1
+    new_path = f"{path}.old{number}"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.replace(path + suffix, new_path + suffix)
+    return new_path
+
+
+def attach_store(log: EventLog, store: EventStore) -> int:
+    """
+    Apply the events in store that are newer than log to log, then write every new event of log to store.
+    Return the number of events applied.
+
+    The events of a store refer to users by position, so the store remembers the population they were
+    recorded over; a ValueError is raised if log starts from a different one, and the store can then be
+    closed and moved aside with move_store_aside to start a new one.
+    """
+    fingerprint = population_fingerprint(log.users)
+    stored = store.meta("population")
+    if stored is None:
+        store.set_meta("population", fingerprint)
+    elif stored != fingerprint:
+        raise ValueError(f"The events in {store.path} were recorded over a different population.")
+
+    applied = 0
+    for event in store.events(log.version):
+        log.apply(event)
+        applied += 1
+
+    log.subscribe(store.append)
+    return applied
+
+
+if __name__ == "__main__":
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'json', 'os', 'queue', 'sqlite3', 'threading', 'time', 'events'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'disable': ['E9970', 'E9992']
+    })
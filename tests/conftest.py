@@ -0,0 +1,22 @@
+"""
+Shared fixtures for the Destiny tests. Run them from the repository root with python -m pytest.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_network import User, Characteristics  # noqa: E402
+
+
+@pytest.fixture
+def make_user():
+    """Return a function creating a user without connections, with the same characteristics by default."""
+    def make(name: str, gender: str = "F", dating_goal: str = "Meeting new friends", mbti: str = "INTP") -> User:
+        characteristics = Characteristics("Asian", ["Coding"], mbti, "Texting", "Liberal", "Other", "Music", "1",
+                                          "English", True, True, True)
+        return User(name, 20, gender, "She/Her" if gender == "F" else "He/Him", dating_goal, characteristics,
+                    [], [], social_current=[])
+    return make
@@ -0,0 +1,30 @@
+"""
+Tests for the friendship edges of adjacency.Adjacency.
+"""
+import pytest
+
+from adjacency import Adjacency
+
+
+def test_add_friendship_rejects_self_loops(make_user) -> None:
+    """A user cannot become their own friend, and the failed attempt leaves their friends unchanged."""
+    a, b = make_user("A"), make_user("B")
+    network = Adjacency([a, b])
+
+    with pytest.raises(ValueError):
+        network.add_friendship(a, a)
+
+    assert network.add_friendship(a, b)
+    assert list(a.social_current) == [b]
+    assert network.degree(a.node) == 1
+
+
+def test_attaching_skips_a_user_listed_as_their_own_friend(make_user) -> None:
+    """A user whose friend list contains themselves is attached without a self-loop."""
+    a, b = make_user("A"), make_user("B")
+    a.social_current.extend([a, b])
+    b.social_current.append(a)
+
+    Adjacency([a, b])
+
+    assert list(a.social_current) == [b]
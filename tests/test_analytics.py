@@ -0,0 +1,60 @@
+"""
+Tests for the sparse network statistics in analytics, checked against networkx.
+"""
+import networkx as nx
+import numpy as np
+import pytest
+
+import analytics
+
+
+@pytest.fixture
+def graph() -> nx.Graph:
+    """A small random graph with a few isolated users and a separate triangle."""
+    graph = nx.gnp_random_graph(80, 0.06, seed=3)
+    graph.add_nodes_from(range(80, 84))
+    graph.add_edges_from([(84, 85), (85, 86), (86, 84)])
+    return graph
+
+
+def csr_arrays(graph: nx.Graph) -> tuple[np.ndarray, np.ndarray]:
+    """Return the CSR arrays of graph's adjacency, with its nodes in order."""
+    matrix = nx.to_scipy_sparse_array(graph, nodelist=range(graph.number_of_nodes()), format="csr")
+    matrix.sort_indices()
+    return matrix.indptr, matrix.indices
+
+
+def test_statistics_match_networkx(graph, monkeypatch) -> None:
+    """Degrees, components, triangles, clustering and core numbers agree with networkx."""
+    monkeypatch.setattr(analytics, "TRIANGLE_BLOCK_ROWS", 16)
+    nodes = range(graph.number_of_nodes())
+    matrix = analytics.adjacency_matrix(*csr_arrays(graph))
+
+    assert analytics.degree_distribution(matrix).tolist() == nx.degree_histogram(graph)
+
+    num_components, labels = analytics.connected_components(matrix)
+    assert num_components == nx.number_connected_components(graph)
+    assert {frozenset(np.flatnonzero(labels == label).tolist()) for label in range(num_components)} == \
+        {frozenset(component) for component in nx.connected_components(graph)}
+
+    triangles = nx.triangles(graph)
+    assert analytics.triangle_counts(matrix).tolist() == [triangles[node] for node in nodes]
+
+    clustering = nx.clustering(graph)
+    assert analytics.clustering_coefficients(matrix).tolist() == pytest.approx([clustering[node] for node in nodes])
+
+    cores = nx.core_number(graph)
+    assert analytics.core_numbers(matrix).tolist() == [cores[node] for node in nodes]
+
+
+def test_network_health_matches_networkx(graph) -> None:
+    """The summary stored in snapshots agrees with networkx's whole-graph statistics."""
+    health = analytics.network_health(*csr_arrays(graph))
+
+    assert health["users"] == graph.number_of_nodes()
+    assert health["friendships"] == graph.number_of_edges()
+    assert health["isolated_users"] == nx.number_of_isolates(graph)
+    assert health["largest_component"] == len(max(nx.connected_components(graph), key=len))
+    assert health["triangles"] == sum(nx.triangles(graph).values()) // 3
+    assert health["average_clustering"] == pytest.approx(nx.average_clustering(graph))
+    assert health["max_core"] == max(nx.core_number(graph).values())
@@ -0,0 +1,17 @@
+"""
+Tests for the headless matching runs of cli.
+"""
+from cli import run
+from repository import UserRepository
+
+
+def test_rerun_replaces_the_stored_users(tmp_path) -> None:
+    """Running twice with the same database stores the population once, not twice."""
+    database = str(tmp_path / "users.db")
+    for _ in range(2):
+        summary = run(size=30, seed=1234, k=3, output=str(tmp_path / "matches.csv"), database=database)
+
+    repository = UserRepository(database)
+    assert len(repository) == summary["users"]
+    assert [row["id"] for row in repository.query(limit=1)] == [1]
+    repository.close()
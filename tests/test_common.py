@@ -0,0 +1,47 @@
+"""
+Tests for the match files written and read in common.
+"""
+import numpy as np
+import pytest
+
+from common import build_preference_tree, read_match_file, write_match_file
+
+NAMES = ["Alice", "Bo", "Charlotte"]
+HEADING = ["religion", "interests", "mbti"]
+MATRIX = [[1, 0, 1], [0, 1, 1], [1, 1, 0]]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "npy"])
+def test_match_file_round_trip(tmp_path, fmt) -> None:
+    """Both formats read back the names, heading and matrix that were written."""
+    path = str(tmp_path / f"matches.{fmt}")
+    write_match_file(NAMES, HEADING, MATRIX, path, fmt)
+
+    names, heading, matrix = read_match_file(path)
+
+    assert names == NAMES
+    assert heading == HEADING
+    assert matrix.dtype == np.uint8
+    assert matrix.tolist() == MATRIX
+
+
+def test_csv_and_npy_match_files_build_the_same_tree(tmp_path) -> None:
+    """A preference tree built from either format ranks the names in the same order."""
+    csv_path, npy_path = str(tmp_path / "matches.csv"), str(tmp_path / "matches.npy")
+    write_match_file(NAMES, HEADING, MATRIX, csv_path, "csv")
+    write_match_file(NAMES, HEADING, MATRIX, npy_path, "npy")
+
+    assert build_preference_tree(csv_path).run_preference_tree() == \
+        build_preference_tree(npy_path).run_preference_tree()
+
+
+def test_npy_match_file_is_memory_mapped(tmp_path) -> None:
+    """The matrix of a .npy path is a read-only view of the mapped file, not a copy."""
+    path = str(tmp_path / "matches.npy")
+    write_match_file(NAMES, HEADING, MATRIX, path, "npy")
+
+    _, _, matrix = read_match_file(path)
+
+    assert isinstance(matrix, np.memmap)
+    assert not matrix.flags.owndata
+    assert not matrix.flags.writeable
@@ -0,0 +1,58 @@
+"""
+Tests for the memory reports of diagnostics.
+"""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import diagnostics
+import ranking
+from tree import BinaryTree
+
+
+@pytest.fixture
+def tracing():
+    """Trace allocations during the test, stopping afterwards unless tracing was already on."""
+    was_tracing = tracemalloc.is_tracing()
+    diagnostics.start_tracing()
+    yield
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def test_report_attributes_memory_to_subsystems(tracing) -> None:
+    """Arrays allocated in ranking.py and trees built in tree.py are counted under their subsystems."""
+    weights = ranking.priority_weights(1_000_000)
+    tree = BinaryTree.from_matrix(np.random.default_rng(0).integers(0, 2, size=(200, 6)),
+                                  [f"user{i}" for i in range(200)])
+
+    report = diagnostics.collect_report("test")
+
+    assert report["tracing"] and report["label"] == "test"
+    assert report["subsystems"]["ranking"]["bytes"] >= weights.nbytes
+    assert report["subsystems"]["preference trees"]["allocations"] > 0
+    assert report["traced_bytes"] >= sum(entry["bytes"] for entry in report["subsystems"].values())
+    assert len(report["objects"]) == diagnostics.TOP_OBJECT_TYPES
+    assert list(report["objects"].values()) == sorted(report["objects"].values(), reverse=True)
+    assert diagnostics.object_counts(None)["BinaryTree"] > 0 and tree.run_preference_tree()
+
+
+def test_report_is_saved_and_loaded_as_json(tracing, tmp_path) -> None:
+    """A saved report loads back unchanged, and comparing it with itself shows no changes."""
+    report = diagnostics.collect_report("saved")
+    path = str(tmp_path / "memory.json")
+
+    diagnostics.save_report(report, path)
+    loaded = diagnostics.load_report(path)
+
+    assert loaded == report
+    assert diagnostics.compare_reports(loaded, report) == {"subsystems": {}, "objects": {}}
+    assert diagnostics.load_report(str(tmp_path / "missing.json")) is None
+
+
+def test_subsystem_is_decided_by_the_app_module_file_name(tmp_path) -> None:
+    """Only the app's own modules count as .py fragments; a file of the same name elsewhere does not."""
+    assert diagnostics.subsystem_of([ranking.__file__]) == "ranking"
+    assert diagnostics.subsystem_of([str(tmp_path / "ranking.py")]) == "other"
+    assert diagnostics.subsystem_of([str(tmp_path / "x.py"), diagnostics.PROJECT_DIR + "/store.py"]) == "storage"
@@ -0,0 +1,23 @@
+"""
+Tests for the counters kept up to date from an events.EventLog.
+"""
+from events import EventLog, NetworkCounters
+
+
+def test_counters_grow_with_the_log(make_user) -> None:
+    """Counters that grow past their capacity several times agree with counters built from the users."""
+    users = [make_user("A"), make_user("B")]
+    log = EventLog(users)
+    counters = NetworkCounters(log)
+
+    for i in range(40):
+        log.add_profile(make_user(f"U{i}", "M" if i % 2 else "F", "Long-term relationship"))
+        if i % 3 == 0:
+            log.socialize(users[0], users[-1])
+    log.match(users[-1], users[-2])
+
+    rebuilt = NetworkCounters(EventLog(users))
+    assert len(counters) == len(users) == 42
+    assert counters.friend_counts.tolist() == rebuilt.friend_counts.tolist()
+    assert counters.partners.tolist() == rebuilt.partners.tolist()
+    assert counters.friend_count(0) == 14 and counters.partners[41] == 40
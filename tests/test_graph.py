@@ -0,0 +1,135 @@
+"""
+Tests for the network figures of graph and the Dash app built by graph.create_app.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from cache import LRUCache
+from events import EventLog, LayoutCache, NetworkCounters
+
+graph = pytest.importorskip("graph")
+
+
+@pytest.fixture
+def network(make_user) -> tuple:
+    """Return users looking for friends and for love, and an event log over all of them."""
+    friends = [make_user(name) for name in ["A", "B", "C"]]
+    love = [make_user("D", "F", "Long-term relationship"), make_user("E", "M", "Long-term relationship")]
+    users = friends + love
+    return users, friends, love, EventLog(users)
+
+
+def search(client, name: str) -> None:
+    """Press the search button of the app served by client with name in the search box."""
+    inputs = [{"id": "search-button", "property": "n_clicks", "value": 1},
+              {"id": "reset-button", "property": "n_clicks"},
+              {"id": "social-graph", "property": "clickData"},
+              {"id": "romantic-graph", "property": "clickData"},
+              {"id": "graph-tabs", "property": "value", "value": "social-tab"}]
+    response = client.post("/_dash-update-component", json={
+        "output": "..social-graph.figure...romantic-graph.figure...clicked-node-output.children..",
+        "outputs": [{"id": "social-graph", "property": "figure"}, {"id": "romantic-graph", "property": "figure"},
+                    {"id": "clicked-node-output", "property": "children"}],
+        "inputs": inputs,
+        "changedPropIds": ["search-button.n_clicks"],
+        "state": [{"id": "search-input", "property": "value", "value": name}]})
+    assert response.status_code == 200
+
+
+def cache_stats(client) -> dict:
+    """Return the figure cache counters of the app served by client."""
+    return json.loads(client.get("/debug/figure-cache").data)
+
+
+def test_lru_cache_evicts_the_least_recently_used_entry() -> None:
+    """Reading an entry keeps it, so the entry read longest ago is evicted first."""
+    cache = LRUCache(max_size=3)
+    for key in "abc":
+        cache.put(key, key)
+    cache.get("a")
+
+    cache.put("d", "d")
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_repeated_searches_are_served_from_the_cache(network) -> None:
+    """Figures are cached by tab, normalized search name and version, so a repeated search only hits."""
+    users, friends, love, _ = network
+    client = graph.create_app(users, friends, love, network_version=3).server.test_client()
+    before = cache_stats(client)
+
+    search(client, "a")
+    after_first = cache_stats(client)
+    search(client, " A ")
+    after_second = cache_stats(client)
+
+    assert before["entries"] == 2 and before["network_version"] == 3
+    assert after_first["entries"] == 4 and after_first["misses"] == before["misses"] + 2
+    assert after_second["entries"] == 4 and after_second["hits"] == after_first["hits"] + 2
+    assert after_second["misses"] == after_first["misses"]
+
+
+def test_a_new_version_rebuilds_the_searched_figures(network) -> None:
+    """After an event, the figures of a search already made are built again for the new version."""
+    users, friends, love, log = network
+    client = graph.create_app(users, friends, love, events=log, counters=NetworkCounters(log)).server.test_client()
+    search(client, "A")
+
+    log.socialize(friends[0], friends[1])
+    misses = cache_stats(client)["misses"]
+    search(client, "A")
+
+    stats = cache_stats(client)
+    assert stats["network_version"] == log.version
+    assert stats["misses"] == misses + 2 and stats["entries"] == 2
+
+
+def test_events_clear_the_figure_cache(network) -> None:
+    """Figures cached before an event are dropped once it is recorded."""
+    users, friends, love, log = network
+    app = graph.create_app(users, friends, love, events=log, counters=NetworkCounters(log))
+    client = app.server.test_client()
+    assert json.loads(client.get("/debug/figure-cache").data)["entries"] == 2
+
+    log.socialize(friends[0], friends[1])
+
+    stats = json.loads(client.get("/debug/figure-cache").data)
+    assert stats["entries"] == 0 and stats["network_version"] == log.version
+
+
+def test_events_need_their_counters(network) -> None:
+    """An app following an event log reads the log's counters instead of subscribing new ones."""
+    users, friends, love, log = network
+    with pytest.raises(ValueError):
+        graph.create_app(users, friends, love, events=log)
+
+
+def test_layout_snapshot_is_a_copy(network, make_user) -> None:
+    """A snapshot of the layouts is not changed by later events."""
+    users, friends, _, log = network
+    layouts = LayoutCache(log, {user.name: (0.0, 0.0) for user in friends}, {})
+    social, _ = layouts.snapshot()
+
+    log.add_profile(make_user("F"))
+
+    assert "F" not in social and "F" in layouts.social_positions
+
+
+def test_romantic_graph_keeps_one_way_links(make_user) -> None:
+    """A user whose partner has matched with someone else is still linked to them, and highlighted with them."""
+    users = [make_user(name, dating_goal="Long-term relationship") for name in ["A", "B", "C"]]
+    positions = {"A": (0.0, 0.0), "B": (1.0, 0.0), "C": (0.0, 1.0)}
+    # B matched with A, then A matched with C
+    partners = np.array([2, 0, 0])
+
+    fig, _ = graph.plot_romantic_connections(users, None, positions, partners)
+    assert len(fig.data[0].x) // 3 == 2
+
+    fig, _ = graph.plot_romantic_connections(users, "a", positions, partners)
+    assert len(fig.data[1].x) // 3 == 2
+    assert list(fig.data[2].marker.color) == ["#E74C3C", "#FF85A2", "#FF85A2"]
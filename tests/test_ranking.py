@@ -0,0 +1,160 @@
+"""
+Tests for the packed match vectors and the Recommender in ranking.
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import ranking
+from ranking import Recommender, encode_profiles, pack_codes, rank_popcount, weighted_block_scores
+
+
+def test_pack_codes_rejects_codes_of_different_widths() -> None:
+    """Queries and candidates coded on different numbers of attributes cannot be packed together."""
+    with pytest.raises(ValueError):
+        pack_codes(np.array([[0, 0, 1]]), np.array([[0, 1], [1, 0]]))
+
+
+def test_popcount_ranking_counts_matching_attributes() -> None:
+    """The popcount mode ranks by the number of matching attributes, then in preference-tree order."""
+    rng = np.random.default_rng(0)
+    query_codes = rng.integers(0, 3, size=(5, 6))
+    pool_codes = rng.integers(0, 3, size=(300, 6))
+
+    ranked = rank_popcount(query_codes, pool_codes, 20)
+
+    for query, positions in zip(query_codes, ranked):
+        matches = [tuple(int(q == c) for q, c in zip(query, candidate)) for candidate in pool_codes]
+        expected = sorted(range(len(pool_codes)), key=lambda i: (-sum(matches[i]), [-m for m in matches[i]], i))
+        assert positions.tolist() == expected[:20]
+
+
+def test_recommender_popcount_mode_puts_more_matches_first(make_user) -> None:
+    """A candidate matching on two lower attributes outranks one matching only on the most important one."""
+    users = [make_user("A"), make_user("B", mbti="ENTJ"), make_user("C")]
+    users[1].characteristics.interests = ["Running"]
+    users[2].characteristics.religion = "Jewish"
+    attributes = ["religion", "mbti", "interests"]
+
+    recommender = Recommender(users)
+    assert [u.name for u in recommender.recommend(users[0], attributes, mode="lexicographic")] == ["B", "C"]
+    assert [u.name for u in recommender.recommend(users[0], attributes, mode="popcount")] == ["C", "B"]
+
+
+def test_weighted_scores_match_hand_computed_scores(make_user) -> None:
+    """Weights 3/6, 2/6 and 1/6 for matches, Jaccard similarity for interests and a linear age bonus."""
+    users = [make_user("A"), make_user("B", mbti="ENTJ"), make_user("C"), make_user("D", mbti="ENTJ"),
+             make_user("E")]
+    interests = [["Coding", "Music"], ["Running"], ["Coding", "Music"], ["Coding"], ["Coding", "Running", "Music"]]
+    religions = ["Other", "Other", "Jewish", "Other", "Jewish"]
+    for user, user_interests, religion, age in zip(users, interests, religions, [20, 32, 20, 26, 23]):
+        user.characteristics.interests = user_interests
+        user.characteristics.religion = religion
+        user.age = age
+    attributes = ["religion", "interests", "mbti"]
+
+    # religion + interests * Jaccard + mbti + 0.1 * (1 - age gap / 12)
+    expected = [3 / 6 + 0 + 0 + 0,
+                0 + 2 / 6 + 1 / 6 + 0.1,
+                3 / 6 + 2 / 6 * 1 / 2 + 0 + 0.1 * 6 / 12,
+                0 + 2 / 6 * 2 / 3 + 1 / 6 + 0.1 * 9 / 12]
+    profiles = encode_profiles(users, attributes)
+    query = {key: (value if key == "interest_column" else value[:1]) for key, value in profiles.items()}
+    pool = {key: (value if key == "interest_column" else value[1:]) for key, value in profiles.items()}
+    assert weighted_block_scores(query, pool)[0].tolist() == pytest.approx(expected)
+
+    recommended = Recommender(users).recommend_many([users[0]], attributes, k=None, mode="weighted")[0]
+    assert [u.name for u in recommended] == ["D", "C", "B", "E"]
+
+
+def test_add_user_is_not_blocked_by_a_ranking(make_user, monkeypatch) -> None:
+    """A user can be added while another thread is ranking, and the next ranking includes them."""
+    users = [make_user(name) for name in ["A", "B", "C"]]
+    recommender = Recommender(users)
+    ranking_started, finish_ranking = threading.Event(), threading.Event()
+    rank = Recommender._rank
+
+    def slow_rank(*args):
+        ranking_started.set()
+        finish_ranking.wait(5)
+        return rank(*args)
+
+    monkeypatch.setattr(Recommender, "_rank", staticmethod(slow_rank))
+    worker = threading.Thread(target=recommender.recommend, args=(users[0], ["religion"]))
+    worker.start()
+    assert ranking_started.wait(5)
+
+    adder = threading.Thread(target=recommender.add_user, args=(make_user("D"),))
+    adder.start()
+    adder.join(1)
+    blocked = adder.is_alive()
+    finish_ranking.set()
+    worker.join()
+    adder.join()
+
+    assert not blocked
+    assert [u.name for u in recommender.recommend(users[0], ["religion"])] == ["B", "C", "D"]
+
+
+def test_users_with_the_same_profile_share_one_ranking(make_user) -> None:
+    """A second user with the same values on the ranked attributes is answered from the cached ranking."""
+    users = [make_user("A"), make_user("B"), make_user("C", mbti="ENTJ"), make_user("D", mbti="ENTJ")]
+    users[1].characteristics.religion = "Jewish"
+    recommender = Recommender(users)
+
+    recommender.recommend(users[0], ["mbti"])
+    recommender.recommend(users[1], ["mbti"])
+    assert recommender.stats()["rankings"] == 1
+    assert recommender.stats()["hits"] == 1
+
+    recommender.recommend(users[2], ["mbti"])
+    recommender.recommend(users[0], ["religion"])
+    assert recommender.stats()["rankings"] == 3
+
+
+def test_add_user_invalidates_cached_rankings(make_user) -> None:
+    """A ranking cached before a user joins the pool is not reused afterwards."""
+    users = [make_user("A"), make_user("B", mbti="ENTJ")]
+    recommender = Recommender(users)
+    assert [u.name for u in recommender.recommend(users[0], ["mbti"])] == ["B"]
+
+    recommender.add_user(make_user("C"))
+    assert [u.name for u in recommender.recommend(users[0], ["mbti"])] == ["C", "B"]
+    assert recommender.stats()["rankings"] == 2
+
+
+def test_requesters_are_excluded_from_their_own_recommendations(make_user) -> None:
+    """Users sharing a cached ranking each get it without themselves, and still get k recommendations."""
+    users = [make_user(name) for name in ["A", "B", "C", "D"]]
+    recommender = Recommender(users)
+
+    results = recommender.recommend_many(users, ["mbti"], k=3)
+
+    for user, recommended in zip(users, results):
+        assert user not in recommended
+        assert len(recommended) == 3
+    assert recommender.stats()["rankings"] == 1
+
+
+def test_pool_is_created_once_by_concurrent_callers(make_user, monkeypatch) -> None:
+    """Threads asking for the same new pool at once, as social and the ranking thread do, get one pool."""
+    users = [make_user(name) for name in ["A", "B", "C"]]
+    recommender = Recommender(users)
+    create_pool = ranking.CandidatePool
+
+    def slow_pool(*args):
+        time.sleep(0.05)
+        return create_pool(*args)
+
+    monkeypatch.setattr(ranking, "CandidatePool", slow_pool)
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(recommender.pool(users[0]))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(pool is pools[0] for pool in pools)
+    assert recommender.pools[pools[0].pool_id] is pools[0]
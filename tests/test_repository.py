@@ -0,0 +1,101 @@
+"""
+Tests for the indexed filters and paged queries of repository.UserRepository.
+"""
+import pytest
+
+import repository
+from repository import UserRepository, load_user
+from tree import filter_user_by_dating_goal
+
+GOALS = ["Meeting new friends", "Short-term relationship", "Long-term relationship"]
+
+
+@pytest.fixture
+def users(make_user) -> list:
+    """Thirty users with every combination of goal and gender, three pairs of partners and two named Sam."""
+    users = [make_user(f"User {i}", "FM"[i % 2], GOALS[i % 3]) for i in range(30)]
+    users[4].name = users[9].name = "Sam"
+    for i, j in [(1, 4), (2, 5), (7, 10)]:
+        users[i].match(users[j])
+    return users
+
+
+@pytest.fixture
+def stored(users) -> UserRepository:
+    """A repository holding users, in order, with ids 1 to 30."""
+    repo = UserRepository()
+    repo.add_users(users)
+    yield repo
+    repo.close()
+
+
+def test_candidates_match_the_list_filter(users, stored) -> None:
+    """candidates and count_candidates select the users tree.filter_user_by_dating_goal does, in order."""
+    for i, user in enumerate(users):
+        row = next(stored.query(i, 1))
+        expected = [candidate.name for candidate in filter_user_by_dating_goal(users, user)]
+        assert [candidate["name"] for candidate in stored.candidates(row)] == expected
+        assert stored.count_candidates(row) == len(expected)
+
+
+def test_filters_and_count(users, stored) -> None:
+    """Each filter of query selects the same users as the equivalent list comprehension, and count agrees."""
+    cases = [
+        ({"dating_goal": GOALS[1]}, lambda u: u.dating_goal == GOALS[1]),
+        ({"gender": "M", "dating_goal": GOALS[0]}, lambda u: u.gender == "M" and u.dating_goal == GOALS[0]),
+        ({"other_gender": "M"}, lambda u: u.gender != "M"),
+        ({"has_partner": True}, lambda u: u.romantic_current is not None),
+        ({"has_partner": False, "gender": "F"}, lambda u: u.romantic_current is None and u.gender == "F"),
+        ({"exclude_id": 1}, lambda u: u is not users[0]),
+    ]
+    for filters, keep in cases:
+        expected = [user.name for user in users if keep(user)]
+        assert [row["name"] for row in stored.query(**filters)] == expected
+        assert stored.count(**filters) == len(expected)
+
+
+def test_query_pages_through_the_results(users, stored, monkeypatch) -> None:
+    """Pages of limit rows, each starting after the last id of the previous one, cover every result once."""
+    monkeypatch.setattr(repository, "REPOSITORY_BATCH_SIZE", 2)
+    expected = [row["id"] for row in stored.query(dating_goal=GOALS[0])]
+
+    pages, after_id = [], 0
+    while True:
+        page = [row["id"] for row in stored.query(after_id, 3, dating_goal=GOALS[0])]
+        if not page:
+            break
+        assert len(page) <= 3
+        pages.append(page)
+        after_id = page[-1]
+
+    assert [row_id for page in pages for row_id in page] == expected
+    assert len(pages) == 4
+
+
+def test_names_and_partners(users, stored) -> None:
+    """Names are not unique, and partners are linked both ways by id."""
+    assert [row["id"] for row in stored.find_by_name("Sam")] == [5, 10]
+    assert stored.find_by_name("Nobody") == []
+
+    assert stored.partner_of(2)["name"] == "Sam"
+    assert stored.partner_of(5)["name"] == users[1].name
+    assert stored.partner_of(1) is None
+
+
+def test_rows_load_back_into_users_and_replace(users, stored, make_user) -> None:
+    """load_user rebuilds a profile, and replace=True swaps the stored users for new ones."""
+    loaded = load_user(stored.find_by_name(users[3].name)[0])
+    assert (loaded.name, loaded.gender, loaded.dating_goal) == (users[3].name, users[3].gender, users[3].dating_goal)
+    assert vars(loaded.characteristics) == vars(users[3].characteristics)
+
+    assert stored.add_users([make_user("New")], replace=True) == 1
+    assert [row["name"] for row in stored.query()] == ["New"]
+
+
+@pytest.mark.parametrize("filters, index", [({"name": "Sam"}, "users_name"),
+                                            ({"dating_goal": GOALS[1], "gender": "F"}, "users_dating_goal_gender")])
+def test_filters_use_the_indexes(stored, filters, index) -> None:
+    """The filters are answered from their index rather than a scan of the table."""
+    where, parameters = repository._where(0, **filters)
+    plan = stored._connection.execute(f"EXPLAIN QUERY PLAN SELECT * FROM users WHERE {where}", parameters).fetchall()
+    assert any(index in row["detail"] for row in plan)
@@ -0,0 +1,20 @@
+"""
+Tests for serving the dashboard of a saved snapshot.
+"""
+import json
+
+import pytest
+
+server = pytest.importorskip("server")
+
+
+def test_create_server_serves_the_snapshot(tmp_path) -> None:
+    """The WSGI app built from a snapshot serves the dashboard, with its figures already cached."""
+    path = str(tmp_path / "snapshot.pkl")
+    server.build_snapshot(path, size=60)
+
+    client = server.create_server(path).test_client()
+
+    assert client.get("/").status_code == 200
+    stats = json.loads(client.get("/debug/figure-cache").data)
+    assert stats["entries"] == 2 and stats["network_version"] == 0
@@ -0,0 +1,38 @@
+"""
+Tests for recognising the population of an event store, and for reporting failed writes.
+"""
+import sqlite3
+
+import pytest
+
+from events import Event
+from store import EventStore, population_fingerprint
+from user_network import UserDirectory
+
+
+def test_fingerprint_ignores_renames(make_user) -> None:
+    """Renaming users with the same name, as UserDirectory does, keeps the population fingerprint."""
+    users = [make_user("Alex Kim"), make_user("Alex Kim", "M")]
+    before = population_fingerprint(users)
+
+    UserDirectory(users)
+
+    assert users[1].name == "Alex Kim (2)"
+    assert population_fingerprint(users) == before
+
+
+def test_failed_writes_are_raised_by_flush_and_close(tmp_path) -> None:
+    """A batch the background thread could not write is reported by flush and close, not lost silently."""
+    path = str(tmp_path / "events.db")
+    store = EventStore(path)
+    connection = sqlite3.connect(path)
+    connection.execute("DROP TABLE events")
+    connection.commit()
+    connection.close()
+
+    store.append(Event(1, "socialize", {"user1": 0, "user2": 1}))
+    with pytest.raises(RuntimeError):
+        store.flush()
+    with pytest.raises(RuntimeError):
+        store.close()
+    store.close()
@@ -0,0 +1,59 @@
+"""
+Tests for building and serializing the preference tree in tree.
+"""
+import numpy as np
+import pytest
+
+from tree import BinaryTree
+
+
+def build_by_insertion(matrix: np.ndarray, names: list[str]) -> BinaryTree:
+    """Return the preference tree built by inserting every row of matrix, followed by its name."""
+    tree = BinaryTree("")
+    for row, name in zip(matrix.tolist(), names):
+        tree.insert_sequence(row + [name])
+    return tree
+
+
+@pytest.mark.parametrize("shape", [(1, 3), (40, 1), (200, 5), (500, 8)])
+def test_from_matrix_builds_the_same_tree_as_insert_sequence(shape) -> None:
+    """from_matrix gives the same nodes, leaves and leaf order as inserting the rows one by one."""
+    matrix = np.random.default_rng(shape[0]).integers(0, 2, size=shape)
+    names = [f"user{i}" for i in range(shape[0])]
+
+    built, inserted = BinaryTree.from_matrix(matrix, names), build_by_insertion(matrix, names)
+
+    assert built.to_nested_list() == inserted.to_nested_list()
+    assert built.run_preference_tree() == inserted.run_preference_tree()
+
+
+def test_from_matrix_of_no_rows_is_only_the_root() -> None:
+    """With no names, the tree is just its root."""
+    assert BinaryTree.from_matrix(np.empty((0, 3)), []).to_nested_list() == \
+        BinaryTree("").to_nested_list()
+
+
+def test_tree_bytes_round_trip() -> None:
+    """from_bytes reads back the tree written by to_bytes, including non-ASCII names."""
+    matrix = np.random.default_rng(0).integers(0, 2, size=(300, 6))
+    names = [f"Zoë {i}" if i % 7 == 0 else f"user{i}" for i in range(300)]
+    tree = BinaryTree.from_matrix(matrix, names)
+
+    assert BinaryTree.from_bytes(tree.to_bytes()).to_nested_list() == tree.to_nested_list()
+
+
+def test_tree_save_and_load(tmp_path) -> None:
+    """A tree saved to a file is loaded back through a memory map unchanged."""
+    tree = build_by_insertion(np.array([[1, 0, 1], [0, 1, 1], [1, 0, 1]]), ["A", "B", "C"])
+    path = str(tmp_path / "tree.bin")
+
+    tree.save(path)
+
+    assert BinaryTree.load(path).to_nested_list() == tree.to_nested_list()
+    assert BinaryTree.load(path).run_preference_tree() == ["A", "C", "B"]
+
+
+def test_from_bytes_rejects_other_data() -> None:
+    """Data that was not written by to_bytes is rejected."""
+    with pytest.raises(ValueError):
+        BinaryTree.from_bytes(bytes(64))
@@ -0,0 +1,117 @@
+"""
+Tests for the worker-thread paths of DestinyApp. The app is created without calling __init__, so no
+window is opened; the widgets and the Tk root are replaced by the fakes below.
+"""
+import queue
+import sys
+
+import pytest
+
+from events import EventLog
+from store import EventStore, attach_store
+from ui import DestinyApp
+
+
+class FakeWidget:
+    """A label or frame that remembers its text and always exists."""
+    def __init__(self) -> None:
+        self.text = None
+        self.options = {}
+
+    def config(self, **options) -> None:
+        self.options.update(options)
+        self.text = options.get("text", self.text)
+
+    def winfo_exists(self) -> bool:
+        return True
+
+    def destroy(self) -> None:
+        pass
+
+
+class FakeRoot:
+    """A Tk root that records the callbacks scheduled with after instead of running them."""
+    def __init__(self) -> None:
+        self.scheduled = []
+
+    def after(self, delay: int, callback, *args) -> None:
+        self.scheduled.append((callback, args))
+
+
+@pytest.fixture
+def app() -> DestinyApp:
+    """Return a DestinyApp without a window, on its first matching page."""
+    app = DestinyApp.__new__(DestinyApp)
+    app.root = FakeRoot()
+    app.matching_session = 1
+    app.recommendations = []
+    app.seen_recommendations = []
+    app.counter_label = FakeWidget()
+    app.loading_label = FakeWidget()
+    return app
+
+
+def test_full_ranking_keeps_the_current_position(app, make_user) -> None:
+    """The full ranking arriving after a swipe neither resets the counter nor brings back the swiped user."""
+    a, b, c = make_user("A"), make_user("B"), make_user("C")
+    app.recommendations = [b]
+    app.seen_recommendations = [a]
+    results = queue.Queue()
+    results.put(("all", [a, b, c]))
+
+    app.poll_recommendations(1, FakeWidget(), results)
+
+    assert app.recommendations == [b, c]
+    assert app.counter_label.text == "Showing match 2 of 3"
+
+
+def test_ranking_failure_is_posted_as_an_error(app, make_user, monkeypatch) -> None:
+    """A failure on the ranking thread, including importing social, reaches the page as an error."""
+    monkeypatch.setitem(sys.modules, "social", None)
+    results = queue.Queue()
+
+    app.rank_recommendations(make_user("A"), ["religion"], results)
+    app.poll_recommendations(1, FakeWidget(), results)
+
+    assert app.loading_label.text.startswith("Could not find matches")
+    assert not app.root.scheduled
+
+
+def test_store_of_another_population_is_moved_aside(app, make_user, tmp_path, monkeypatch) -> None:
+    """Events recorded over a different population are kept aside, and this session's are still stored."""
+    path = str(tmp_path / "events.db")
+    old_users = [make_user("X"), make_user("Y")]
+    old_log = EventLog(old_users)
+    store = EventStore(path)
+    attach_store(old_log, store)
+    old_log.socialize(*old_users)
+    store.close()
+
+    messages = []
+    monkeypatch.setattr(app, "update_status_message", messages.append, raising=False)
+    users = [make_user("A"), make_user("B", "M")]
+    app.events = EventLog(users)
+
+    app.open_event_store(path)
+    app.events.socialize(*users)
+    app.event_store.close()
+
+    assert messages and "events.db.old1" in messages[0]
+    assert len(EventStore(f"{path}.old1").events()) == 1
+    assert [event.kind for event in EventStore(path).events()] == ["socialize"]
+
+
+def test_failed_export_import_ends_the_export(app, monkeypatch) -> None:
+    """A failure to import export on the worker thread is reported, and another export can be started."""
+    monkeypatch.setitem(sys.modules, "export", None)
+    app.user_list = []
+    app.exporting = True
+    app.export_label = FakeWidget()
+    progress = queue.Queue()
+
+    app.write_user_export(progress)
+    app.poll_user_export(progress)
+
+    assert not app.exporting
+    assert app.export_label.text.startswith("Export failed")
+    assert not app.root.scheduled
@@ -0,0 +1,55 @@
+"""
+Tests for simulate_connections and UserDirectory in user_network.
+"""
+import random
+
+from user_network import UserDirectory, generate_users_with_class, make_names_unique, simulate_connections
+
+
+def test_fewer_candidates_than_k_get_all_of_them(make_user) -> None:
+    """A user with fewer than k candidates is interested in every candidate, not in none of them."""
+    users = [make_user(name) for name in ["A", "B", "C"]]
+    simulate_connections(users, k=10)
+
+    for user in users:
+        assert sorted(other.name for other in user.interested_friend) == sorted(
+            other.name for other in users if other is not user)
+
+
+def test_directory_renames_users_whose_name_is_taken(make_user) -> None:
+    """Users sharing a name get numbered names and consecutive uids, and are found by their new names."""
+    users = [make_user("Alex Kim"), make_user("Alex Kim"), make_user("alex kim")]
+    directory = UserDirectory(users)
+
+    assert [user.name for user in users] == ["Alex Kim", "Alex Kim (2)", "alex kim"]
+    assert [user.uid for user in users] == [0, 1, 2]
+    assert directory.find("Alex Kim (2)") is users[1]
+    assert directory.find("ALEX KIM", ignore_case=True) is users[0]
+    assert directory.find("Alex Kim (3)") is None
+
+    late = make_user("Alex Kim")
+    assert directory.add(late) == 3 and late.name == "Alex Kim (3)"
+    assert directory.get(3) is late
+
+
+def test_make_names_unique_renames_without_a_directory(make_user) -> None:
+    """make_names_unique numbers repeated names like UserDirectory, but leaves the users without uids."""
+    users = [make_user("Alex Kim"), make_user("Alex Kim (2)"), make_user("Alex Kim")]
+    make_names_unique(users)
+
+    assert [user.name for user in users] == ["Alex Kim", "Alex Kim (2)", "Alex Kim (3)"]
+    assert all(user.uid == -1 for user in users)
+
+
+def test_generated_users_depend_only_on_the_seed() -> None:
+    """The same seed gives the same users, whatever state the random module was left in."""
+    def describe(users: list) -> list:
+        return [(user.name, user.age, user.gender, user.dating_goal, vars(user.characteristics),
+                 sorted(friend.name for friend in user.social_current)) for user in users]
+
+    random.seed(1)
+    first = describe(generate_users_with_class(40, 7))
+    random.seed(2)
+    second = describe(generate_users_with_class(40, 7))
+
+    assert first == second
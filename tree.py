@@ -4,8 +4,18 @@ The program build a Binary Tree to match users to generate a list of matches bas
 from __future__ import annotations
 
 import json
-from typing import List, Optional, Any
-import python_ta
+import mmap
+import os
+import struct
+from typing import Iterator, List, Optional, Any
+
+# The header of a serialized preference tree: a magic string, then the number of nodes, leaves and strings
+# and the length in bytes of the string blob
+TREE_MAGIC = b"PTREE\x00\x00\x01"
+_TREE_HEADER = struct.Struct("<8sQQQQ")
+
+# The tag of each node in a serialized preference tree
+_EMPTY, _MATCH, _NO_MATCH, _LEAF, _LABEL = range(5)
 
 
 def filter_user_by_dating_goal(users, user) -> list:
@@ -163,6 +173,167 @@ class BinaryTree:
                 self._right._right = BinaryTree()
             self._right.insert_sequence(rest)
 
+    @classmethod
+    def from_matrix(cls, matrix: Any, names: list[str], root: Any = "") -> BinaryTree:
+        """
+        Return the tree that inserting every row of the N x D 0/1 matrix with insert_sequence would build,
+        with names[i] as the name at the end of row i.
+
+        The rows are stable-sorted once (matches before non-matches, attribute by attribute), so rows that
+        share a prefix are adjacent. The tree is then built in one pass over the sorted rows, creating only
+        the nodes below the prefix each row shares with the previous one, instead of walking down from the
+        root for every row.
+
+        >>> t = BinaryTree.from_matrix([[1, 1], [0, 1], [1, 0], [1, 1]], ["Charlie", "Bob", "Alice", "Mary"])
+        >>> t.run_preference_tree()
+        ['Charlie', 'Mary', 'Alice', 'Bob']
+        >>> t.to_nested_list()[2]
+        [0, [1, [['Bob'], None, None], None], None]
+        """
+        import numpy as np
+
+        tree = cls(root)
+        if len(names) == 0:
+            return tree
+
+        matrix = np.asarray(matrix, dtype=np.uint8).reshape(len(names), -1)
+        depth = matrix.shape[1]
+
+        # np.lexsort sorts by its last key first, and is stable
+        order = np.lexsort(1 - matrix[:, ::-1].T) if depth > 0 else np.arange(len(names))
+        matrix = matrix[order]
+
+        # The number of leading attributes each row shares with the row before it. Rows that share all of
+        # them end in the same leaf, so only the first row of each group of equal rows creates nodes.
+        differs = np.concatenate([np.ones((1, depth), dtype=bool), matrix[1:] != matrix[:-1]])
+        shared = np.where(differs.any(axis=1), differs.argmax(axis=1) if depth > 0 else 0, depth)
+        shared[0] = 0
+        starts = np.flatnonzero(shared < depth) if depth > 0 else np.array([0])
+        ends = np.append(starts[1:], len(names)).tolist()
+        order = order.tolist()
+
+        # path[level] is the node at that depth on the previous group's path
+        path = [tree] + [None] * depth
+        for start, end, row, prefix in zip(starts.tolist(), ends, matrix[starts].tolist(), shared[starts].tolist()):
+            for level in range(prefix, depth):
+                node = cls(row[level])
+                if row[level] == 1:
+                    path[level]._left = node
+                else:
+                    path[level]._right = node
+                path[level + 1] = node
+
+            path[depth]._left = cls([names[i] for i in order[start:end]])
+
+        return tree
+
+    def to_bytes(self) -> bytes:
+        """
+        Return a compact binary serialization of this preference tree, which from_bytes reads back.
+
+        The nodes are stored in preorder as one byte tag each (empty, match, non-match, leaf or a string
+        label such as the root's ""), followed by the number of names in each leaf and the names and
+        labels as one UTF-8 blob with their offsets. Only trees with 0/1, string and list-of-name roots
+        (as built by insert_sequence or from_matrix) can be serialized.
+
+        >>> t = BinaryTree.from_matrix([[1, 1], [0, 1], [1, 0], [1, 1]], ["Charlie", "Bob", "Alice", "Mary"])
+        >>> BinaryTree.from_bytes(t.to_bytes()).to_nested_list() == t.to_nested_list()
+        True
+        """
+        import numpy as np
+
+        tags = bytearray()
+        counts = []
+        strings = []
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree is None or tree._root is None:
+                tags.append(_EMPTY)
+                continue
+            if isinstance(tree._root, list):
+                tags.append(_LEAF)
+                counts.append(len(tree._root))
+                strings.extend(tree._root)
+            elif isinstance(tree._root, str):
+                tags.append(_LABEL)
+                strings.append(tree._root)
+            elif tree._root in (0, 1) and not isinstance(tree._root, float):
+                tags.append(_MATCH if tree._root == 1 else _NO_MATCH)
+            else:
+                raise ValueError(f"Cannot serialize a tree node with root {tree._root!r}")
+            stack.append(tree._right)
+            stack.append(tree._left)
+
+        offsets = np.zeros(len(strings) + 1, dtype=np.uint64)
+        np.cumsum([len(string) for string in strings], out=offsets[1:])
+        blob = "".join(strings).encode("utf-8")
+
+        return b"".join([_TREE_HEADER.pack(TREE_MAGIC, len(tags), len(counts), len(strings), len(blob)),
+                         _pad(bytes(tags)), _pad(np.array(counts, dtype=np.uint32).tobytes()),
+                         offsets.tobytes(), blob])
+
+    @classmethod
+    def from_bytes(cls, data: Any) -> BinaryTree:
+        """
+        Return the tree serialized by to_bytes in data, which can be any buffer (e.g. bytes or an mmap).
+
+        The tags, leaf sizes and string offsets are read as NumPy views of data, without copying them.
+        """
+        import numpy as np
+
+        magic, num_nodes, num_leaves, num_strings, blob_length = _TREE_HEADER.unpack_from(data)
+        if magic != TREE_MAGIC:
+            raise ValueError("Not a serialized preference tree")
+
+        position = _TREE_HEADER.size
+        tags = np.frombuffer(data, dtype=np.uint8, count=num_nodes, offset=position)
+        position += _padded_length(num_nodes)
+        counts = np.frombuffer(data, dtype=np.uint32, count=num_leaves, offset=position)
+        position += _padded_length(4 * num_leaves)
+        offsets = np.frombuffer(data, dtype=np.uint64, count=num_strings + 1, offset=position).tolist()
+        position += 8 * (num_strings + 1)
+        text = bytes(data[position:position + blob_length]).decode("utf-8")
+
+        strings = iter([text[start:end] for start, end in zip(offsets, offsets[1:])])
+        counts = iter(counts.tolist())
+        values = {_MATCH: 1, _NO_MATCH: 0}
+
+        def make(tag: int) -> BinaryTree:
+            node = cls()
+            if tag == _LEAF:
+                node._root = [next(strings) for _ in range(next(counts))]
+            elif tag == _LABEL:
+                node._root = next(strings)
+            elif tag != _EMPTY:
+                node._root = values[tag]
+            return node
+
+        tags = tags.tolist()
+        root = make(tags[0])
+        stack = [(root, "_right"), (root, "_left")] if tags[0] != _EMPTY else []
+        for tag in tags[1:]:
+            parent, side = stack.pop()
+            node = make(tag)
+            setattr(parent, side, node)
+            if tag != _EMPTY:
+                stack.append((node, "_right"))
+                stack.append((node, "_left"))
+        return root
+
+    def save(self, path: str) -> None:
+        """Write the to_bytes serialization of this tree to path, replacing the file atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> BinaryTree:
+        """Return the tree saved to path by save, reading the file through a memory map."""
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return cls.from_bytes(data)
+
     def to_nested_list(self) -> Optional[list]:
         """
         Returns a nested list representation of the binary tree, \
@@ -194,25 +365,53 @@ class BinaryTree:
         >>> t.run_preference_tree()
         ['Charlie', 'Mary', 'Alice', 'Bob', 'Justin']
         """
-        recommendation_list = []
+        return list(self.iter_preferences())
 
-        if isinstance(self._root, list):
-            recommendation_list.extend(self._root)
+    def iter_preferences(self) -> Iterator[str]:
+        """
+        Yield the ranked recommended users one at a time, in the same order as run_preference_tree.
+
+        The tree is walked with an explicit stack (matches before non-matches), so no intermediate lists
+        are built and deep trees cannot hit the recursion limit. Callers that only need the first few
+        recommendations can stop early.
+
+        >>> t = BinaryTree("")
+        >>> t.insert_sequence([0, 1, "Bob"])
+        >>> t.insert_sequence([1, 0, "Alice"])
+        >>> preferences = t.iter_preferences()
+        >>> next(preferences)
+        'Alice'
+        >>> list(preferences)
+        ['Bob']
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if isinstance(tree._root, list):
+                yield from tree._root
+            else:
+                if tree._right:
+                    stack.append(tree._right)
+                if tree._left:
+                    stack.append(tree._left)
+
+
+def _padded_length(length: int) -> int:
+    """Return length rounded up to a multiple of 8."""
+    return -(-length // 8) * 8
 
-        else:
-            if self._left:
-                recommendation_list.extend(self._left.run_preference_tree())
-            if self._right:
-                recommendation_list.extend(self._right.run_preference_tree())
 
-        return recommendation_list
+def _pad(data: bytes) -> bytes:
+    """Return data padded with zero bytes to a multiple of 8 bytes, so the next array stays aligned."""
+    return data + bytes(_padded_length(len(data)) - len(data))
 
 
 if __name__ == "__main__":
 
+    import python_ta
     python_ta.check_all(config={
-        'extra-imports': ["json"],  # the names (strs) of imported modules
-        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'extra-imports': ["json", "numpy", "mmap", "os", "struct"],  # the names (strs) of imported modules
+        'allowed-io': ['BinaryTree.save', 'BinaryTree.load'],
         'max-line-length': 120,
         "forbidden-io-functions": [],
         'disable': ['E9970']
@@ -3,6 +3,9 @@ The program handling the GUI for the dating app.
 Generative AI was used for generating sample templates of implementing visual elements across the GUI.
 We modified the generated templates to complete this program.
 """
+from __future__ import annotations
+
+import atexit
 import tkinter as tk
 import sys
 import threading
@@ -10,17 +13,35 @@ import time
 import socket
 import webbrowser
 import traceback
-from typing import Union
-
-from PIL import Image, ImageTk
-from dash import Dash
-import python_ta
-
-from user_network import User, Characteristics, generate_users_with_class, add_fixed_users
+import os
+import queue
+from typing import Optional, Union, TYPE_CHECKING
+
+import diagnostics
+from events import Event, EventLog, NetworkCounters
+from store import EventStore, attach_store, move_store_aside
+from user_network import User, UserDirectory, Characteristics, generate_users_with_class, add_fixed_users
 import user_network
 import tree
-import common
-import graph
+
+if TYPE_CHECKING:
+    from ranking import Recommender
+
+# The number of recommendations ranked (and shown) before the rest of the ranking is ready
+FIRST_PAGE_SIZE = 20
+
+# How often the matching page checks for ranking results, in milliseconds
+RESULT_POLL_MS = 50
+
+# The database the profiles and connections made in the app are kept in between runs
+EVENT_STORE_PATH = "destiny_events.db"
+
+# The latest memory report, and the first one saved on this machine, which later reports are compared with
+MEMORY_REPORT_PATH = "destiny_memory.json"
+MEMORY_BASELINE_PATH = "destiny_memory_baseline.json"
+
+# The file the admin export writes every user to
+EXPORT_PATH = "destiny_users.jsonl.gz"
 
 
 class DestinyApp:
@@ -39,15 +60,26 @@ class DestinyApp:
         - status_label: A tkinter Label widget for displaying status messages
         - result_label: A tkinter Label widget for showing input validation results
         - user_list: A list of User objects representing all users in the network
+        - recommender: The ranking.Recommender that ranks and caches recommendations for users in user_list
+        - directory: The user_network.UserDirectory giving every user in user_list a stable id and unique name
+        - events: The events.EventLog recording the profiles and connections added to user_list in the app
+        - network_counters: The friend counts and partners of the users in user_list, updated from events
+        - event_store: The store.EventStore keeping the events between runs
         - current_user: The User object representing the currently logged-in user
         - priority_attributes: A list of attribute names in order of user's priority ranking
         - recommendations_dict: A dictionary mapping attribute names to lists of recommended users
         - recommendations: A list of User objects representing recommended matches for the current user
+        - seen_recommendations: The recommendations already passed or matched on the current matching page
+        - matching_session: The number of matching pages opened, used to drop results meant for a closed page
+        - loading_label: A tkinter Label widget shown while the recommendations are being ranked
         - match_frame: A tkinter Frame widget for displaying match results
         - matches_made: An integer counter for the number of matches made
         - counter_label: A tkinter Label widget for displaying the number of matches made
         - background_color: The background color of the application window
         - users_label: A tkinter Label widget for displaying the number of users in the network
+        - export_label: A tkinter Label widget for displaying the progress of the admin export
+        - exporting: Whether an admin export is running
+        - graph_port: The port the network graph app is served on, or None before the graph is first viewed
 
     Representation Invariants:
         - self.window_width > 0
@@ -72,19 +104,33 @@ class DestinyApp:
     status_label: tk.Label
     result_label: tk.Label
     user_list: list[User]
+    recommender: Recommender
+    directory: UserDirectory
+    events: EventLog
+    network_counters: NetworkCounters
+    event_store: EventStore
     user_list_friends: list[User]
     user_list_love: list[User]
     current_user: User
     priority_attributes: list[str]
     recommendations_dict: dict[str, list[User]]
     recommendations: list[User]
+    seen_recommendations: list[User]
+    matching_session: int
+    loading_label: tk.Label
     match_frame: tk.Frame
     matches_made: int
     counter_label: tk.Label
     background_color: str = "#7A8B9C"
     users_label: tk.Label
+    export_label: tk.Label
+    exporting: bool
+    graph_port: Optional[int]
 
     def __init__(self, image_path: str, window_width: int = 720, window_height: int = 720) -> None:
+        if os.environ.get(diagnostics.TRACE_ENVIRONMENT_VARIABLE):
+            diagnostics.start_tracing()
+
         self.root = tk.Tk()
         self.root.title("Destiny App")
         self.root.geometry(f"{window_width}x{window_height}")
@@ -99,16 +145,34 @@ class DestinyApp:
         self.priority_attributes = []
         self.recommendations_dict = {}
         self.recommendations = []
+        self.seen_recommendations = []
+        self.matching_session = 0
+        self.exporting = False
+        self.graph_port = None
 
-        # Generate users locally
+        # Generate users locally, the same users on every run so that stored events refer to the same people
         self.user_list = generate_users_with_class(2000, 1234)
 
         add_fixed_users(self.user_list)
 
-        self.user_list_friends, self.user_list_love = user_network.simulate_connections(self.user_list)
+        # One canonical object per user, with duplicate generated names made unique
+        self.directory = UserDirectory(self.user_list)
+
+        from ranking import Recommender
+        self.recommender = Recommender(self.user_list)
 
-        add_fixed_users(self.user_list_friends)
-        add_fixed_users(self.user_list_love)
+        self.user_list_friends, self.user_list_love = user_network.simulate_connections(
+            self.user_list, recommender=self.recommender)
+
+        # Profiles and connections made in the app are recorded in the event log, which keeps the counters current
+        self.events = EventLog(self.user_list)
+        self.network_counters = NetworkCounters(self.events)
+        self.events.subscribe(self.on_network_event)
+
+        # Bring back the profiles and connections made in earlier runs, and keep the new ones
+        self.open_event_store(EVENT_STORE_PATH)
+        # Write the queued events however the app exits, not only when the window is closed
+        atexit.register(lambda: self.event_store.close())
 
     def create_welcome_page(self, image_path: str) -> None:
         """
@@ -131,6 +195,8 @@ class DestinyApp:
 
         # Load and display the image in the top half
         try:
+            from PIL import Image, ImageTk
+
             img = Image.open(image_path)
             img_width, img_height = img.size
 
@@ -243,6 +309,14 @@ class DestinyApp:
                                  command=self.print_user_list_debug)
         print_button.pack(pady=20)
 
+        export_button = tk.Button(frame, text="Export All Users", font=("Arial", 16),
+                                  bg="#F39C12", fg="black", padx=20, pady=10,
+                                  command=self.export_user_list)
+        export_button.pack(pady=(0, 5))
+
+        self.export_label = tk.Label(frame, text="", font=("Arial", 14), fg="white", bg=self.background_color)
+        self.export_label.pack(pady=(0, 15))
+
         logout_button = tk.Button(frame, text="Logout", font=("Arial", 16),
                                   bg="#E74C3C", fg="black", padx=20, pady=10,
                                   command=lambda: self.create_welcome_page(self.image_path))
@@ -775,17 +849,10 @@ class DestinyApp:
                 romantic_current=None
             )
 
-            self.user_list.append(user)
-
-            if user.dating_goal == "Meeting new friends":
-                if user not in self.user_list_friends:
-                    self.user_list_friends.append(user)
-            else:
-                if user not in self.user_list_love:
-                    self.user_list_love.append(user)
+            self.events.add_profile(user)
 
             # Display success message
-            self.status_label.config(text=f"Profile created successfully for {name}!", fg="white")
+            self.status_label.config(text=f"Profile created successfully for {user.name}!", fg="white")
 
             self.current_user = user
             self.root.after(200, self.show_success_page)
@@ -827,6 +894,9 @@ class DestinyApp:
     def show_matching_page(self) -> None:
         """
         Show a page where users can swipe through recommended matches and connect with them.
+
+        A loading message is shown while the recommendations are ranked in the background; the first
+        card appears as soon as the first FIRST_PAGE_SIZE recommendations are ready.
         """
         self.root.unbind_all("<MouseWheel>")
 
@@ -856,19 +926,68 @@ class DestinyApp:
                                font=("Arial", 16), fg="white", bg=self.background_color)
         description.pack(pady=(0, 20))
 
-        common.data_wrangling(current_user=self.current_user, user_characteristics=self.priority_attributes,
-                              users_list=self.user_list)
-        preference_tree = common.build_preference_tree("data.csv")
-        recommendation_names = preference_tree.run_preference_tree()
+        self.recommendations = []
+        self.seen_recommendations = []
+        self.matching_session += 1
+
+        self.loading_label = tk.Label(main_frame, text="Finding your matches...",
+                                      font=("Arial", 20), fg="white", bg=self.background_color)
+        self.loading_label.pack(pady=40)
 
-        user_keypair = {user_object.name: user_object for user_object in self.user_list}
+        # Rank on a worker thread so the window stays responsive, and poll for the results from the Tk main loop
+        results = queue.Queue()
+        worker = threading.Thread(target=self.rank_recommendations,
+                                  args=(self.current_user, list(self.priority_attributes), results), daemon=True)
+        worker.start()
+        self.root.after(RESULT_POLL_MS, self.poll_recommendations, self.matching_session, main_frame, results)
 
-        # Filter out users who already have romantic partners if looking for romance
-        for name in recommendation_names:
-            if name in user_keypair:
-                user = user_keypair[name]
-                self.recommendations.append(user)
+    def rank_recommendations(self, user: User, attributes: list[str], results: queue.Queue) -> None:
+        """
+        Rank the recommendations of user on a worker thread, putting the first FIRST_PAGE_SIZE of them
+        and then the full ranking on results. The first page also suggests friends of the user's friends.
+        """
+        try:
+            from social import recommend_with_friends
+
+            # Users with the same profile and priorities share one cached ranking
+            results.put(("first", recommend_with_friends(self.recommender, [user], attributes, FIRST_PAGE_SIZE)[0]))
+            results.put(("all", self.recommender.recommend(user, attributes)))
+        except Exception as e:
+            traceback.print_exc()
+            results.put(("error", e))
 
+    def poll_recommendations(self, session: int, main_frame: tk.Frame, results: queue.Queue) -> None:
+        """
+        Show the recommendations put on results by rank_recommendations, and keep polling until the full
+        ranking has arrived. Results for a matching page that is no longer shown are dropped.
+        """
+        if session != self.matching_session or not main_frame.winfo_exists():
+            return
+
+        while not results.empty():
+            kind, value = results.get()
+            if kind == "error":
+                self.loading_label.config(text=f"Could not find matches: {value}", fg="#E74C3C")
+                return
+            if kind == "first":
+                self.recommendations = list(value)
+                self.loading_label.destroy()
+                self.show_recommendations(main_frame)
+            else:
+                # Add the rest of the full ranking after the first page, leaving out the users already shown
+                shown = {id(user) for user in self.recommendations + self.seen_recommendations}
+                self.recommendations.extend(user for user in value if id(user) not in shown)
+                if self.recommendations and self.counter_label.winfo_exists():
+                    self.counter_label.config(text=self.counter_text())
+                return
+
+        self.root.after(RESULT_POLL_MS, self.poll_recommendations, session, main_frame, results)
+
+    def show_recommendations(self, main_frame: tk.Frame) -> None:
+        """
+        Show the first recommendation card with the pass, match and exit buttons in main_frame,
+        or a message if there are no recommendations.
+        """
         if not self.recommendations:
             # No recommendations
             no_matches = tk.Label(main_frame, text="No potential matches found!",
@@ -908,8 +1027,7 @@ class DestinyApp:
                                 command=lambda: self.create_welcome_page(self.image_path))
         exit_button.pack(side=tk.LEFT, padx=15)
 
-        counter_text = f"Showing match 1 of {len(self.recommendations)}"
-        self.counter_label = tk.Label(main_frame, text=counter_text,
+        self.counter_label = tk.Label(main_frame, text=self.counter_text(),
                                       font=("Arial", 14), fg="white", bg=self.background_color)
         self.counter_label.pack(pady=(20, 0))
 
@@ -957,11 +1075,23 @@ class DestinyApp:
         # Update the counter label
         try:
             if hasattr(self, 'counter_label') and self.counter_label.winfo_exists():
-                counter_text = f"Showing match {self.recommendations.index(user) + 1} of {len(self.recommendations)}"
-                self.counter_label.config(text=counter_text)
+                self.counter_label.config(text=self.counter_text())
         except (tk.TclError, AttributeError):
             pass
 
+    def counter_text(self) -> str:
+        """
+        Return the position of the current recommendation among all the recommendations of the matching page.
+        """
+        seen = len(self.seen_recommendations)
+        return f"Showing match {seen + 1} of {seen + len(self.recommendations)}"
+
+    def next_recommendation(self) -> None:
+        """
+        Move past the current recommendation, after it has been passed or matched.
+        """
+        self.seen_recommendations.append(self.recommendations.pop(0))
+
     def pass_current_recommendation(self) -> None:
         """
         Skip the current recommendation and show the next one.
@@ -974,7 +1104,7 @@ class DestinyApp:
             if current_name in self.recommendations_dict:
                 self.recommendations_dict[current_name]["status"] = "rejected"
 
-            self.recommendations.pop(0)
+            self.next_recommendation()
 
             if not self.recommendations:
                 self.show_matching_summary()
@@ -1019,26 +1149,18 @@ class DestinyApp:
         if not self.recommendations:
             return
 
+        # Recommendations are the canonical user objects, so there are no copies to look up
         candidate = self.recommendations[0]
         dating_goal = self.current_user.dating_goal
 
-        candidate_updated = None
-        for user in self.user_list:
-            if user.name == candidate.name:
-                candidate_updated = user
-                break
-
-        candidate = candidate_updated if candidate_updated else candidate
-
         if dating_goal != "Meeting new friends":
             # Check if candidate has a romantic partner
-            has_partner, partner_name = self.check_if_user_has_partner(
-                candidate, self.user_list, self.user_list_friends, self.user_list_love)
+            has_partner, partner_name = self.check_if_user_has_partner(candidate)
 
             if has_partner:
                 error_text = f"{candidate.name} is already in a relationship with {partner_name}!"
                 self.show_blocking_error(error_text)
-                self.recommendations.pop(0)
+                self.next_recommendation()
                 self.root.after(200, self.show_next)
                 return
 
@@ -1047,49 +1169,28 @@ class DestinyApp:
                 success_text = f"You've matched with {candidate.name}!"
                 self.show_temporary_message(success_text, "#E74C3C")
                 self.matches_made += 1
-                self.recommendations.pop(0)
+                self.next_recommendation()
                 self.show_matching_summary()
         else:
             # Friend matching
-            self.current_user.socialize(candidate)
+            self.events.socialize(self.current_user, candidate)
             success_text = f"You've connected with {candidate.name}!"
             self.show_temporary_message(success_text, "#2ECC71")
             self.matches_made += 1
-            self.recommendations.pop(0)
+            self.next_recommendation()
             if not self.recommendations:
                 self.root.after(1500, self.show_matching_summary)
             else:
                 self.root.after(200, self.display_current_recommendation)
 
-    def check_if_user_has_partner(self, candidate: User, user_list: list[User],
-                                  user_looking_for_friends: list[User],
-                                  user_looking_for_love: list[User]) -> tuple[bool, str]:
+    def check_if_user_has_partner(self, candidate: User) -> tuple[bool, str]:
         """
-        Check if a user already has a romantic partner in any of the user lists.
+        Check if a user already has a romantic partner, and return the partner's name if so.
         """
-        has_partner = False
-        partner_name = None
-
-        # Check in all three lists
-        for check_list in [user_list, user_looking_for_friends, user_looking_for_love]:
-            for user in check_list:
-                # Check if this user is our candidate and has a partner
-                if user.name == candidate.name and user.romantic_current is not None:
-                    has_partner = True
-                    partner_name = user.romantic_current.name
-                    break
-
-                # Check if candidate is someone's partner
-                if user.romantic_current is not None and hasattr(user.romantic_current, 'name'):
-                    if user.romantic_current.name == candidate.name:
-                        has_partner = True
-                        partner_name = user.name
-                        break
-
-            if has_partner:
-                break
-
-        return has_partner, partner_name
+        partner = self.network_counters.partners[self.events.position(candidate)]
+        if partner < 0:
+            return False, None
+        return True, self.user_list[partner].name
 
     def show_next(self) -> None:
         """
@@ -1104,35 +1205,9 @@ class DestinyApp:
         """
         Match the current user with another user and update the network visualization.
         """
-        self.current_user.match(other_user)
-
-        # Make sure both users exist in the global user list and update their romantic connections
-        for user in self.user_list:
-            if user.name == self.current_user.name:
-                user.romantic_current = self.current_user.romantic_current
-                user.romantic_degree = self.current_user.romantic_degree
-            elif user.name == other_user.name:
-                user.romantic_current = other_user.romantic_current
-                user.romantic_degree = other_user.romantic_degree
-
-        found_current = False
-        found_other = False
-
-        for user in self.user_list_love:
-            if user.name == self.current_user.name:
-                user.romantic_current = self.current_user.romantic_current
-                user.romantic_degree = self.current_user.romantic_degree
-                found_current = True
-            elif user.name == other_user.name:
-                user.romantic_current = other_user.romantic_current
-                user.romantic_degree = other_user.romantic_degree
-                found_other = True
-
-        # Add users to self.user_list_love if they're not there but should be
-        if not found_current and self.current_user.dating_goal != "Meeting new friends":
-            self.user_list_love.append(self.current_user)
-        if not found_other and other_user.dating_goal != "Meeting new friends":
-            self.user_list_love.append(other_user)
+        # Both users are canonical objects in self.user_list (and already in self.user_list_love), which the
+        # event log updates in place
+        self.events.match(self.current_user, other_user)
 
         self.show_next()
 
@@ -1296,21 +1371,36 @@ class DestinyApp:
                             return port
                 return start + 100
 
-            port = find_available_port()
+            # The graph app follows self.events, so the app started for the first view serves every later one
+            first_view = self.graph_port is None
+            if first_view:
+                self.graph_port = find_available_port()
+            port = self.graph_port
 
             # Define a function to run the Dash app in a separate thread
             def run_dash_app() -> None:
-                destiny_app = graph.create_app(
-                    user_list=self.user_list,
-                    user_looking_for_friends=self.user_list_friends,
-                    user_looking_for_love=self.user_list_love
-                )
-
-                destiny_app.run(debug=False, port=port)
+                import graph
+
+                try:
+                    destiny_app = graph.create_app(
+                        user_list=self.user_list,
+                        user_looking_for_friends=self.user_list_friends,
+                        user_looking_for_love=self.user_list_love,
+                        events=self.events,
+                        counters=self.network_counters,
+                        directory=self.directory
+                    )
+
+                    destiny_app.run(debug=False, port=port)
+                except Exception:
+                    traceback.print_exc()
+                    # Start a new app for the next view instead of pointing the browser at this one
+                    self.root.after(0, lambda: setattr(self, "graph_port", None))
 
             # Define a function to open the browser after a short delay
             def open_browser() -> None:
-                time.sleep(3)
+                if first_view:
+                    time.sleep(3)
                 url = f'http://127.0.0.1:{port}/'
                 print(f"Opening browser to {url}")
                 webbrowser.open(url)
@@ -1318,8 +1408,9 @@ class DestinyApp:
                 self.root.after(0, lambda: self.update_status_message("Graph visualization opened in browser"))
 
             # Create and start the thread for running the Dash app
-            dash_thread = threading.Thread(target=run_dash_app, daemon=True)
-            dash_thread.start()
+            if first_view:
+                dash_thread = threading.Thread(target=run_dash_app, daemon=True)
+                dash_thread.start()
 
             # Open browser in another thread to avoid blocking
             browser_thread = threading.Thread(target=open_browser, daemon=True)
@@ -1391,13 +1482,125 @@ class DestinyApp:
                 f"  {len(self.user_list) - 2 + i}. {user.name}, {user.age}, {user.gender}, "
                 f"MBTI: {user.characteristics.mbti}")
 
+        print("\nRECOMMENDATION CACHE:")
+        for key, value in self.recommender.stats().items():
+            print(f"  {key}: {value}")
+
+        # Memory by subsystem, compared with the baseline report
+        baseline = diagnostics.load_report(MEMORY_BASELINE_PATH)
+        report = diagnostics.collect_report(f"({len(self.user_list)} users)")
+        print("\n" + diagnostics.format_report(report, baseline))
+        diagnostics.save_report(report, MEMORY_REPORT_PATH)
+        if baseline is None:
+            diagnostics.save_report(report, MEMORY_BASELINE_PATH)
+
         print("\n==========================================")
 
+    def export_user_list(self) -> None:
+        """
+        Export every user to EXPORT_PATH on a worker thread, showing the progress on the admin page.
+        """
+        if self.exporting:
+            return
+        self.exporting = True
+        self.export_label.config(text="Exporting users...", fg="white")
+
+        # Export on a worker thread so the window stays responsive, and poll for its progress from the Tk main loop
+        progress = queue.Queue()
+        worker = threading.Thread(target=self.write_user_export, args=(progress,), daemon=True)
+        worker.start()
+        self.root.after(RESULT_POLL_MS, self.poll_user_export, progress)
+
+    def write_user_export(self, progress: queue.Queue) -> None:
+        """
+        Write the export on a worker thread, putting its progress and then its result on progress.
+        """
+        try:
+            from export import export_users
+
+            written = export_users(self.user_list, EXPORT_PATH,
+                                   lambda done, total: progress.put(("progress", (done, total))))
+            progress.put(("done", written))
+        except Exception as e:
+            traceback.print_exc()
+            progress.put(("error", e))
+
+    def poll_user_export(self, progress: queue.Queue) -> None:
+        """
+        Show the progress put on progress by write_user_export, and keep polling until the export ends.
+        """
+        message = None
+        while not progress.empty():
+            kind, value = progress.get()
+            if kind == "progress":
+                done, total = value
+                message = (f"Exported {done} of {total} users ({done * 100 // max(total, 1)}%)", "white")
+            else:
+                self.exporting = False
+                if kind == "done":
+                    message = (f"Exported {value} users to {EXPORT_PATH}", "#2ECC71")
+                else:
+                    message = (f"Export failed: {value}", "#E74C3C")
+
+        # The admin page may have been left while the export runs
+        if message is not None and self.export_label.winfo_exists():
+            self.export_label.config(text=message[0], fg=message[1])
+        if self.exporting:
+            self.root.after(RESULT_POLL_MS, self.poll_user_export, progress)
+
+    def on_network_event(self, event: Event) -> None:
+        """
+        Add the users of profile-add events (made in the app or replayed from the event store) to the
+        directory, the recommender and the user list for their dating goal.
+        """
+        if event.kind != "profile-add":
+            return
+
+        user = self.user_list[event.payload["user"]]
+        self.directory.add(user)
+        self.recommender.add_user(user)
+        if user.dating_goal == "Meeting new friends":
+            self.user_list_friends.append(user)
+        else:
+            self.user_list_love.append(user)
+
+    def open_event_store(self, path: str) -> None:
+        """
+        Replay the events stored at path into the event log, and store the new events there.
+
+        If the stored events were recorded over a different population, they are moved aside, the user is
+        told where they went, and this session's events are stored in a new database at path.
+        """
+        self.event_store = EventStore(path)
+        try:
+            attach_store(self.events, self.event_store)
+        except ValueError as e:
+            self.event_store.close()
+            old_path = move_store_aside(path)
+            self.event_store = EventStore(path)
+            attach_store(self.events, self.event_store)
+            message = f"{e} They were moved to {old_path} and a new event store was started."
+            print(message, file=sys.stderr)
+            self.update_status_message(message)
+
+    def close(self) -> None:
+        """
+        Write the remaining events to the event store and close the window.
+        """
+        try:
+            self.event_store.close()
+        finally:
+            self.root.destroy()
+
     def run(self) -> None:
         """
         Run the application.
         """
-        self.root.mainloop()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        try:
+            self.root.mainloop()
+        finally:
+            self.event_store.close()
 
 
 if __name__ == "__main__":
@@ -1405,14 +1608,17 @@ if __name__ == "__main__":
     app = DestinyApp(home_image_path)
     app.run()
 
+    import python_ta
     python_ta.check_all(config={
         'extra-imports': ["tkinter", "PIL", "sys", "user_network", "traceback", "tree", "common", "graph", "threading",
-                          "time", "socket", "webbrowser", "dash"],  # the names (strs) of imported modules
+                          "time", "socket", "webbrowser", "dash", "ranking",
+                          "queue", "social", "events",
+                          "store", "os", "diagnostics", "export", "atexit"],  # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         "forbidden-io-functions": [],
         'max-line-length': 120,
         'max-module-lines': 2000,
         'max-attributes': 20,
         'max-locals': 100,
-        'disable': ["W0718", "W0613", "R0915", "W0621", "W0404", "W0611", "R1702", "W0108"]
+        'disable': ["W0718", "W0613", "R0915", "W0621", "W0404", "W0611", "R1702", "W0108", "C0415"]
     })
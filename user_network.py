@@ -2,10 +2,18 @@
 The program for handling user_network.
 """
 from __future__ import annotations
-from typing import Optional
+from typing import Container, Optional, TYPE_CHECKING
 import random
-import python_ta
-from faker import Faker
+
+from adjacency import Adjacency
+
+if TYPE_CHECKING:
+    from ranking import Recommender
+
+# The attribute ranking used for generated users, from most to least important
+DEFAULT_CHARACTERISTICS_RANK = ["ethnicity", "interests", "mbti", "communication_type", "political_interests",
+                                "religion", "major", "year", "language", "likes_pets",
+                                "likes_outdoor_activities", "enjoys_watching_movies"]
 
 
 def generate_users_with_class(list_size: int, seed: int = 1234) -> list[User]:
@@ -14,6 +22,8 @@ def generate_users_with_class(list_size: int, seed: int = 1234) -> list[User]:
     (users that a user is interested in). If both users have each other in their interested_friend list mutually,
      they are added to their self.social_current list as user.
 
+    Both Faker and the random module are seeded with seed, so the same seed always gives the same users.
+
     Preconditions:
     - seed is not None
     - isinstance(seed, int) == True
@@ -25,8 +35,11 @@ def generate_users_with_class(list_size: int, seed: int = 1234) -> list[User]:
     Since there are only two users generated, and each of them has a interested_friend (the other person),
     they are matched.
     """
+    from faker import Faker
+
     fake = Faker()
     Faker.seed(seed)
+    random.seed(seed)
     user_list_1 = []
 
     interests = ["Reading", "Dancing", "Singing", "Playing instruments", "Running", "Coding", "Doing math"]
@@ -74,54 +87,43 @@ def generate_users_with_class(list_size: int, seed: int = 1234) -> list[User]:
     return user_list_1
 
 
-def simulate_connections(user_list_2: list[User]) -> tuple:
+def simulate_connections(user_list_2: list[User], characteristics_rank: Optional[list[str]] = None,
+                         k: int = 10, workers: int = 1, mode: str = "lexicographic",
+                         recommender: Optional[Recommender] = None) -> tuple:
     """
     Create social and romantic connections between users based on compatibility.
+
+    Each user is interested in their top k recommendations, ranked by characteristics_rank
+    (DEFAULT_CHARACTERISTICS_RANK if None) in the given ranking mode (one of ranking.RANKING_MODES).
+    Users are ranked through recommender (a new ranking.Recommender over user_list_2 if None), so users
+    with the same profile share one ranking; with workers > 1, blocks of users are ranked in that many processes.
+    The users are attached to an adjacency.Adjacency (the one some of them already belong to, if any), which
+    then holds their friendships and partners.
     """
-    from common import data_wrangling, build_preference_tree, generate_10_people_list
+    if recommender is None:
+        from ranking import Recommender
+        recommender = Recommender(user_list_2)
+
+    # Keep the connections in one adjacency, shared with any users that are already attached to one
+    network = next((user.network for user in user_list_2 if user.network is not None), None)
+    if network is None:
+        network = Adjacency()
+    for user in user_list_2:
+        network.add_user(user)
 
-    user_keypair_local = {user.name: user for user in user_list_2}
+    if characteristics_rank is None:
+        characteristics_rank = DEFAULT_CHARACTERISTICS_RANK
 
     users_looking_for_friends = [user for user in user_list_2 if user.dating_goal == "Meeting new friends"]
     users_looking_for_love = [user for user in user_list_2 if user.dating_goal != "Meeting new friends"]
 
-    characteristics_default_rank = ["ethnicity", "interests", "mbti", "communication_type", "political_interests",
-                                    "religion", "major", "year", "language", "likes_pets",
-                                    "likes_outdoor_activities", "enjoys_watching_movies"]
+    friend_matches = recommender.recommend_many(users_looking_for_friends, characteristics_rank, k, mode, workers)
+    for user, matches in zip(users_looking_for_friends, friend_matches):
+        user.interested_friend = matches
 
-    for user in users_looking_for_friends:
-        try:
-            data_wrangling(user, characteristics_default_rank, users_looking_for_friends, "friends.csv")
-            t = build_preference_tree('friends.csv')
-            result = t.run_preference_tree()
-            name_list = generate_10_people_list(result)
-
-            # Convert name strings to User objects
-            user.interested_friend = []
-            for namestring in name_list:
-                if namestring in user_keypair_local:
-                    user.interested_friend.append(user_keypair_local[namestring])
-                else:
-                    print(f"Warning: User '{namestring}' not found for {user.name}")
-        except Exception as e:
-            print(f"Error generating friends for {user.name}: {e}")
-
-    for user in users_looking_for_love:
-        try:
-            data_wrangling(user, characteristics_default_rank, users_looking_for_love, "love.csv")
-            t = build_preference_tree('love.csv')
-            result = t.run_preference_tree()
-            name_list = generate_10_people_list(result)
-
-            # Convert name strings to User objects with error checking
-            user.interested_romantic = []
-            for namestring in name_list:
-                if namestring in user_keypair_local:
-                    user.interested_romantic.append(user_keypair_local[namestring])
-                else:
-                    print(f"Warning: User '{namestring}' not found for {user.name}")
-        except Exception as e:
-            print(f"Error generating romantic interests for {user.name}: {e}")
+    romantic_matches = recommender.recommend_many(users_looking_for_love, characteristics_rank, k, mode, workers)
+    for user, matches in zip(users_looking_for_love, romantic_matches):
+        user.interested_romantic = matches
 
     for user in users_looking_for_friends:
         user.social_current = [social_current for social_current in user.interested_friend
@@ -213,6 +215,10 @@ class User:
     - social_ex: a list of the unfriended users of user.
     - romantic_degree: the number of romantic relationship the user is currently experiencing (0 or 1, we assume).
     - social_degree: the number of friends the user has.
+    - network: the adjacency.Adjacency holding the user's friends and partner once the user is attached to one,
+        or None, in which case they are kept on the user itself.
+    - node: the user's node in network, or -1.
+    - uid: the user's stable id in their UserDirectory, or -1 if they are not in one.
 
     Representation invariants:
     - name != ""
@@ -228,9 +234,13 @@ class User:
     interested_romantic: list
     romantic_current: Optional[User]
     characteristics: Characteristics
-    social_current: list[User]
     romantic_degree: int
     social_degree: int
+    network: Optional[Adjacency]
+    node: int
+    uid: int
+    _social_current: Optional[list[User]]
+    _romantic_current: Optional[User]
 
     def __init__(self, name: str, age: int, gender: str, pronouns: str, dating_goal: str,
                  characteristics: Characteristics,
@@ -247,6 +257,9 @@ class User:
         self.interested_friend = interested_friend
         self.interested_romantic = interested_romantic
 
+        self.network = None
+        self.node = -1
+        self.uid = -1
         self.romantic_current = romantic_current
         self.social_current = social_current
         self.romantic_degree = romantic_degree
@@ -255,6 +268,34 @@ class User:
     def __repr__(self) -> str:
         return f"User({self.name}, {self.age}, {self.gender}, {self.characteristics.mbti})"
 
+    @property
+    def social_current(self) -> list[User]:
+        """The user's friends: a live view over the network's adjacency once the user is attached to one."""
+        if self.network is None:
+            return self._social_current
+        return self.network.friends(self.node)
+
+    @social_current.setter
+    def social_current(self, friends: Optional[list[User]]) -> None:
+        if self.network is None:
+            self._social_current = friends
+        else:
+            self.network.set_friends(self, list(friends or []))
+
+    @property
+    def romantic_current(self) -> Optional[User]:
+        """The user's current romantic partner, kept in the network's partner array once attached to one."""
+        if self.network is None:
+            return self._romantic_current
+        return self.network.partner(self.node)
+
+    @romantic_current.setter
+    def romantic_current(self, partner: Optional[User]) -> None:
+        if self.network is None:
+            self._romantic_current = partner
+        else:
+            self.network.set_partner(self, partner)
+
     def update_social_degree(self) -> None:
         """Update_social_degree"""
         self.social_degree = len(self.social_current)
@@ -309,6 +350,102 @@ class User:
         return user.social_current
 
 
+class UserDirectory:
+    """
+    The canonical User object of every user, by stable id and by name.
+
+    Each user added gets the next id as their uid. Names must be unique within a directory: a user whose
+    name is taken (generated names often repeat) is renamed with a number, e.g. "Alex Kim (2)", so that
+    name lookups, graph nodes and name-keyed layouts never mix up two people.
+
+    Representation Invariants:
+    - all(self.get(uid).uid == uid for uid in range(len(self)))
+    - all(self.find(user.name) is user for user in self._users)
+
+    >>> c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                     "English", True, True, True)
+    >>> directory = UserDirectory([User("Alex Kim", 20, "F", "She/Her", "Meeting new friends", c, [], [])])
+    >>> twin = User("Alex Kim", 22, "M", "He/Him", "Meeting new friends", c, [], [])
+    >>> directory.add(twin)
+    1
+    >>> twin.name, directory.find("Alex Kim (2)") is twin
+    ('Alex Kim (2)', True)
+    >>> directory.find("alex kim (2)") is None, directory.find("alex kim (2)", ignore_case=True) is twin
+    (True, True)
+    """
+    _users: list[User]
+    _names: dict[str, int]
+    _lower_names: dict[str, int]
+
+    def __init__(self, users: Optional[list[User]] = None) -> None:
+        self._users = []
+        self._names = {}
+        self._lower_names = {}
+        for user in users or []:
+            self.add(user)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user: object) -> bool:
+        uid = getattr(user, "uid", -1)
+        return 0 <= uid < len(self._users) and self._users[uid] is user
+
+    def add(self, user: User) -> int:
+        """Add user to the directory, renaming them if their name is taken, and return their uid."""
+        if user in self:
+            return user.uid
+        if user.uid != -1:
+            raise ValueError(f"{user} already belongs to another directory.")
+
+        user.name = _unique_name(user.name, self._names)
+        user.uid = len(self._users)
+        self._users.append(user)
+        self._names[user.name] = user.uid
+        self._lower_names.setdefault(user.name.lower(), user.uid)
+        return user.uid
+
+    def get(self, uid: int) -> User:
+        """Return the user with the given uid."""
+        return self._users[uid]
+
+    def find(self, name: str, ignore_case: bool = False) -> Optional[User]:
+        """
+        Return the user called name, or None. If ignore_case is True, name may differ from theirs in case,
+        and the earliest user whose name matches is returned.
+        """
+        uid = self._lower_names.get(name.lower()) if ignore_case else self._names.get(name)
+        return self._users[uid] if uid is not None else None
+
+
+def make_names_unique(users: list[User]) -> None:
+    """
+    Rename every user whose name is taken by an earlier user in users, as UserDirectory does, for
+    populations that need unique names (e.g. for name-keyed layouts) but no directory.
+
+    >>> c = Characteristics("Asian", ["Coding"], "INTP", "Texting", "Liberal", "Other", "Music", "1",
+    ...                     "English", True, True, True)
+    >>> users = [User("Alex Kim", 20, "F", "She/Her", "Meeting new friends", c, [], []) for _ in range(3)]
+    >>> make_names_unique(users)
+    >>> [user.name for user in users]
+    ['Alex Kim', 'Alex Kim (2)', 'Alex Kim (3)']
+    """
+    taken = set()
+    for user in users:
+        user.name = _unique_name(user.name, taken)
+        taken.add(user.name)
+
+
+def _unique_name(name: str, taken: Container[str]) -> str:
+    """Return name if it is not in taken, or else name with the smallest number from 2 that is not."""
+    if name not in taken:
+        return name
+    number = 2
+    while f"{name} ({number})" in taken:
+        number += 1
+    return f"{name} ({number})"
+
+
 def add_fixed_users(users: list[User]) -> None:
     """
     Adding the creators into the user list. Creators also want to play!
@@ -570,8 +707,10 @@ def add_user(users: list[dict]) -> None:
 
 
 if __name__ == "__main__":
+    import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['faker', 'random', 'json', 'os', 'common'],  # the names (strs) of imported modules
+        'extra-imports': ['faker', 'random', 'json', 'os', 'common', 'ranking',
+                          'adjacency'],  # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120, 'disable': ['C0415', 'E9969', 'E9992', 'E9997', 'R1702', 'R0913', 'W0102', 'R0914',
                                             'R0902', 'R0912', 'R0915', 'R0916', 'W0621', 'C9103', 'E9988', 'C0301',